@@ -1,7 +1,9 @@
-from app.services.advisor import process_query
+from app.services.advisor import process_query, get_graph
 
 def main():
     """Command-line interface for the academic advisor system"""
+    # Compile the graph once up front; every query below reuses it
+    get_graph()
     print("Academic Advisor System initialized. Type 'quit' or 'q' to exit.")
     print("Ask questions about Chemical, Mechanical, Civil Engineering departments, or ECE tracks (CSE, ECE, CCE).")
     
@@ -1,5 +1,8 @@
 from fastapi import Header, HTTPException
 from typing import Optional
+import secrets
+
+from app.core.config import ADMIN_API_TOKEN
 
 # This is a simple example - you could add API key validation,
 # rate limiting, or other shared functionality
@@ -13,3 +16,13 @@ async def get_token_header(x_token: Optional[str] = Header(None)):
     if x_token != "fake-super-secret-token":
         raise HTTPException(status_code=401, detail="Invalid X-Token")
     return x_token
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """
+    Allow administrative endpoints only with the configured ADMIN_API_TOKEN
+    """
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Administrative endpoints are disabled")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid X-Admin-Token")
+    return x_admin_token
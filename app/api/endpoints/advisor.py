@@ -1,6 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.api.dependencies import require_admin_token
 from app.models.schemas import QueryRequest, QueryResponse
-from app.services.advisor import process_query
+from app.services.advisor import aprocess_query, astream_query, rebuild_graph, graph_registry, memory
+from app.services.streaming import format_sse
+from app.services.answer_cache import answer_cache
+from app.services.fast_router import fast_router
+from app.services.context_packer import context_packer
+from app.core.clients import client_stats
+from app.db.vector_store import local_index, embeddings
+from app.db.course_index import get_course_index
+from app.db.retrieval_cache import retrieval_cache
+from app.db.namespace_aliases import namespace_aliases
+from app.services.retrieval import retrieval_stats
+import asyncio
 import logging
 
 # Set up logger
@@ -27,7 +40,7 @@ async def query_advisor(request: dict):
         language = request.get("language", "english")
         
         # Process using the graph-based workflow
-        result = process_query(text)
+        result = await aprocess_query(text)
         
         # Return result in the expected format
         return result
@@ -39,3 +52,83 @@ async def query_advisor(request: dict):
             "content": "Sorry, there was an error processing your request. Please try again.",
             "department": "MSFEA Advisor"
         }
+
+@router.post("/query/stream", response_model=None)
+async def stream_advisor_query(request: dict, http_request: Request):
+    """
+    Stream the advisor's answer as server-sent events
+    
+    Emits `route`, `sources`, `token` and a final `done` (or `error`) event
+    so clients can render the answer as soon as the first token is generated.
+    """
+    text = request.get("text", "")
+    session_id = request.get("session_id") or http_request.headers.get("X-Session-ID")
+    
+    async def event_stream():
+        async for event, data in astream_query(text, session_id):
+            yield format_sse(event, data)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Disable proxy buffering (nginx) so tokens reach the client immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/graph/rebuild", response_model=None, dependencies=[Depends(require_admin_token)])
+async def rebuild_advisor_graph():
+    """
+    Recompile the shared advisor graph after the set of agents changed (requires X-Admin-Token)
+    """
+    try:
+        # Compiling takes seconds; keep the event loop serving other requests
+        await asyncio.to_thread(rebuild_graph)
+        return {"status": "rebuilt", **graph_registry.stats()}
+    except Exception as e:
+        logger.error(f"Error rebuilding advisor graph: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not rebuild the advisor graph")
+
+@router.post("/cache/invalidate", response_model=None)
+async def invalidate_answer_cache(request: dict = None):
+    """
+    Drop cached answers for one department (e.g. after re-ingesting its documents), or all of them
+    """
+    department = (request or {}).get("department")
+    removed = answer_cache.invalidate(department)
+    return {"status": "invalidated", "department": department or "all", "removed": removed}
+
+@router.get("/stats", response_model=None)
+async def advisor_stats():
+    """
+    Report runtime statistics for the advisor pipeline
+    """
+    def collect_stats():
+        # Session stats query the session store, and the course index and
+        # alias file may be re-read, so this runs off the event loop
+        return {
+            "graph": graph_registry.stats(),
+            "answer_cache": answer_cache.stats(),
+            "fast_router": fast_router.stats(),
+            "sessions": memory.stats(),
+            "clients": client_stats(),
+            "local_vector_index": local_index.describe_index_stats(),
+            "course_index": get_course_index().stats(),
+            "embedding_cache": embeddings.stats(),
+            "retrieval_cache": retrieval_cache.stats(),
+            "context_packer": context_packer.stats(),
+            "retrieval": retrieval_stats.stats(),
+            "namespace_aliases": namespace_aliases.snapshot(),
+        }
+
+    return await asyncio.to_thread(collect_stats)
+
+@router.get("/sessions/stats", response_model=None)
+async def session_stats():
+    """
+    Report the number of stored conversation sessions and the bytes they hold
+    """
+    try:
+        return await asyncio.to_thread(memory.stats)
+    except Exception as e:
+        logger.error(f"Error reading session stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
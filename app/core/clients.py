@@ -0,0 +1,182 @@
+from typing import Any, Dict, Optional
+import logging
+import threading
+
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from app.core.config import (
+    OPENAI_API_KEY,
+    LLM_POOL_MAX_CONNECTIONS,
+    LLM_POOL_MAX_KEEPALIVE,
+    LLM_POOL_KEEPALIVE_EXPIRY,
+    LLM_CLASSIFIER_MODEL,
+    LLM_CLASSIFIER_TEMPERATURE,
+    LLM_ANSWERER_MODEL,
+    LLM_ANSWERER_TEMPERATURE,
+    MEMORY_SUMMARY_MODEL,
+    EMBEDDING_MODEL,
+)
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Model settings per role. Classifiers (supervisor, ECE track, course name
+# extraction) make short routing calls; answerers write the student-facing reply.
+LLM_ROLES = {
+    "classifier": {"model_name": LLM_CLASSIFIER_MODEL, "temperature": LLM_CLASSIFIER_TEMPERATURE},
+    "answerer": {"model_name": LLM_ANSWERER_MODEL, "temperature": LLM_ANSWERER_TEMPERATURE},
+    "summarizer": {"model_name": MEMORY_SUMMARY_MODEL, "temperature": None},
+}
+
+
+class ConnectionStats:
+    """
+    Counts HTTP requests and the TCP connections / TLS handshakes they needed,
+    using httpcore's trace extension. Requests that did not open a connection
+    reused a pooled keep-alive connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def _record(self, event: str):
+        with self._lock:
+            if event == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            elif event == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def _trace(self, event: str, info: Dict[str, Any]):
+        self._record(event)
+
+    async def _atrace(self, event: str, info: Dict[str, Any]):
+        self._record(event)
+
+    def on_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def aon_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._atrace
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "reused_requests": reused,
+                "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+            }
+
+
+connection_stats = ConnectionStats()
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_llms: Dict[str, ChatOpenAI] = {}
+_embeddings: Optional[OpenAIEmbeddings] = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide keep-alive pool used by all synchronous OpenAI calls"""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=_limits(),
+                event_hooks={"request": [connection_stats.on_request]},
+            )
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the process-wide keep-alive pool used by all asynchronous OpenAI calls"""
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(
+                limits=_limits(),
+                event_hooks={"request": [connection_stats.aon_request]},
+            )
+        return _async_http_client
+
+
+def get_llm(role: str = "answerer") -> ChatOpenAI:
+    """
+    Return the shared chat model for a role
+
+    Args:
+        role: "classifier", "answerer" or "summarizer" (see LLM_ROLES)
+
+    Returns:
+        A ChatOpenAI instance shared by every caller with the same role,
+        sending its requests through the shared connection pools
+    """
+    if role not in LLM_ROLES:
+        raise ValueError(f"Unknown LLM role '{role}', expected one of {list(LLM_ROLES)}")
+    llm = _llms.get(role)
+    if llm is None:
+        settings = {key: value for key, value in LLM_ROLES[role].items() if value is not None}
+        llm = ChatOpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            **settings
+        )
+        llm = _llms.setdefault(role, llm)
+    return llm
+
+
+def get_embeddings() -> OpenAIEmbeddings:
+    """Return the shared embeddings client, sending its requests through the shared connection pools"""
+    global _embeddings
+    if _embeddings is None:
+        settings = {"model": EMBEDDING_MODEL} if EMBEDDING_MODEL else {}
+        _embeddings = OpenAIEmbeddings(
+            api_key=OPENAI_API_KEY,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            **settings
+        )
+    return _embeddings
+
+
+async def aclose_clients():
+    """Close the shared connection pools (application shutdown)"""
+    with _lock:
+        http_client, async_http_client = _http_client, _async_http_client
+    if async_http_client is not None:
+        await async_http_client.aclose()
+    if http_client is not None:
+        http_client.close()
+
+
+def client_stats() -> Dict[str, Any]:
+    """Return pool settings, the chat models in use and connection-reuse counters"""
+    return {
+        "pool": {
+            "max_connections": LLM_POOL_MAX_CONNECTIONS,
+            "max_keepalive_connections": LLM_POOL_MAX_KEEPALIVE,
+            "keepalive_expiry": LLM_POOL_KEEPALIVE_EXPIRY,
+        },
+        "llms": {role: llm.model_name for role, llm in _llms.items()},
+        "connections": connection_stats.stats(),
+    }
@@ -29,3 +29,159 @@ os.environ["LANGCHAIN_PROJECT"] = "AcademicAdvisorSystem"
 
 # Pinecone configuration
 INDEX_NAME = "academic-advisor-knowledge"
+
+# Vector store backend: "pinecone", or "local" to serve every namespace from the
+# in-process index (app.db.local_index) without Pinecone
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "pinecone").lower()
+# With the Pinecone backend, namespaces copied into the in-process index at startup
+# and queried from RAM (comma-separated, e.g. "msfea_advisor_namespace")
+LOCAL_VECTOR_NAMESPACES = [
+    namespace.strip() for namespace in os.environ.get("LOCAL_VECTOR_NAMESPACES", "").split(",") if namespace.strip()
+]
+# Directory of memory-mapped namespace snapshots (scripts/export_pinecone_snapshot.py)
+# served by the in-process index; local namespaces found there are not copied from Pinecone
+VECTOR_SNAPSHOT_DIR = os.environ.get("VECTOR_SNAPSHOT_DIR", "")
+# A republished namespace's previous snapshot version is kept this long for workers
+# still opening it, then deleted by a later publish
+VECTOR_SNAPSHOT_RETIRE_GRACE_SECONDS = float(os.environ.get("VECTOR_SNAPSHOT_RETIRE_GRACE_SECONDS", "3600"))
+# Course code -> chunk index written by scripts/embed_document.py; course lookups
+# are served from it without an embedding or vector query. The servers must read the
+# file the script writes (in k8s, the backend's shared data volume)
+COURSE_INDEX_PATH = os.environ.get("COURSE_INDEX_PATH", "./data/course_index.json")
+# Per-namespace BM25 indexes (<namespace>.json) written by scripts/embed_document.py;
+# like the course index, shared with the servers (in k8s, the backend's data volume)
+BM25_INDEX_DIR = os.environ.get("BM25_INDEX_DIR", "./data/bm25")
+# "hybrid" runs BM25 and dense search in parallel and fuses them (namespaces without
+# a BM25 index fall back to dense); "dense" uses the vector store only
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "hybrid").lower()
+# Candidates taken from each retriever before fusion, and the reciprocal rank fusion constant
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.environ.get("RRF_K", "60"))
+# Version stamp per namespace, bumped by the ingestion and delete scripts; servers
+# check the file's modification time at most every NAMESPACE_VERSION_CHECK_SECONDS.
+# Servers and scripts must share the file (in k8s, the backend's shared data volume)
+NAMESPACE_VERSIONS_PATH = os.environ.get("NAMESPACE_VERSIONS_PATH", "./data/namespace_versions.json")
+NAMESPACE_VERSION_CHECK_SECONDS = float(os.environ.get("NAMESPACE_VERSION_CHECK_SECONDS", "2"))
+# Logical namespace -> versioned physical namespace ("ece_namespace" -> "ece_namespace@v7"),
+# swapped by scripts/manage_namespaces.py once a new version is built; retired versions
+# are deleted by its gc command after the grace period. Every server replica and the
+# script must read the same file (in k8s, the backend's shared data volume)
+NAMESPACE_ALIASES_PATH = os.environ.get("NAMESPACE_ALIASES_PATH", "./data/namespace_aliases.json")
+NAMESPACE_GC_GRACE_SECONDS = float(os.environ.get("NAMESPACE_GC_GRACE_SECONDS", str(24 * 3600)))
+# Servers report the aliases they resolve with (next to the alias file) this often; gc
+# only deletes a retired namespace while live servers report and none still resolves to it
+NAMESPACE_ALIAS_REPORT_SECONDS = float(os.environ.get("NAMESPACE_ALIAS_REPORT_SECONDS", "60"))
+# Cache of agent vector search results, invalidated by namespace version bumps
+# (the TTL is only a backstop for writes made outside the scripts)
+RETRIEVAL_CACHE_ENABLED = os.environ.get("RETRIEVAL_CACHE_ENABLED", "true").lower() == "true"
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.environ.get("RETRIEVAL_CACHE_MAX_ENTRIES", "2000"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.environ.get("RETRIEVAL_CACHE_TTL_SECONDS", "3600"))
+# Adaptive top-k: agent searches over-fetch scored candidates and keep those above an
+# absolute similarity floor and within a fraction of the best hit, up to a token cap.
+# These are the defaults; namespaces can override them (app.services.namespace_config)
+ADAPTIVE_RETRIEVAL_ENABLED = os.environ.get("ADAPTIVE_RETRIEVAL_ENABLED", "true").lower() == "true"
+ADAPTIVE_RETRIEVAL_CANDIDATES = int(os.environ.get("ADAPTIVE_RETRIEVAL_CANDIDATES", "12"))
+ADAPTIVE_RETRIEVAL_MIN_SCORE = float(os.environ.get("ADAPTIVE_RETRIEVAL_MIN_SCORE", "0.75"))
+ADAPTIVE_RETRIEVAL_RELATIVE_SCORE = float(os.environ.get("ADAPTIVE_RETRIEVAL_RELATIVE_SCORE", "0.9"))
+ADAPTIVE_RETRIEVAL_MAX_TOKENS = int(os.environ.get("ADAPTIVE_RETRIEVAL_MAX_TOKENS", "2000"))
+
+# Size of the thread pool backing blocking calls (vector store queries, file IO)
+# awaited from the async query pipeline
+ASYNC_WORKER_THREADS = int(os.environ.get("ASYNC_WORKER_THREADS", "64"))
+# Multi-namespace fan-out queries (AgentRestrictedIndex.fan_out_query): shared pool
+# size and how long to wait for the namespaces before merging what has arrived
+FANOUT_MAX_WORKERS = int(os.environ.get("FANOUT_MAX_WORKERS", "16"))
+FANOUT_NAMESPACE_TIMEOUT_SECONDS = float(os.environ.get("FANOUT_NAMESPACE_TIMEOUT_SECONDS", "2"))
+
+# Token required in the X-Admin-Token header of administrative endpoints (graph
+# rebuild); when empty those endpoints are disabled
+ADMIN_API_TOKEN = os.environ.get("ADMIN_API_TOKEN", "")
+
+# Startup warmup (Pinecone connection, agent vector stores, graph compile) runs
+# in the background after the server starts; /ready reports 503 until it is done.
+# A failed warmup is retried after this many seconds
+STARTUP_WARMUP_RETRY_SECONDS = float(os.environ.get("STARTUP_WARMUP_RETRY_SECONDS", "10"))
+
+# Answer cache in front of the advisor graph (exact + semantic tiers)
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_SEMANTIC_ENABLED = os.environ.get("ANSWER_CACHE_SEMANTIC_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SEMANTIC_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_SEMANTIC_MAX_ENTRIES", "500"))
+ANSWER_CACHE_SEMANTIC_THRESHOLD = float(os.environ.get("ANSWER_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+
+# Supervisor classification mode: "single" (one structured validity + routing call)
+# or "two_call" (separate guardrail and routing calls, kept for comparison)
+SUPERVISOR_MODE = os.environ.get("SUPERVISOR_MODE", "single")
+
+# Local fast-path router in front of the supervisor LLM
+FAST_ROUTER_ENABLED = os.environ.get("FAST_ROUTER_ENABLED", "true").lower() == "true"
+# Minimum router confidence for skipping the supervisor LLM call
+FAST_ROUTER_THRESHOLD = float(os.environ.get("FAST_ROUTER_THRESHOLD", "0.85"))
+# Softmax temperature applied to cosine similarities against the label centroids
+FAST_ROUTER_CENTROID_TEMPERATURE = float(os.environ.get("FAST_ROUTER_CENTROID_TEMPERATURE", "0.05"))
+# Fraction of fast-path queries also classified by the LLM in the background to measure disagreement
+FAST_ROUTER_SHADOW_RATE = float(os.environ.get("FAST_ROUTER_SHADOW_RATE", "0.0"))
+
+# Conversation session store used by the graph checkpointer: "memory" (per process, lost
+# on restart), "sqlite" (SESSION_DB_PATH, shared by the workers of one host) or "redis"
+# (shared by every replica; what the k8s backend deployment uses)
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory").lower()
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", "./data/sessions.db")
+SESSION_REDIS_URL = os.environ.get("SESSION_REDIS_URL", "redis://localhost:6379/0")
+# Sessions idle for longer than this are expired (0 disables expiry)
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+# Maximum number of stored sessions before the least recently used are evicted
+SESSION_MAX_SESSIONS = int(os.environ.get("SESSION_MAX_SESSIONS", "10000"))
+# Sessions kept deserialized in each worker's memory
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "256"))
+# Checkpoints kept per conversation (older ones are only needed for time travel)
+SESSION_KEEP_CHECKPOINTS = int(os.environ.get("SESSION_KEEP_CHECKPOINTS", "3"))
+
+# Conversation memory: turns kept verbatim in prompts; older turns are summarized
+MEMORY_WINDOW_TURNS = int(os.environ.get("MEMORY_WINDOW_TURNS", "4"))
+# Turns allowed to accumulate beyond the window before they are folded into the summary
+MEMORY_SUMMARY_BATCH_TURNS = max(1, int(os.environ.get("MEMORY_SUMMARY_BATCH_TURNS", "2")))
+MEMORY_SUMMARY_MODEL = os.environ.get("MEMORY_SUMMARY_MODEL", "gpt-4o-mini")
+
+# Shared HTTP connection pool for all OpenAI chat and embedding calls
+LLM_POOL_MAX_CONNECTIONS = int(os.environ.get("LLM_POOL_MAX_CONNECTIONS", "100"))
+LLM_POOL_MAX_KEEPALIVE = int(os.environ.get("LLM_POOL_MAX_KEEPALIVE", "20"))
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_POOL_KEEPALIVE_EXPIRY", "60"))
+# Per-role chat model settings; an empty temperature keeps the model default
+LLM_CLASSIFIER_MODEL = os.environ.get("LLM_CLASSIFIER_MODEL", "gpt-4o")
+LLM_CLASSIFIER_TEMPERATURE = float(os.environ["LLM_CLASSIFIER_TEMPERATURE"]) if os.environ.get("LLM_CLASSIFIER_TEMPERATURE") else None
+LLM_ANSWERER_MODEL = os.environ.get("LLM_ANSWERER_MODEL", "gpt-4o")
+LLM_ANSWERER_TEMPERATURE = float(os.environ["LLM_ANSWERER_TEMPERATURE"]) if os.environ.get("LLM_ANSWERER_TEMPERATURE") else None
+# Embedding model; empty keeps the langchain-openai default the index was built with
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "")
+# Token budget for the retrieved context of an answering prompt, with optional
+# per-model overrides ("gpt-4o=4000,gpt-4o-mini=2500")
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_TOKEN_BUDGETS = {
+    model.strip(): int(budget)
+    for model, _, budget in (
+        item.partition("=") for item in os.environ.get("CONTEXT_TOKEN_BUDGETS", "").split(",") if "=" in item
+    )
+}
+# Share of a chunk's word 5-grams found in another chunk for it to count as a duplicate
+CONTEXT_DUPLICATE_THRESHOLD = float(os.environ.get("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+# Query embedding cache: vectors kept per worker, their lifetime (0 = no expiry) and an
+# optional SQLite file shared by the workers on a host (empty = memory only)
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "5000"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.environ.get("EMBEDDING_CACHE_TTL_SECONDS", str(24 * 3600)))
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "")
+
+# Document ingestion (scripts/embed_document.py): chunks per embedding call and upsert,
+# batches in flight at once, and retries of a failed batch (backoff doubles each time)
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "64"))
+INGEST_MAX_IN_FLIGHT = int(os.environ.get("INGEST_MAX_IN_FLIGHT", "4"))
+INGEST_MAX_RETRIES = int(os.environ.get("INGEST_MAX_RETRIES", "3"))
+INGEST_RETRY_BACKOFF_SECONDS = float(os.environ.get("INGEST_RETRY_BACKOFF_SECONDS", "1"))
+# Per-namespace manifests of the chunk ids ingested from each source document; ingestion
+# only embeds chunks missing from the manifest and deletes the ones a document lost
+INGEST_MANIFEST_DIR = os.environ.get("INGEST_MANIFEST_DIR", "./data/manifests")
+# Worker processes extracting and chunking PDF pages in parallel (1 = parse in the
+# ingesting process) and the pages each worker task covers
+INGEST_PDF_PROCESSES = int(os.environ.get("INGEST_PDF_PROCESSES", "1"))
+INGEST_PDF_PAGES_PER_TASK = int(os.environ.get("INGEST_PDF_PAGES_PER_TASK", "16"))
@@ -0,0 +1,213 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+import numpy as np
+from langchain.schema import Document
+
+from app.core.config import BM25_INDEX_DIR
+from app.db.file_lock import file_lock
+from app.db.local_index import matches_filter
+from app.db.namespace_aliases import namespace_aliases
+from app.db.namespace_versions import namespace_versions
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i", "in",
+    "is", "it", "me", "my", "of", "on", "or", "the", "to", "what", "when", "where", "which", "who", "with",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens without stopwords
+
+    Course codes are also emitted as one token ("EECE 230" -> "eece230") so
+    they match as a unit however the user spaces them.
+    """
+    words = TOKEN_PATTERN.findall(text.lower())
+    tokens = [word for word in words if word not in STOPWORDS]
+    for subject, number in zip(words, words[1:]):
+        if subject.isalpha() and len(subject) in (3, 4) and number[:3].isdigit():
+            tokens.append(subject + number)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over the chunks of one namespace.
+
+    Documents keep their vector id, text and metadata, so sparse results can
+    be fused with dense results by id and returned as LangChain documents.
+    Postings are (re)built lazily after the documents change.
+
+    Ingestions of different documents into one namespace share its file, so
+    changes are also recorded and save() replays them onto what is on disk.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[Dict[str, Any]] = []
+        self._postings: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None
+        self._lengths = np.empty(0, dtype=np.float32)
+        # Changes since the last load or save, as (method name, arguments)
+        self._changes: List[Tuple[str, tuple]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, chunk_id: str, text: str, metadata: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            document = {"id": chunk_id, "text": text, "metadata": dict(metadata or {})}
+            self.documents.append(document)
+            self._changes.append(("add", (chunk_id, text, document["metadata"])))
+            self._postings = None
+
+    def add_documents(self, ids: Sequence[str], documents: Sequence[Document]) -> int:
+        """Index uploaded chunks under the vector ids returned by the upload"""
+        for chunk_id, document in zip(ids, documents):
+            # The vector store upload copies the chunk text into its metadata; keep it once
+            metadata = {key: value for key, value in document.metadata.items() if key != "text"}
+            self.add(chunk_id, document.page_content, metadata)
+        return len(ids)
+
+    def remove_source(self, source: str) -> int:
+        """Drop the chunks of one source document (before re-ingesting it)"""
+        with self._lock:
+            # Loader chunks carry the document's path as their source, the others its file name
+            kept = [document for document in self.documents
+                    if os.path.basename(str(document["metadata"].get("source", ""))) != source]
+            removed = len(self.documents) - len(kept)
+            self.documents = kept
+            self._changes.append(("remove_source", (source,)))
+            self._postings = None
+        return removed
+
+    def _build(self):
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = np.empty(len(self.documents), dtype=np.float32)
+        for position, document in enumerate(self.documents):
+            tokens = tokenize(document["text"])
+            lengths[position] = len(tokens)
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[position] = counts.get(position, 0) + 1
+        self._postings = {
+            token: (np.fromiter(counts.keys(), dtype=np.int32, count=len(counts)),
+                    np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+            for token, counts in postings.items()
+        }
+        self._lengths = lengths
+
+    def search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Score the namespace's chunks against a query
+
+        Returns:
+            Up to k (document, score) pairs with a positive score, best first
+        """
+        with self._lock:
+            if self._postings is None:
+                self._build()
+            postings, lengths, documents = self._postings, self._lengths, self.documents
+        if not documents:
+            return []
+
+        total = len(documents)
+        average_length = float(lengths.mean()) or 1.0
+        norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+        scores = np.zeros(total, dtype=np.float32)
+        for token in set(tokenize(query)):
+            if token not in postings:
+                continue
+            rows, frequencies = postings[token]
+            idf = math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + norms[rows])
+
+        candidates = np.flatnonzero(scores > 0)
+        if filter:
+            candidates = np.array([row for row in candidates if matches_filter(documents[row]["metadata"], filter)],
+                                  dtype=np.int64)
+        if not len(candidates):
+            return []
+        top = candidates[np.argsort(-scores[candidates], kind="stable")[:k]]
+        return [(documents[row], float(scores[row])) for row in top]
+
+    def save(self, path: str):
+        """
+        Apply this index's changes to the file (atomically replacing it)
+
+        The changes made since the last load or save are replayed, under a
+        file lock, onto the chunks currently saved, so chunks saved by another
+        ingestion in the meantime are kept. This index then holds the merged chunks.
+        """
+        with file_lock(path), self._lock:
+            current = BM25Index.load(path)
+            for name, args in self._changes:
+                getattr(current, name)(*args)
+            data = {"version": 1, "k1": self.k1, "b": self.b, "documents": current.documents}
+            temporary = f"{path}.tmp-{os.getpid()}"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temporary, path)
+            self.documents = current.documents
+            self._changes = []
+            self._postings = None
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Load an index written by save(); a missing file gives an empty index"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data.get("k1", 1.5), b=data.get("b", 0.75))
+        index.documents = data.get("documents", [])
+        return index
+
+
+def bm25_index_path(namespace: str, directory: str = BM25_INDEX_DIR) -> str:
+    return os.path.join(directory, f"{namespace}.json")
+
+
+def missing_bm25_indexes(namespaces: Sequence[str], directory: str = BM25_INDEX_DIR) -> List[str]:
+    """Namespaces without a BM25 index file for the physical namespace serving them"""
+    return [namespace for namespace in namespaces
+            if not os.path.exists(bm25_index_path(namespace_aliases.resolve(namespace), directory))]
+
+
+_indexes: Dict[str, Tuple[int, Optional[BM25Index]]] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_bm25_index(namespace: str) -> Optional[BM25Index]:
+    """
+    Return the namespace's BM25 index from BM25_INDEX_DIR, or None if it was never built
+
+    The index is reloaded after ingestion bumps the namespace's version, and is
+    read from the file of the physical namespace currently serving it.
+    """
+    version = namespace_versions.get(namespace)
+    with _indexes_lock:
+        loaded = _indexes.get(namespace)
+        if loaded is None or loaded[0] != version:
+            path = bm25_index_path(namespace_aliases.resolve(namespace))
+            index = None
+            if os.path.exists(path):
+                try:
+                    index = BM25Index.load(path)
+                    logger.info(f"Loaded BM25 index for '{namespace}' with {len(index)} chunks")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not load BM25 index {path}: {str(e)}")
+            loaded = _indexes[namespace] = (version, index)
+        return loaded[1]
@@ -0,0 +1,267 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from langchain.schema import Document
+
+from app.core.config import COURSE_INDEX_PATH, NAMESPACE_VERSION_CHECK_SECONDS
+from app.db.file_lock import file_lock
+from app.db.namespace_aliases import namespace_aliases
+from app.services.agent_index_wrapper import namespace_registry
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Subject prefixes recognized in free text even before any course of that
+# subject has been indexed (codes of indexed subjects are always recognized)
+COURSE_SUBJECTS = {
+    "EECE", "CHEN", "PETR", "MECH", "CIVE", "ENST", "INDE", "ENMG", "ARCH", "GRDS", "URPL",
+    "BMEN", "CMPS", "MATH", "STAT", "PHYS", "CHEM", "BIOL", "ENGL", "ARAB", "ECON",
+}
+
+# "EECE 230", "eece230", "MECH-310", "CHEN 311L"
+COURSE_CODE_PATTERN = re.compile(r"\b([A-Za-z]{3,4})\s*-?\s*(\d{3}[A-Za-z]?)\b")
+
+
+def normalize_course_code(code: str) -> Optional[str]:
+    """Return a course code as "SUBJ 123", or None if the text is not a course code"""
+    match = COURSE_CODE_PATTERN.fullmatch(code.strip())
+    if not match:
+        return None
+    return f"{match.group(1).upper()} {match.group(2).upper()}"
+
+
+class CourseCodeIndex:
+    """
+    Inverted index from normalized course code to the chunks describing it.
+
+    Built at ingestion time (scripts/embed_document.py) from the chunks that
+    carry `course_code` metadata, and kept per namespace so lookups respect
+    the agents' namespace permissions. Entries hold the chunk id, its text and
+    metadata, so a course lookup needs neither an embedding nor a vector query.
+
+    One file holds every namespace, and ingestions into different namespaces
+    can run at once. So changes are also recorded, and save() replays them
+    onto the file's current contents under a file lock instead of writing
+    out this process's copy.
+    """
+
+    def __init__(self):
+        self._namespaces: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        # Changes since the last load or save, as (method name, arguments)
+        self._changes: List[Tuple[str, tuple]] = []
+        self._lock = threading.Lock()
+
+    def add(self, namespace: str, course_code: str, chunk_id: str, text: str,
+            metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Index one chunk under its course code; False if the code is not valid"""
+        code = normalize_course_code(course_code)
+        if code is None:
+            return False
+        entry = {"id": chunk_id, "text": text, "metadata": dict(metadata or {})}
+        with self._lock:
+            self._namespaces.setdefault(namespace, {}).setdefault(code, []).append(entry)
+            self._changes.append(("add", (namespace, code, chunk_id, text, entry["metadata"])))
+        return True
+
+    def add_documents(self, namespace: str, ids: Sequence[str], documents: Sequence[Document]) -> int:
+        """
+        Index the uploaded chunks that have `course_code` metadata
+
+        Args:
+            namespace: Namespace the chunks were uploaded to
+            ids: Vector ids returned by the upload, in document order
+            documents: The uploaded chunks
+
+        Returns:
+            Number of chunks indexed
+        """
+        added = 0
+        for chunk_id, document in zip(ids, documents):
+            course_code = document.metadata.get("course_code")
+            # The vector store upload copies the chunk text into its metadata; keep it once
+            metadata = {key: value for key, value in document.metadata.items() if key != "text"}
+            if course_code and self.add(namespace, course_code, chunk_id, document.page_content, metadata):
+                added += 1
+        return added
+
+    def remove_source(self, namespace: str, source: str) -> int:
+        """Drop the entries of one source document (before re-ingesting it)"""
+        removed = 0
+        with self._lock:
+            codes = self._namespaces.get(namespace, {})
+            for code in list(codes):
+                # Loader chunks carry the document's path as their source, the others its file name
+                kept = [entry for entry in codes[code]
+                        if os.path.basename(str(entry["metadata"].get("source", ""))) != source]
+                removed += len(codes[code]) - len(kept)
+                if kept:
+                    codes[code] = kept
+                else:
+                    del codes[code]
+            self._changes.append(("remove_source", (namespace, source)))
+        return removed
+
+    def drop_namespace(self, namespace: str) -> int:
+        """Drop every entry of a namespace (after it was deleted from the index)"""
+        with self._lock:
+            codes = self._namespaces.pop(namespace, {})
+            self._changes.append(("drop_namespace", (namespace,)))
+        return sum(len(entries) for entries in codes.values())
+
+    def lookup(self, course_code: str, namespaces: Iterable[str]) -> List[Dict[str, Any]]:
+        """Return the indexed chunks for a course code in the given namespaces"""
+        code = normalize_course_code(course_code)
+        if code is None:
+            return []
+        with self._lock:
+            return [entry for namespace in namespaces
+                    for entry in self._namespaces.get(namespace, {}).get(code, [])]
+
+    def contains(self, course_code: str, namespace: str) -> bool:
+        return bool(self.lookup(course_code, [namespace]))
+
+    def subjects(self) -> set:
+        """Subject prefixes with at least one indexed course"""
+        with self._lock:
+            return {code.split()[0] for codes in self._namespaces.values() for code in codes}
+
+    def find_course_codes(self, text: str) -> List[str]:
+        """Return the normalized course codes mentioned in text, in order, for recognized subjects"""
+        subjects = COURSE_SUBJECTS | self.subjects()
+        codes = []
+        for match in COURSE_CODE_PATTERN.finditer(text):
+            code = f"{match.group(1).upper()} {match.group(2).upper()}"
+            if match.group(1).upper() in subjects and code not in codes:
+                codes.append(code)
+        return codes
+
+    def save(self, path: str):
+        """
+        Apply this index's changes to the file (atomically replacing it)
+
+        The file is re-read under a lock and the changes made since the last
+        load or save are replayed onto it, so entries saved by other
+        processes in the meantime are kept. This index then holds the merged
+        contents.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with file_lock(path), self._lock:
+            current = CourseCodeIndex.load(path)
+            for name, args in self._changes:
+                getattr(current, name)(*args)
+            data = {"version": 1, "namespaces": current._namespaces}
+            temporary = f"{path}.tmp-{os.getpid()}"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temporary, path)
+            self._namespaces = current._namespaces
+            self._changes = []
+
+    @classmethod
+    def load(cls, path: str) -> "CourseCodeIndex":
+        """Load an index written by save(); a missing file gives an empty index"""
+        index = cls()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                index._namespaces = json.load(f).get("namespaces", {})
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                namespace: {"courses": len(codes), "chunks": sum(len(entries) for entries in codes.values())}
+                for namespace, codes in self._namespaces.items()
+            }
+
+
+_course_index: Optional[CourseCodeIndex] = None
+_course_index_mtime: Optional[int] = None
+_course_index_checked_at = float("-inf")
+_course_index_lock = threading.Lock()
+
+
+def get_course_index() -> CourseCodeIndex:
+    """
+    Return the shared course index, loading COURSE_INDEX_PATH on first use
+
+    The file's modification time is checked at most every
+    NAMESPACE_VERSION_CHECK_SECONDS and the index reloaded when it changed,
+    so a namespace version built after startup is served once its alias is swapped.
+    A missing file is logged once and gives an empty index.
+    """
+    global _course_index, _course_index_mtime, _course_index_checked_at
+    now = time.monotonic()
+    if _course_index is not None and now - _course_index_checked_at < NAMESPACE_VERSION_CHECK_SECONDS:
+        return _course_index
+    with _course_index_lock:
+        if _course_index is not None and now - _course_index_checked_at < NAMESPACE_VERSION_CHECK_SECONDS:
+            return _course_index
+        _course_index_checked_at = now
+        try:
+            mtime = os.stat(COURSE_INDEX_PATH).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if _course_index is None or mtime != _course_index_mtime:
+            if mtime is None:
+                logger.warning(f"Course index {COURSE_INDEX_PATH} not found; course lookups fall back to "
+                               f"vector search")
+            try:
+                _course_index = CourseCodeIndex.load(COURSE_INDEX_PATH)
+                logger.info(f"Loaded course index from {COURSE_INDEX_PATH}: {_course_index.stats()}")
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load course index from {COURSE_INDEX_PATH}: {str(e)}")
+                if _course_index is None:
+                    _course_index = CourseCodeIndex()
+            _course_index_mtime = mtime
+    return _course_index
+
+
+def resolve_course_code(text: str, namespace: str, subjects: Sequence[str] = ()) -> Optional[str]:
+    """
+    Pick the course code an agent should look up
+
+    Args:
+        text: The user's message
+        namespace: The agent's namespace for course documents
+        subjects: Subjects the agent treats as course lookups even if not indexed (e.g. "EECE")
+
+    Returns:
+        The first mentioned code that is indexed in the namespace or belongs to one of the subjects
+    """
+    index = get_course_index()
+    namespace = namespace_aliases.resolve(namespace)
+    for code in index.find_course_codes(text):
+        if code.split()[0] in subjects or index.contains(code, namespace):
+            return code
+    return None
+
+
+def lookup_course_documents(course_code: str, agent_id: str, namespace: str, k: int = 5) -> List[Document]:
+    """
+    Fetch the chunks describing a course with a dictionary lookup
+
+    Args:
+        course_code: Course code as written by the user ("eece230" works)
+        agent_id: Agent doing the lookup; it must have access to the namespace
+        namespace: Namespace the course documents were ingested into
+        k: Maximum number of chunks to return
+
+    Returns:
+        LangChain documents, or an empty list if the course is not indexed
+    """
+    from app.services.namespace_config import ensure_agent_namespaces
+
+    ensure_agent_namespaces()
+    if not namespace_registry.has_namespace_access(agent_id, namespace):
+        logger.warning(f"Agent '{agent_id}' cannot read course documents from namespace '{namespace}'")
+        return []
+    entries = get_course_index().lookup(course_code, [namespace_aliases.resolve(namespace)])[:k]
+    return [Document(id=entry["id"], page_content=entry["text"], metadata=dict(entry["metadata"]))
+            for entry in entries]
@@ -0,0 +1,207 @@
+from typing import Any, Dict, List, Optional, Sequence
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.services.ttl_cache import TTLLRUCache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class DiskEmbeddingStore:
+    """SQLite table of embeddings keyed by text hash, shared by every worker on the host"""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, created_at REAL, vector BLOB)"
+            )
+            if ttl_seconds:
+                self._conn.execute("DELETE FROM embeddings WHERE created_at < ?", (time.time() - ttl_seconds,))
+            self._conn.commit()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, created_at, vector FROM embeddings WHERE key IN ({placeholders})", list(keys)
+            ).fetchall()
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds else None
+        return {key: np.frombuffer(vector, dtype=np.float32) for key, created_at, vector in rows
+                if cutoff is None or created_at >= cutoff}
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, created_at, vector) VALUES (?, ?, ?)",
+                [(key, now, vector.tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings client that remembers the vectors it computed.
+
+    Lookups go to a process-wide LRU+TTL cache keyed by a hash of the model
+    and text, then to an optional SQLite tier, and only then to the wrapped
+    client. Misses of one batch are embedded in a single call. Vectors are
+    held as float32 arrays to keep the cache small.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = 5000, ttl_seconds: Optional[float] = None,
+                 disk_path: str = ""):
+        """
+        Args:
+            embeddings: Client that computes embeddings on a miss
+            max_entries: Vectors kept in memory before LRU eviction
+            ttl_seconds: Lifetime of cached vectors in both tiers; None keeps them until evicted
+            disk_path: SQLite file for the disk tier; empty disables it
+        """
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", "") or ""
+        self._memory = TTLLRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._disk = None
+        if disk_path:
+            try:
+                self._disk = DiskEmbeddingStore(disk_path, ttl_seconds)
+            except sqlite3.Error as e:
+                logger.error(f"Could not open embedding cache {disk_path}, using memory only: {str(e)}")
+        self._counter_lock = threading.Lock()
+        self.computed = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _count(self, computed: int = 0, memory_hits: int = 0, disk_hits: int = 0):
+        with self._counter_lock:
+            self.computed += computed
+            self.memory_hits += memory_hits
+            self.disk_hits += disk_hits
+
+    def _split(self, texts: List[str]):
+        """Hash the texts and collect the vectors already in memory"""
+        keys = [self._key(text) for text in texts]
+        found = {}
+        for key in keys:
+            vector = self._memory.get(key)
+            if vector is not None:
+                found[key] = vector
+        return keys, found, len(found)
+
+    def _read_disk(self, keys: List[str], found: Dict[str, np.ndarray]) -> int:
+        """Add disk-tier hits for the keys missing from found; returns the number of hits"""
+        wanted = [key for key in keys if key not in found]
+        if self._disk is None or not wanted:
+            return 0
+        try:
+            from_disk = self._disk.get_many(wanted)
+        except sqlite3.Error as e:
+            logger.error(f"Embedding cache read failed: {str(e)}")
+            return 0
+        for key, vector in from_disk.items():
+            self._memory.put(key, vector)
+        found.update(from_disk)
+        return len(from_disk)
+
+    @staticmethod
+    def _missing(texts: List[str], keys: List[str], found: Dict[str, np.ndarray]) -> Dict[str, str]:
+        """Unique key -> text pairs still to be embedded, in input order"""
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return missing
+
+    def _save(self, keys: Sequence[str], vectors: Sequence[Sequence[float]]) -> Dict[str, np.ndarray]:
+        computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(keys, vectors)}
+        for key, vector in computed.items():
+            self._memory.put(key, vector)
+        if self._disk is not None:
+            try:
+                self._disk.put_many(computed)
+            except sqlite3.Error as e:
+                logger.error(f"Embedding cache write failed: {str(e)}")
+        return computed
+
+    async def _off_loop(self, function, *args):
+        """Run disk-tier work in the thread pool; memory-only calls stay inline"""
+        if self._disk is None:
+            return function(*args)
+        return await asyncio.to_thread(function, *args)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, memory_hits = self._split(texts)
+        disk_hits = self._read_disk(keys, found)
+        missing = self._missing(texts, keys, found)
+        if missing:
+            found.update(self._save(list(missing), self.embeddings.embed_documents(list(missing.values()))))
+        self._count(computed=len(missing), memory_hits=memory_hits, disk_hits=disk_hits)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        keys, found, memory_hits = self._split([text])
+        disk_hits = self._read_disk(keys, found)
+        if not found:
+            found.update(self._save(keys, [self.embeddings.embed_query(text)]))
+        self._count(computed=1 - memory_hits - disk_hits, memory_hits=memory_hits, disk_hits=disk_hits)
+        return found[keys[0]].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, memory_hits = self._split(texts)
+        disk_hits = await self._off_loop(self._read_disk, keys, found)
+        missing = self._missing(texts, keys, found)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            found.update(await self._off_loop(self._save, list(missing), vectors))
+        self._count(computed=len(missing), memory_hits=memory_hits, disk_hits=disk_hits)
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        keys, found, memory_hits = self._split([text])
+        disk_hits = await self._off_loop(self._read_disk, keys, found)
+        if not found:
+            vector = await self.embeddings.aembed_query(text)
+            found.update(await self._off_loop(self._save, keys, [vector]))
+        self._count(computed=1 - memory_hits - disk_hits, memory_hits=memory_hits, disk_hits=disk_hits)
+        return found[keys[0]].tolist()
+
+    def stats(self) -> Dict[str, Any]:
+        """Embeddings computed versus served from each cache tier"""
+        served = self.memory_hits + self.disk_hits
+        requested = served + self.computed
+        return {
+            "computed": self.computed,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "hit_ratio": round(served / requested, 4) if requested else 0.0,
+            "memory": self._memory.stats(),
+            "disk_entries": len(self._disk) if self._disk is not None else None,
+        }
@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+import os
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; concurrent writers are not serialized there
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on `<path>.lock`, shared by every process updating the file at `path`"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
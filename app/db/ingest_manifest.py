@@ -0,0 +1,107 @@
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from langchain.schema import Document
+
+from app.core.config import INGEST_MANIFEST_DIR
+from app.db.file_lock import file_lock
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def content_hash(document: Document) -> str:
+    """Hash of a chunk's text and metadata; a change to either makes it a new chunk"""
+    metadata = json.dumps(document.metadata, sort_keys=True, default=str)
+    return hashlib.sha256(f"{document.page_content}\0{metadata}".encode("utf-8")).hexdigest()
+
+
+def chunk_id(source: str, document: Document) -> str:
+    """Deterministic vector id of a chunk: the same chunk of the same source always gets the same id"""
+    return hashlib.sha256(f"{source}\0{content_hash(document)}".encode("utf-8")).hexdigest()[:40]
+
+
+def manifest_path(namespace: str, directory: str = INGEST_MANIFEST_DIR) -> str:
+    return os.path.join(directory, f"{namespace or '_default'}.json")
+
+
+def delete_manifest(namespace: str, directory: str = INGEST_MANIFEST_DIR) -> bool:
+    """Forget a namespace's manifest after all its vectors were deleted"""
+    path = manifest_path(namespace, directory)
+    if not os.path.exists(path):
+        return False
+    os.remove(path)
+    return True
+
+
+class IngestManifest:
+    """
+    Record of the chunk ids live in a namespace, per source document.
+
+    Ingestion compares the ids of a document's freshly built chunks with the
+    ones recorded for it, embeds and upserts only the new ones and deletes
+    those that disappeared.
+
+    Documents of one namespace can be ingested at once, so the sources set
+    since the last load or save are recorded and save() merges them into the
+    file rather than overwriting it.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Dict[str, Any]] = {}
+        # Sources set since the last load or save, as (source, chunk ids)
+        self._changes: List[Tuple[str, List[str]]] = []
+        self._lock = threading.Lock()
+
+    def chunk_ids(self, source: str) -> List[str]:
+        with self._lock:
+            return list(self._sources.get(source, {}).get("chunks", []))
+
+    def set_chunk_ids(self, source: str, ids: List[str]):
+        with self._lock:
+            if ids:
+                self._sources[source] = {"chunks": list(ids), "updated_at": time.time()}
+            else:
+                self._sources.pop(source, None)
+            self._changes.append((source, list(ids)))
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            return list(self._sources)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entry["chunks"]) for entry in self._sources.values())
+
+    def save(self, path: str):
+        """
+        Apply the sources set since the last load or save to the file (atomically replacing it)
+
+        The file is re-read under a lock so sources saved by other ingestions
+        in the meantime are kept; this manifest then holds the merged contents.
+        """
+        with file_lock(path), self._lock:
+            current = IngestManifest.load(path)
+            for source, ids in self._changes:
+                current.set_chunk_ids(source, ids)
+            data = {"version": 1, "sources": current._sources}
+            temporary = f"{path}.tmp-{os.getpid()}"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temporary, path)
+            self._sources = current._sources
+            self._changes = []
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "IngestManifest":
+        """Load a manifest written by save(); a missing file gives an empty manifest"""
+        manifest = cls()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                manifest._sources = json.load(f).get("sources", {})
+        return manifest
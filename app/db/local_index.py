@@ -0,0 +1,517 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+import logging
+import threading
+
+import numpy as np
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+SUPPORTED_METRICS = ("cosine", "dotproduct")
+
+# Filter masks kept per namespace; agents reuse a handful of filters
+MAX_CACHED_FILTER_MASKS = 64
+
+
+def _as_list(value) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+def _compare(value, operator: str, operand) -> bool:
+    """Evaluate one Pinecone filter operator against a metadata value"""
+    if operator == "$exists":
+        return (value is not None) == bool(operand)
+    if value is None:
+        return operator in ("$ne", "$nin")
+    # List-valued metadata matches when any element matches, as in Pinecone
+    values = _as_list(value)
+    if operator == "$eq":
+        return operand in values
+    if operator == "$ne":
+        return operand not in values
+    if operator == "$in":
+        return any(item in operand for item in values)
+    if operator == "$nin":
+        return not any(item in operand for item in values)
+    try:
+        if operator == "$gt":
+            return value > operand
+        if operator == "$gte":
+            return value >= operand
+        if operator == "$lt":
+            return value < operand
+        if operator == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported metadata filter operator '{operator}'")
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Check a metadata dict against a Pinecone-style metadata filter
+
+    Supports implicit equality ({"track": "cse"}), $eq, $ne, $in, $nin, $gt,
+    $gte, $lt, $lte, $exists and the $and / $or combinators.
+    """
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            if not all(_compare(value, operator, operand) for operator, operand in condition.items()):
+                return False
+        elif not _compare(metadata.get(key), "$eq", condition):
+            return False
+    return True
+
+
+class _CompletedRequest:
+    """Result handle for async_req=True calls, which complete immediately in process"""
+
+    def __init__(self, result):
+        self._result = result
+
+    def get(self, timeout: Optional[float] = None):
+        return self._result
+
+
+class NamespaceStore:
+    """Vectors of one namespace: a growable float32 matrix plus ids and metadata"""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.metadata: List[Dict[str, Any]] = []
+        self._matrix = np.empty((0, dimension), dtype=np.float32)
+        self._inverse_norms = np.empty(0, dtype=np.float32)
+        self._masks: Dict[str, np.ndarray] = {}
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[:len(self.ids)]
+
+    @property
+    def inverse_norms(self) -> np.ndarray:
+        return self._inverse_norms[:len(self.ids)]
+
+    def _reserve(self, size: int):
+        if size <= self._matrix.shape[0]:
+            return
+        capacity = max(size, 2 * self._matrix.shape[0], 64)
+        matrix = np.empty((capacity, self.dimension), dtype=np.float32)
+        matrix[:len(self.ids)] = self.matrix
+        inverse_norms = np.empty(capacity, dtype=np.float32)
+        inverse_norms[:len(self.ids)] = self.inverse_norms
+        self._matrix, self._inverse_norms = matrix, inverse_norms
+
+    def filter_mask(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Boolean row mask for a metadata filter, cached until the namespace changes"""
+        key = repr(filter)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter((matches_filter(metadata, filter) for metadata in self.metadata),
+                               dtype=bool, count=len(self.ids))
+            if len(self._masks) >= MAX_CACHED_FILTER_MASKS:
+                self._masks.pop(next(iter(self._masks)))
+            self._masks[key] = mask
+        return mask
+
+    def _before_write(self):
+        """Called before every mutation; cached filter masks go stale"""
+        self._masks.clear()
+
+    def set_metadata(self, row: int, metadata: Dict[str, Any]):
+        self._before_write()
+        self.metadata[row] = metadata
+
+    def upsert(self, vector_id: str, values: np.ndarray, metadata: Dict[str, Any]):
+        self._before_write()
+        row = self.rows.get(vector_id)
+        if row is None:
+            row = len(self.ids)
+            self._reserve(row + 1)
+            self.ids.append(vector_id)
+            self.metadata.append(metadata)
+            self.rows[vector_id] = row
+        else:
+            self.metadata[row] = metadata
+        self.set_values(row, values)
+
+    def set_values(self, row: int, values: np.ndarray):
+        self._before_write()
+        norm = float(np.linalg.norm(values))
+        self._matrix[row] = values
+        self._inverse_norms[row] = 1.0 / norm if norm else 0.0
+
+    def delete(self, vector_id: str) -> bool:
+        """Remove a vector by moving the last row into its slot"""
+        if vector_id not in self.rows:
+            return False
+        self._before_write()
+        row = self.rows.pop(vector_id)
+        last = len(self.ids) - 1
+        if row != last:
+            moved_id = self.ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._inverse_norms[row] = self._inverse_norms[last]
+            self.ids[row] = moved_id
+            self.metadata[row] = self.metadata[last]
+            self.rows[moved_id] = row
+        self.ids.pop()
+        self.metadata.pop()
+        return True
+
+
+class LocalVectorIndex:
+    """
+    In-process vector index with the subset of the Pinecone Index interface
+    used by PineconeVectorStore and AgentRestrictedIndex.
+
+    Each namespace holds its vectors in one float32 matrix, so a query is a
+    single matrix-vector product followed by a partial sort, and metadata
+    filters are evaluated locally. Results are plain dicts shaped like
+    Pinecone responses ({"matches": [{"id", "score", "values", "metadata"}]}).
+    """
+
+    def __init__(self, dimension: Optional[int] = None, metric: str = "cosine"):
+        if metric not in SUPPORTED_METRICS:
+            raise ValueError(f"Unsupported metric '{metric}', expected one of {SUPPORTED_METRICS}")
+        self.dimension = dimension
+        self.metric = metric
+        self._namespaces: Dict[str, NamespaceStore] = {}
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace: Optional[str], create: bool = False) -> Optional[NamespaceStore]:
+        namespace = namespace or ""
+        with self._lock:
+            existing = self._namespaces.get(namespace)
+            if existing is None and create:
+                if self.dimension is None:
+                    raise ValueError("Vector dimension unknown; upsert a vector first")
+                existing = self._namespaces[namespace] = NamespaceStore(self.dimension)
+            return existing
+
+    def _vector(self, values: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(values, dtype=np.float32).reshape(-1)
+        if self.dimension is None:
+            self.dimension = vector.shape[0]
+        elif vector.shape[0] != self.dimension:
+            raise ValueError(f"Vector dimension {vector.shape[0]} does not match index dimension {self.dimension}")
+        return vector
+
+    def attach_namespace(self, namespace: str, store: NamespaceStore):
+        """Serve a namespace from a prebuilt store (e.g. a memory-mapped snapshot), replacing its contents"""
+        if self.dimension is None:
+            self.dimension = store.dimension
+        elif store.dimension != self.dimension:
+            raise ValueError(f"Namespace '{namespace}' has dimension {store.dimension}, index has {self.dimension}")
+        with self._lock:
+            self._namespaces[namespace] = store
+
+    def export_namespace(self, namespace: str) -> tuple:
+        """
+        Return a consistent copy of a namespace
+
+        Returns:
+            (ids, vectors, inverse_norms, metadata) with float32 arrays of the stored rows
+        """
+        target = self._namespace(namespace)
+        if target is None:
+            raise KeyError(f"Namespace '{namespace}' not found in the local index")
+        with target.lock:
+            return (list(target.ids), np.array(target.matrix), np.array(target.inverse_norms),
+                    [dict(metadata) for metadata in target.metadata])
+
+    @staticmethod
+    def _parse_record(record) -> tuple:
+        if isinstance(record, dict):
+            return str(record["id"]), record["values"], dict(record.get("metadata") or {})
+        if isinstance(record, (list, tuple)):
+            metadata = record[2] if len(record) > 2 else None
+            return str(record[0]), record[1], dict(metadata or {})
+        # Pinecone Vector objects
+        return str(record.id), record.values, dict(getattr(record, "metadata", None) or {})
+
+    def upsert(self, vectors: Iterable[Any], namespace: Optional[str] = None, batch_size: Optional[int] = None,
+               show_progress: Optional[bool] = None, **kwargs) -> Dict[str, int]:
+        """
+        Insert or overwrite vectors
+
+        Args:
+            vectors: (id, values, metadata) tuples, {"id", "values", "metadata"} dicts or Pinecone Vectors
+            namespace: Target namespace ("" by default)
+
+        Returns:
+            {"upserted_count": n}, like Pinecone (wrapped in a handle when async_req=True)
+        """
+        records = [self._parse_record(record) for record in vectors]
+        if records:
+            parsed = [(vector_id, self._vector(values), metadata) for vector_id, values, metadata in records]
+            target = self._namespace(namespace, create=True)
+            with target.lock:
+                for vector_id, values, metadata in parsed:
+                    target.upsert(vector_id, values, metadata)
+        result = {"upserted_count": len(records)}
+        # PineconeVectorStore.add_texts upserts with async_req=True and waits on .get()
+        return _CompletedRequest(result) if kwargs.get("async_req") else result
+
+    def _scores(self, target: NamespaceStore, vector: np.ndarray) -> np.ndarray:
+        scores = target.matrix @ vector
+        if self.metric == "cosine":
+            norm = float(np.linalg.norm(vector))
+            scores = scores * target.inverse_norms * (1.0 / norm if norm else 0.0)
+        return scores
+
+    def _filter_mask(self, target: NamespaceStore, filter: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        return target.filter_mask(filter) if filter else None
+
+    def query(self, vector: Optional[Sequence[float]] = None, id: Optional[str] = None, top_k: Optional[int] = None,
+              namespace: Optional[str] = None, filter: Optional[Dict[str, Any]] = None,
+              include_values: Optional[bool] = None, include_metadata: Optional[bool] = None,
+              **kwargs) -> Dict[str, Any]:
+        """
+        Exact top-k search in one namespace
+
+        Args:
+            vector: Query vector (a single-row nested list is accepted too)
+            id: Query by the stored vector with this id instead
+            top_k: Number of matches to return
+            filter: Pinecone-style metadata filter
+        """
+        top_k = top_k or 10
+        namespace = namespace or ""
+        target = self._namespace(namespace)
+        if target is None:
+            return {"matches": [], "namespace": namespace}
+
+        with target.lock:
+            if not len(target):
+                return {"matches": [], "namespace": namespace}
+            if vector is None:
+                if id not in target.rows:
+                    return {"matches": [], "namespace": namespace}
+                query_vector = target.matrix[target.rows[id]].copy()
+            else:
+                query_vector = self._vector(vector)
+
+            scores = self._scores(target, query_vector)
+            mask = self._filter_mask(target, filter)
+            candidates = np.flatnonzero(mask) if mask is not None else None
+            if candidates is not None:
+                scores = scores[candidates]
+
+            k = min(top_k, scores.shape[0])
+            if k == 0:
+                return {"matches": [], "namespace": namespace}
+            top = np.argpartition(-scores, k - 1)[:k] if k < scores.shape[0] else np.arange(scores.shape[0])
+            top = top[np.argsort(-scores[top], kind="stable")]
+
+            matches = []
+            for position in top:
+                row = int(candidates[position]) if candidates is not None else int(position)
+                match = {"id": target.ids[row], "score": float(scores[position])}
+                if include_values:
+                    match["values"] = target.matrix[row].tolist()
+                if include_metadata:
+                    # Copy so callers (PineconeVectorStore pops the text key) cannot mutate the index
+                    match["metadata"] = dict(target.metadata[row])
+                matches.append(match)
+        return {"matches": matches, "namespace": namespace}
+
+    def query_namespaces(self, vector: Sequence[float], namespaces: List[str], metric: Optional[str] = None,
+                         top_k: Optional[int] = None, filter: Optional[Dict[str, Any]] = None,
+                         include_values: Optional[bool] = None, include_metadata: Optional[bool] = None,
+                         **kwargs) -> Dict[str, Any]:
+        """Query several namespaces and merge the matches by score"""
+        top_k = top_k or 10
+        matches = []
+        for namespace in namespaces:
+            result = self.query(vector=vector, top_k=top_k, namespace=namespace, filter=filter,
+                                include_values=include_values, include_metadata=include_metadata)
+            matches.extend({**match, "namespace": namespace} for match in result["matches"])
+        matches.sort(key=lambda match: match["score"], reverse=True)
+        return {"matches": matches[:top_k]}
+
+    def fetch(self, ids: List[str], namespace: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """Return stored vectors by id"""
+        namespace = namespace or ""
+        target = self._namespace(namespace)
+        vectors = {}
+        if target is not None:
+            with target.lock:
+                for vector_id in ids:
+                    row = target.rows.get(vector_id)
+                    if row is not None:
+                        vectors[vector_id] = {
+                            "id": vector_id,
+                            "values": target.matrix[row].tolist(),
+                            "metadata": dict(target.metadata[row]),
+                        }
+        return {"vectors": vectors, "namespace": namespace}
+
+    def update(self, id: str, values: Optional[Sequence[float]] = None,
+               set_metadata: Optional[Dict[str, Any]] = None, namespace: Optional[str] = None, **kwargs) -> Dict:
+        """Replace a vector's values and/or merge new metadata fields into it"""
+        target = self._namespace(namespace)
+        if target is None:
+            return {}
+        vector = self._vector(values) if values is not None else None
+        with target.lock:
+            row = target.rows.get(id)
+            if row is None:
+                return {}
+            if vector is not None:
+                target.set_values(row, vector)
+            if set_metadata:
+                target.set_metadata(row, {**target.metadata[row], **set_metadata})
+        return {}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: Optional[bool] = None,
+               namespace: Optional[str] = None, filter: Optional[Dict[str, Any]] = None, **kwargs) -> Dict:
+        """Delete vectors by id, by metadata filter, or the whole namespace"""
+        namespace = namespace or ""
+        if delete_all:
+            with self._lock:
+                self._namespaces.pop(namespace, None)
+            return {}
+        target = self._namespace(namespace)
+        if target is None:
+            return {}
+        with target.lock:
+            if filter:
+                ids = [vector_id for vector_id, metadata in zip(target.ids, target.metadata)
+                       if matches_filter(metadata, filter)]
+            for vector_id in ids or []:
+                target.delete(vector_id)
+        return {}
+
+    def list(self, prefix: Optional[str] = None, limit: Optional[int] = None,
+             pagination_token: Optional[str] = None, namespace: Optional[str] = None, **kwargs) -> Iterator[List[str]]:
+        """Yield pages of vector ids, optionally restricted to an id prefix"""
+        target = self._namespace(namespace)
+        if target is None:
+            return
+        with target.lock:
+            ids = sorted(vector_id for vector_id in target.ids if not prefix or vector_id.startswith(prefix))
+        page_size = limit or 100
+        for start in range(0, len(ids), page_size):
+            yield ids[start:start + page_size]
+
+    def describe_index_stats(self, filter: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """Return vector counts per namespace, like Pinecone's describe_index_stats"""
+        with self._lock:
+            namespaces = dict(self._namespaces)
+        counts = {}
+        for name, target in namespaces.items():
+            with target.lock:
+                mask = self._filter_mask(target, filter)
+                counts[name] = {"vector_count": int(mask.sum()) if mask is not None else len(target)}
+        return {
+            "dimension": self.dimension,
+            "metric": self.metric,
+            "namespaces": counts,
+            "total_vector_count": sum(count["vector_count"] for count in counts.values()),
+        }
+
+
+class NamespaceRoutedIndex:
+    """
+    Index that serves some namespaces from a LocalVectorIndex and the rest
+    from a remote (Pinecone) index.
+
+    Reads on a local namespace never leave the process. Writes to a local
+    namespace go to both indexes so the remote index stays the source of truth.
+    """
+
+    def __init__(self, remote, local: LocalVectorIndex, local_namespaces: Iterable[str]):
+        self._remote = remote
+        self._local = local
+        self.local_namespaces = set(local_namespaces)
+
+    def is_local(self, namespace: Optional[str]) -> bool:
+        return (namespace or "") in self.local_namespaces
+
+    def _reader(self, namespace: Optional[str]):
+        return self._local if self.is_local(namespace) else self._remote
+
+    def query(self, *args, namespace: Optional[str] = None, **kwargs):
+        return self._reader(namespace).query(*args, namespace=namespace, **kwargs)
+
+    def query_namespaces(self, vector, namespaces: List[str], metric, top_k=None, **kwargs):
+        if all(self.is_local(namespace) for namespace in namespaces):
+            return self._local.query_namespaces(vector=vector, namespaces=namespaces, metric=metric,
+                                                top_k=top_k, **kwargs)
+        return self._remote.query_namespaces(vector=vector, namespaces=namespaces, metric=metric,
+                                             top_k=top_k, **kwargs)
+
+    def fetch(self, ids, namespace: Optional[str] = None, **kwargs):
+        return self._reader(namespace).fetch(ids=ids, namespace=namespace, **kwargs)
+
+    def list(self, *args, namespace: Optional[str] = None, **kwargs):
+        return self._reader(namespace).list(*args, namespace=namespace, **kwargs)
+
+    def upsert(self, vectors, namespace: Optional[str] = None, **kwargs):
+        if not self.is_local(namespace):
+            return self._remote.upsert(vectors=vectors, namespace=namespace, **kwargs)
+        vectors = list(vectors)
+        result = self._remote.upsert(vectors=vectors, namespace=namespace, **kwargs)
+        self._local.upsert(vectors=vectors, namespace=namespace)
+        return result
+
+    def update(self, id, namespace: Optional[str] = None, **kwargs):
+        result = self._remote.update(id=id, namespace=namespace, **kwargs)
+        if self.is_local(namespace):
+            self._local.update(id=id, namespace=namespace, **kwargs)
+        return result
+
+    def delete(self, namespace: Optional[str] = None, **kwargs):
+        result = self._remote.delete(namespace=namespace, **kwargs)
+        if self.is_local(namespace):
+            self._local.delete(namespace=namespace, **kwargs)
+        return result
+
+    def __getattr__(self, name):
+        # describe_index_stats and anything else go to the remote index
+        return getattr(self._remote, name)
+
+
+def _fetched_vectors(response) -> Dict[str, Any]:
+    vectors = response["vectors"] if isinstance(response, dict) else response.vectors
+    return vectors or {}
+
+
+def load_namespace(source, target: LocalVectorIndex, namespace: str, batch_size: int = 100) -> int:
+    """
+    Copy every vector of a namespace from another index (e.g. Pinecone) into a local index
+
+    Args:
+        source: Index supporting list() and fetch()
+        target: Local index to fill
+        namespace: Namespace to copy
+        batch_size: Number of ids fetched per request
+
+    Returns:
+        Number of vectors copied
+    """
+    copied = 0
+    for ids in source.list(namespace=namespace, limit=batch_size):
+        ids = list(ids)
+        if not ids:
+            continue
+        vectors = _fetched_vectors(source.fetch(ids=ids, namespace=namespace))
+        target.upsert(vectors=list(vectors.values()), namespace=namespace)
+        copied += len(vectors)
+    logger.info(f"Loaded {copied} vectors from namespace '{namespace}' into the local index")
+    return copied
@@ -0,0 +1,251 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from app.core.config import (
+    NAMESPACE_ALIAS_REPORT_SECONDS,
+    NAMESPACE_ALIASES_PATH,
+    NAMESPACE_VERSION_CHECK_SECONDS,
+    NAMESPACE_VERSIONS_PATH,
+)
+from app.db.file_lock import file_lock
+from app.db.namespace_versions import bump_namespace_versions
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Physical namespaces are named "<logical>@v<version>", e.g. "ece_namespace@v7"
+VERSION_SEPARATOR = "@v"
+# A server that has not reported its aliases for this long is taken to be gone
+SERVER_REPORT_MAX_AGE_SECONDS = 3 * NAMESPACE_ALIAS_REPORT_SECONDS
+
+
+def physical_namespace(logical: str, version: int) -> str:
+    return f"{logical}{VERSION_SEPARATOR}{version}"
+
+
+def parse_namespace(namespace: str) -> Tuple[str, Optional[int]]:
+    """Split a namespace into its logical name and version (None for an unversioned namespace)"""
+    logical, separator, version = namespace.rpartition(VERSION_SEPARATOR)
+    if separator and version.isdigit():
+        return logical, int(version)
+    return namespace, None
+
+
+def read_namespace_aliases(path: str = NAMESPACE_ALIASES_PATH) -> Dict[str, Any]:
+    """Read the alias file: "aliases" (logical -> physical), "building" and "retired" physical namespaces"""
+    data = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    return {
+        "aliases": data.get("aliases", {}),
+        "building": data.get("building", {}),
+        "retired": data.get("retired", {}),
+    }
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp-{os.getpid()}"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump({**data, "updated_at": time.time()}, f, indent=2)
+    os.replace(temporary, path)
+
+
+def reserve_namespace_version(logical: str, path: str = NAMESPACE_ALIASES_PATH) -> str:
+    """
+    Pick the physical namespace the next version of a logical namespace is built in
+
+    The name is recorded as being built so later reservations do not reuse it.
+
+    Returns:
+        The physical namespace, e.g. "ece_namespace@v8"
+    """
+    with file_lock(path):
+        data = read_namespace_aliases(path)
+        known = [data["aliases"].get(logical, logical), *data["building"], *data["retired"]]
+        versions = [version for name, version in map(parse_namespace, known) if name == logical and version]
+        physical = physical_namespace(logical, max(versions, default=0) + 1)
+        data["building"][physical] = {"logical": logical, "created_at": time.time()}
+        _write_json(path, data)
+    return physical
+
+
+def _swap(data: Dict[str, Any], logical: str, physical: str) -> str:
+    previous = data["aliases"].get(logical, logical)
+    data["aliases"][logical] = physical
+    data["building"].pop(physical, None)
+    data["retired"].pop(physical, None)
+    if previous != physical:
+        data["retired"][previous] = {"logical": logical, "retired_at": time.time()}
+    return previous
+
+
+def swap_namespace_alias(logical: str, physical: str, path: str = NAMESPACE_ALIASES_PATH,
+                         versions_path: str = NAMESPACE_VERSIONS_PATH) -> str:
+    """
+    Point a logical namespace at a physical one
+
+    The alias file is replaced in one rename, so servers see either the old or
+    the new mapping. The previously served namespace is retired (kept for
+    rollback until garbage collected) and the logical namespace's version is
+    bumped so cached search results and BM25 indexes are reloaded.
+
+    Returns:
+        The physical namespace served before the swap
+    """
+    with file_lock(path):
+        data = read_namespace_aliases(path)
+        previous = _swap(data, logical, physical)
+        _write_json(path, data)
+    bump_namespace_versions([logical], versions_path)
+    logger.info(f"Namespace '{logical}' now served from '{physical}' (was '{previous}')")
+    return previous
+
+
+def rollback_namespace_alias(logical: str, path: str = NAMESPACE_ALIASES_PATH,
+                             versions_path: str = NAMESPACE_VERSIONS_PATH) -> Optional[Tuple[str, str]]:
+    """
+    Serve the most recently retired version of a logical namespace again
+
+    Returns:
+        The physical namespaces served before and after, or None if no version is retired
+    """
+    with file_lock(path):
+        data = read_namespace_aliases(path)
+        retired = [(info["retired_at"], namespace) for namespace, info in data["retired"].items()
+                   if info["logical"] == logical]
+        if not retired:
+            return None
+        physical = max(retired)[1]
+        previous = _swap(data, logical, physical)
+        _write_json(path, data)
+    bump_namespace_versions([logical], versions_path)
+    logger.info(f"Namespace '{logical}' rolled back to '{physical}' (was '{previous}')")
+    return previous, physical
+
+
+def expired_namespaces(grace_seconds: float, path: str = NAMESPACE_ALIASES_PATH) -> Dict[str, Dict[str, Any]]:
+    """Retired physical namespaces past the grace period, with their "logical" name and retirement time"""
+    cutoff = time.time() - grace_seconds
+    return {namespace: info for namespace, info in read_namespace_aliases(path)["retired"].items()
+            if info["retired_at"] <= cutoff}
+
+
+def forget_namespaces(namespaces: List[str], path: str = NAMESPACE_ALIASES_PATH):
+    """Remove deleted physical namespaces from the retired and building lists"""
+    with file_lock(path):
+        data = read_namespace_aliases(path)
+        for namespace in namespaces:
+            data["retired"].pop(namespace, None)
+            data["building"].pop(namespace, None)
+        _write_json(path, data)
+
+
+def server_reports_dir(path: str = NAMESPACE_ALIASES_PATH) -> str:
+    """Directory next to the alias file where servers report the aliases they resolve with"""
+    return f"{os.path.splitext(path)[0]}_servers"
+
+
+def server_reports(path: str = NAMESPACE_ALIASES_PATH, max_age: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Server reports found next to the alias file (only those newer than `max_age` seconds if given)"""
+    cutoff = time.time() - max_age if max_age is not None else float("-inf")
+    directory = server_reports_dir(path)
+    if not os.path.isdir(directory):
+        return []
+    reports = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        report_path = os.path.join(directory, name)
+        try:
+            with open(report_path, encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read namespace alias report {report_path}: {str(e)}")
+            continue
+        if report["reported_at"] >= cutoff:
+            reports.append({**report, "path": report_path})
+    return reports
+
+
+def servers_resolving(namespace: str, logical: str, reports: List[Dict[str, Any]]) -> List[str]:
+    """Servers whose report resolves the logical namespace, or any other, to the given physical namespace"""
+    return [report["server"] for report in reports
+            if report["aliases"].get(logical, logical) == namespace or namespace in report["aliases"].values()]
+
+
+class NamespaceAliases:
+    """
+    Reader of the alias file mapping logical namespaces to physical ones.
+
+    Like NamespaceVersions, the file is re-read when its modification time
+    changes, checked at most every `check_seconds`. Namespaces without an
+    alias resolve to themselves, so an unversioned deployment needs no file.
+    """
+
+    def __init__(self, path: str = NAMESPACE_ALIASES_PATH, check_seconds: float = NAMESPACE_VERSION_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._aliases: Dict[str, str] = {}
+        self._mtime: Optional[int] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_seconds:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime == self._mtime:
+                return
+            try:
+                self._aliases = read_namespace_aliases(self.path)["aliases"] if mtime is not None else {}
+                self._mtime = mtime
+                logger.info(f"Loaded namespace aliases from {self.path}: {self._aliases}")
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not read namespace aliases from {self.path}: {str(e)}")
+
+    def resolve(self, namespace: Optional[str]) -> Optional[str]:
+        """Physical namespace currently serving a logical one"""
+        if not namespace:
+            return namespace
+        self._refresh()
+        return self._aliases.get(namespace, namespace)
+
+    def snapshot(self) -> Dict[str, str]:
+        self._refresh()
+        return dict(self._aliases)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Re-read the alias file and record the aliases this server now resolves with
+
+        The report is written next to the alias file, one per server process,
+        for scripts/manage_namespaces.py gc to check that no live server still
+        reads a namespace it is about to delete.
+        """
+        self._refresh(force=True)
+        server = f"{socket.gethostname()}-{os.getpid()}"
+        report = {"server": server, "aliases": self.snapshot(), "reported_at": time.time()}
+        report_path = os.path.join(server_reports_dir(self.path), f"{server}.json")
+        _write_json(report_path, report)
+        return report
+
+
+# Global reader used wherever a logical namespace is turned into index reads
+namespace_aliases = NamespaceAliases()
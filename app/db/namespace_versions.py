@@ -0,0 +1,95 @@
+from typing import Dict, Iterable, Optional
+import json
+import logging
+import os
+import threading
+import time
+
+from app.core.config import NAMESPACE_VERSIONS_PATH, NAMESPACE_VERSION_CHECK_SECONDS
+from app.db.file_lock import file_lock
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def _read_versions(path: str) -> Dict[str, int]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("namespaces", {})
+
+
+def bump_namespace_versions(namespaces: Iterable[str], path: str = NAMESPACE_VERSIONS_PATH) -> Dict[str, int]:
+    """
+    Record that the vectors of some namespaces changed
+
+    Called by the ingestion and delete scripts after they write to the index,
+    so servers drop cached search results for those namespaces. The file lock
+    keeps concurrent scripts from losing each other's bumps.
+
+    Returns:
+        The new version of each bumped namespace
+    """
+    with file_lock(path):
+        versions = _read_versions(path)
+        bumped = {}
+        for namespace in namespaces:
+            versions[namespace] = versions.get(namespace, 0) + 1
+            bumped[namespace] = versions[namespace]
+        temporary = f"{path}.tmp-{os.getpid()}"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"namespaces": versions, "updated_at": time.time()}, f)
+        os.replace(temporary, path)
+    return bumped
+
+
+class NamespaceVersions:
+    """
+    Reader of the namespace version file.
+
+    The file is re-read when its modification time changes, and its mtime is
+    checked at most every `check_seconds`, so lookups on the query path are a
+    dictionary read.
+    """
+
+    def __init__(self, path: str = NAMESPACE_VERSIONS_PATH, check_seconds: float = NAMESPACE_VERSION_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._versions: Dict[str, int] = {}
+        self._mtime: Optional[int] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_seconds:
+            return
+        with self._lock:
+            if now - self._checked_at < self.check_seconds:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime == self._mtime:
+                return
+            try:
+                self._versions = _read_versions(self.path) if mtime is not None else {}
+                self._mtime = mtime
+                logger.info(f"Loaded namespace versions from {self.path}: {self._versions}")
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not read namespace versions from {self.path}: {str(e)}")
+
+    def get(self, namespace: str) -> int:
+        """Current version of a namespace (0 if it was never bumped)"""
+        self._refresh()
+        return self._versions.get(namespace, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        self._refresh()
+        return dict(self._versions)
+
+
+# Global reader shared by the caches that depend on namespace contents
+namespace_versions = NamespaceVersions()
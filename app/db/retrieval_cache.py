@@ -0,0 +1,110 @@
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+import hashlib
+import json
+import logging
+import threading
+
+import numpy as np
+from langchain.schema import Document
+
+from app.core.config import RETRIEVAL_CACHE_ENABLED, RETRIEVAL_CACHE_MAX_ENTRIES, RETRIEVAL_CACHE_TTL_SECONDS
+from app.db.namespace_versions import NamespaceVersions, namespace_versions
+from app.services.ttl_cache import TTLLRUCache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query used in cache keys"""
+    return " ".join(query.casefold().split())
+
+
+def embedding_hash(embedding: Sequence[float]) -> str:
+    return hashlib.sha1(np.asarray(embedding, dtype=np.float32).tobytes()).hexdigest()
+
+
+def _copy(document: Document) -> Document:
+    return Document(id=document.id, page_content=document.page_content, metadata=dict(document.metadata))
+
+
+class RetrievalCache:
+    """
+    Cache of vector search results.
+
+    Keys hold the namespace and its version stamp, the normalized query (or a
+    hash of the query embedding), the filter and k. Bumping a namespace's
+    version (done by the ingestion scripts) makes its old entries unreachable;
+    they then age out through LRU eviction or the TTL.
+    """
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: Optional[float] = None, enabled: bool = True,
+                 versions: NamespaceVersions = namespace_versions):
+        self.enabled = enabled
+        self.versions = versions
+        self._cache = TTLLRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._counter_lock = threading.Lock()
+        self._namespace_counts: Dict[str, Dict[str, int]] = {}
+
+    def key(self, namespace: str, query: Optional[str] = None, embedding: Optional[Sequence[float]] = None,
+            filter: Optional[Dict[str, Any]] = None, k: int = 4, kind: str = "documents") -> Hashable:
+        """
+        Build a cache key
+
+        Args:
+            namespace: Namespace searched
+            query: Query text (used when no embedding is given)
+            embedding: Query embedding
+            filter: Metadata filter
+            k: Number of results
+            kind: What is cached ("documents", or "scored" for (document, score) pairs)
+        """
+        lookup = f"e:{embedding_hash(embedding)}" if embedding is not None else f"q:{normalize_query(query or '')}"
+        filter_key = json.dumps(filter, sort_keys=True, default=str) if filter else ""
+        return (namespace, self.versions.get(namespace), kind, lookup, filter_key, k)
+
+    def _count(self, namespace: str, outcome: str):
+        with self._counter_lock:
+            counts = self._namespace_counts.setdefault(namespace, {"hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def get(self, key: Hashable) -> Optional[List[Any]]:
+        """Return copies of the cached results, or None on a miss"""
+        results = self._cache.get(key)
+        self._count(key[0], "hits" if results is not None else "misses")
+        if results is None:
+            return None
+        return [(_copy(item[0]), item[1]) if isinstance(item, tuple) else _copy(item) for item in results]
+
+    def put(self, key: Hashable, results: Sequence[Any]):
+        # Stored as copies: callers may modify the documents they get back
+        self._cache.put(key, tuple(
+            (_copy(item[0]), item[1]) if isinstance(item, tuple) else _copy(item) for item in results
+        ))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counter_lock:
+            namespaces = {
+                namespace: {
+                    **counts,
+                    "hit_ratio": round(counts["hits"] / (counts["hits"] + counts["misses"]), 4),
+                }
+                for namespace, counts in self._namespace_counts.items()
+            }
+        return {
+            "enabled": self.enabled,
+            **self._cache.stats(),
+            "namespaces": namespaces,
+            "namespace_versions": self.versions.snapshot(),
+        }
+
+
+# Global retrieval cache shared by the agent vector stores
+retrieval_cache = RetrievalCache(
+    max_entries=RETRIEVAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=RETRIEVAL_CACHE_TTL_SECONDS or None,
+    enabled=RETRIEVAL_CACHE_ENABLED,
+)
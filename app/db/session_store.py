@@ -0,0 +1,466 @@
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.core.config import (
+    SESSION_BACKEND,
+    SESSION_DB_PATH,
+    SESSION_REDIS_URL,
+    SESSION_TTL_SECONDS,
+    SESSION_MAX_SESSIONS,
+    SESSION_CACHE_SIZE,
+    SESSION_KEEP_CHECKPOINTS,
+)
+from app.services.ttl_cache import TTLLRUCache
+
+try:
+    import redis
+except ImportError:  # Optional dependency, only needed for SESSION_BACKEND=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBackend:
+    """
+    Storage for serialized conversation sessions, one blob per thread ID.
+
+    Implementations expire sessions that were not accessed for `ttl_seconds`
+    and evict the least recently used sessions beyond `max_sessions`.
+    `shared` backends can be written by other processes, so cached copies
+    of a session must be refreshed before use.
+    """
+
+    shared = True
+
+    def get(self, thread_id: str) -> Optional[bytes]:
+        """Return the session blob (refreshing its access time), or None"""
+        raise NotImplementedError
+
+    def put(self, thread_id: str, blob: bytes):
+        """Store the session blob, evicting old sessions if over capacity"""
+        raise NotImplementedError
+
+    def delete(self, thread_id: str) -> bool:
+        """Delete a session. Returns True if it existed"""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Delete expired sessions. Returns the count removed"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Return at least the session count and the bytes held"""
+        raise NotImplementedError
+
+
+class MemorySessionBackend(SessionBackend):
+    """In-process backend on top of TTLLRUCache; bounded, but not persistent"""
+
+    shared = False
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_sessions: int = 10000):
+        self._cache = TTLLRUCache(max_entries=max_sessions, ttl_seconds=ttl_seconds)
+
+    def get(self, thread_id):
+        return self._cache.get(thread_id)
+
+    def put(self, thread_id, blob):
+        self._cache.put(thread_id, blob)
+
+    def delete(self, thread_id):
+        return self._cache.pop(thread_id) is not None
+
+    def purge_expired(self):
+        # Expired entries are dropped lazily; items() skips them
+        return 0
+
+    def stats(self):
+        blobs = [blob for _, blob in self._cache.items()]
+        return {
+            "backend": "memory",
+            "sessions": len(blobs),
+            "bytes": sum(len(blob) for blob in blobs),
+            "ttl_seconds": self._cache.ttl_seconds,
+            "max_sessions": self._cache.max_entries,
+            "evictions": self._cache.evictions,
+            "expirations": self._cache.expirations,
+        }
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """File-backed backend using SQLite in WAL mode, shareable between worker processes"""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_sessions: int = 10000):
+        """
+        Open (and create if needed) the session database.
+
+        Args:
+            path: Database file path
+            ttl_seconds: Idle time after which a session expires; None disables expiry
+            max_sessions: Maximum number of sessions kept before LRU eviction
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.evictions = 0
+        self.expirations = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "thread_id TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_accessed_at ON sessions (accessed_at)")
+
+    def _expired(self, accessed_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - accessed_at > self.ttl_seconds
+
+    def get(self, thread_id):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, accessed_at FROM sessions WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1], now):
+                self._conn.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,))
+                self.expirations += 1
+                return None
+            self._conn.execute("UPDATE sessions SET accessed_at = ? WHERE thread_id = ?", (now, thread_id))
+            return row[0]
+
+    def put(self, thread_id, blob):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (thread_id, data, size, updated_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET data = excluded.data, size = excluded.size, "
+                "updated_at = excluded.updated_at, accessed_at = excluded.accessed_at",
+                (thread_id, sqlite3.Binary(blob), len(blob), now, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            if count > self.max_sessions:
+                cursor = self._conn.execute(
+                    "DELETE FROM sessions WHERE thread_id IN ("
+                    "SELECT thread_id FROM sessions ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_sessions,),
+                )
+                self.evictions += cursor.rowcount
+
+    def delete(self, thread_id):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,))
+            return cursor.rowcount > 0
+
+    def purge_expired(self):
+        if self.ttl_seconds is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM sessions WHERE accessed_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self.expirations += cursor.rowcount
+            return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            sessions, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "sessions": sessions,
+            "bytes": size,
+            "ttl_seconds": self.ttl_seconds,
+            "max_sessions": self.max_sessions,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisSessionBackend(SessionBackend):
+    """
+    Backend speaking the Redis protocol, shared by every worker and replica.
+
+    Each session is a key with a sliding expiry; a sorted set of access
+    times drives LRU eviction and a hash tracks blob sizes for stats.
+    """
+
+    def __init__(self, url: Optional[str] = None, client=None, prefix: str = "advisor:sessions",
+                 ttl_seconds: Optional[float] = None, max_sessions: int = 10000):
+        """
+        Connect to Redis.
+
+        Args:
+            url: Redis URL, used when no client is given
+            client: Optional ready client (anything implementing the redis-py API)
+            prefix: Key prefix for all session keys
+            ttl_seconds: Idle time after which a session expires; None disables expiry
+            max_sessions: Maximum number of sessions kept before LRU eviction
+        """
+        if client is None:
+            if redis is None:
+                raise ImportError("SESSION_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.evictions = 0
+        self.expirations = 0
+        self._index_key = f"{prefix}:index"
+        self._sizes_key = f"{prefix}:sizes"
+
+    def _key(self, thread_id: str) -> str:
+        return f"{self.prefix}:data:{thread_id}"
+
+    def _forget(self, pipe, thread_ids):
+        pipe.delete(*[self._key(thread_id) for thread_id in thread_ids])
+        pipe.zrem(self._index_key, *thread_ids)
+        pipe.hdel(self._sizes_key, *thread_ids)
+
+    def get(self, thread_id):
+        blob = self.client.get(self._key(thread_id))
+        pipe = self.client.pipeline()
+        if blob is None:
+            # Expired by Redis (or never stored); drop any index leftovers
+            pipe.zrem(self._index_key, thread_id)
+            pipe.hdel(self._sizes_key, thread_id)
+        else:
+            pipe.zadd(self._index_key, {thread_id: time.time()})
+            if self.ttl_seconds is not None:
+                pipe.expire(self._key(thread_id), int(self.ttl_seconds))
+        pipe.execute()
+        return blob
+
+    def put(self, thread_id, blob):
+        pipe = self.client.pipeline()
+        if self.ttl_seconds is not None:
+            pipe.set(self._key(thread_id), blob, ex=int(self.ttl_seconds))
+        else:
+            pipe.set(self._key(thread_id), blob)
+        pipe.zadd(self._index_key, {thread_id: time.time()})
+        pipe.hset(self._sizes_key, thread_id, len(blob))
+        pipe.execute()
+
+        overflow = self.client.zcard(self._index_key) - self.max_sessions
+        if overflow > 0:
+            oldest = [item.decode() if isinstance(item, bytes) else item
+                      for item in self.client.zrange(self._index_key, 0, overflow - 1)]
+            if oldest:
+                pipe = self.client.pipeline()
+                self._forget(pipe, oldest)
+                pipe.execute()
+                self.evictions += len(oldest)
+
+    def delete(self, thread_id):
+        pipe = self.client.pipeline()
+        self._forget(pipe, [thread_id])
+        return bool(pipe.execute()[0])
+
+    def purge_expired(self):
+        if self.ttl_seconds is None:
+            return 0
+        stale = [item.decode() if isinstance(item, bytes) else item
+                 for item in self.client.zrangebyscore(self._index_key, "-inf", time.time() - self.ttl_seconds)]
+        if stale:
+            pipe = self.client.pipeline()
+            self._forget(pipe, stale)
+            pipe.execute()
+            self.expirations += len(stale)
+        return len(stale)
+
+    def stats(self):
+        self.purge_expired()
+        return {
+            "backend": "redis",
+            "sessions": self.client.zcard(self._index_key),
+            "bytes": sum(int(size) for size in self.client.hvals(self._sizes_key)),
+            "ttl_seconds": self.ttl_seconds,
+            "max_sessions": self.max_sessions,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class PersistentCheckpointer(InMemorySaver):
+    """
+    LangGraph checkpointer that keeps a bounded working set of conversations
+    in memory and persists each one to a SessionBackend.
+
+    A thread is loaded from the backend when a run starts (re-read from
+    shared backends, so any worker can continue a conversation) and written
+    back after every checkpoint. Only the newest `keep_checkpoints` checkpoints per
+    thread are kept, and at most `cache_size` threads stay in memory.
+    Listing without a thread ID only sees the threads currently in memory.
+    """
+
+    def __init__(self, backend: SessionBackend, cache_size: int = 256, keep_checkpoints: int = 3, **kwargs):
+        """
+        Initialize the checkpointer.
+
+        Args:
+            backend: Where serialized sessions are stored
+            cache_size: Maximum number of threads kept in memory
+            keep_checkpoints: Checkpoints kept per thread and namespace
+        """
+        super().__init__(**kwargs)
+        self.backend = backend
+        self.cache_size = cache_size
+        self.keep_checkpoints = keep_checkpoints
+        self._loaded: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _ensure_loaded(self, thread_id: str, refresh: bool = False):
+        """
+        Bring a thread into memory from the backend. Caller must hold the lock.
+
+        Args:
+            thread_id: The conversation's thread ID
+            refresh: Re-read the thread even if loaded, when the backend is shared
+        """
+        if thread_id in self._loaded and not (refresh and self.backend.shared):
+            self._loaded.move_to_end(thread_id)
+            return
+        blob = self.backend.get(thread_id)
+        self._unload(thread_id)
+        if blob is not None:
+            data = pickle.loads(blob)
+            self.storage[thread_id] = defaultdict(dict, data["storage"])
+            for (checkpoint_ns, checkpoint_id), writes in data["writes"].items():
+                self.writes[(thread_id, checkpoint_ns, checkpoint_id)] = writes
+        self._loaded[thread_id] = None
+        self._loaded.move_to_end(thread_id)
+        while len(self._loaded) > self.cache_size:
+            evicted, _ = self._loaded.popitem(last=False)
+            self._unload(evicted)
+
+    def _unload(self, thread_id: str):
+        """Drop a thread from memory (it remains in the backend)"""
+        self.storage.pop(thread_id, None)
+        for key in [key for key in self.writes if key[0] == thread_id]:
+            del self.writes[key]
+
+    def _trim(self, thread_id: str):
+        """Keep only the newest checkpoints of a thread, with their pending writes"""
+        for checkpoint_ns, checkpoints in self.storage[thread_id].items():
+            if len(checkpoints) <= self.keep_checkpoints:
+                continue
+            # Checkpoint IDs are time-ordered, so sorting keeps the newest
+            for checkpoint_id in sorted(checkpoints)[:-self.keep_checkpoints]:
+                del checkpoints[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _dump(self, thread_id: str) -> bytes:
+        """Serialize one thread's checkpoints and writes"""
+        return pickle.dumps({
+            "storage": {ns: dict(checkpoints) for ns, checkpoints in self.storage[thread_id].items()},
+            "writes": {(key[1], key[2]): dict(writes) for key, writes in self.writes.items() if key[0] == thread_id},
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def get_tuple(self, config):
+        with self._lock:
+            # A run starts by reading the latest checkpoint; make sure it is current
+            latest = not config["configurable"].get("checkpoint_id")
+            self._ensure_loaded(config["configurable"]["thread_id"], refresh=latest)
+            return super().get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        with self._lock:
+            if config and config.get("configurable", {}).get("thread_id"):
+                self._ensure_loaded(config["configurable"]["thread_id"])
+            items = list(super().list(config, filter=filter, before=before, limit=limit))
+        yield from items
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._ensure_loaded(thread_id)
+            result = super().put(config, checkpoint, metadata, new_versions)
+            self._trim(thread_id)
+            blob = self._dump(thread_id)
+        self.backend.put(thread_id, blob)
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        # Pending writes are persisted together with the next checkpoint
+        with self._lock:
+            self._ensure_loaded(config["configurable"]["thread_id"])
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> bool:
+        """Delete a conversation from memory and from the backend"""
+        with self._lock:
+            existed = thread_id in self.storage
+            self._unload(thread_id)
+            self._loaded.pop(thread_id, None)
+        return self.backend.delete(thread_id) or existed
+
+    def thread_exists(self, thread_id: str) -> bool:
+        """Check whether a conversation has any stored checkpoint"""
+        with self._lock:
+            self._ensure_loaded(thread_id, refresh=True)
+            return any(self.storage[thread_id].values()) if thread_id in self.storage else False
+
+    # Backend I/O runs in worker threads so it never blocks the event loop
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return session count and bytes held by the backend, plus the in-memory working set"""
+        self.backend.purge_expired()
+        return {
+            **self.backend.stats(),
+            "loaded_sessions": len(self._loaded),
+            "cache_size": self.cache_size,
+        }
+
+
+def create_session_backend(kind: str = SESSION_BACKEND) -> SessionBackend:
+    """
+    Create the session backend selected by SESSION_BACKEND
+
+    Args:
+        kind: "memory", "sqlite" or "redis"
+    """
+    ttl = SESSION_TTL_SECONDS or None
+    if kind == "redis":
+        return RedisSessionBackend(url=SESSION_REDIS_URL, ttl_seconds=ttl, max_sessions=SESSION_MAX_SESSIONS)
+    if kind == "sqlite":
+        return SQLiteSessionBackend(SESSION_DB_PATH, ttl_seconds=ttl, max_sessions=SESSION_MAX_SESSIONS)
+    if kind == "memory":
+        return MemorySessionBackend(ttl_seconds=ttl, max_sessions=SESSION_MAX_SESSIONS)
+    raise ValueError(f"Unknown SESSION_BACKEND '{kind}', expected 'memory', 'sqlite' or 'redis'")
+
+
+def create_checkpointer() -> PersistentCheckpointer:
+    """Create the graph checkpointer on top of the configured session backend"""
+    backend = create_session_backend()
+    logger.info(f"Using '{SESSION_BACKEND}' session backend for conversation memory")
+    return PersistentCheckpointer(backend, cache_size=SESSION_CACHE_SIZE, keep_checkpoints=SESSION_KEEP_CHECKPOINTS)
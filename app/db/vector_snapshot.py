@@ -0,0 +1,246 @@
+from typing import Any, Dict, List, Optional, Sequence
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from app.core.config import VECTOR_SNAPSHOT_RETIRE_GRACE_SECONDS
+from app.db.local_index import LocalVectorIndex, NamespaceStore
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# On-disk layout of a snapshot directory:
+#
+#   manifest.json                             namespaces, their vector counts and current files,
+#                                             and the retired versions awaiting deletion
+#   <namespace>/<version>/vectors.npy         float32 (n, dimension) matrix, memory-mapped
+#   <namespace>/<version>/inverse_norms.npy   float32 (n,) 1/||v|| for cosine scoring
+#   <namespace>/<version>/metadata.json       {"ids": [...], "columns": {field: [value per row]}}
+#
+# A namespace is rewritten into a new version directory and then published by
+# atomically replacing the manifest, so readers never see a half-written
+# namespace. Processes that mapped the previous version keep their mapping
+# until they reload. The previous version is retired rather than deleted: a
+# worker may have read the old manifest and not opened the files yet, so a
+# later publish deletes it once the grace period has passed.
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+
+_manifest_lock = threading.Lock()
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    """Write JSON to a temporary file and atomically move it into place"""
+    temporary = f"{path}.tmp-{os.getpid()}"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+
+def read_manifest(root: str) -> Dict[str, Any]:
+    """Return the snapshot manifest, or an empty one if the directory has none yet"""
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"format_version": FORMAT_VERSION, "namespaces": {}}
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported vector snapshot format {manifest.get('format_version')} in {path}")
+    return manifest
+
+
+def _to_columns(ids: Sequence[str], metadata: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Store metadata column by column; rows without a field hold null"""
+    fields = sorted({key for row in metadata for key in row})
+    return {
+        "ids": list(ids),
+        "columns": {field: [row.get(field) for row in metadata] for field in fields},
+    }
+
+
+def _from_columns(sidecar: Dict[str, Any]) -> List[Dict[str, Any]]:
+    columns = sidecar["columns"]
+    return [
+        {field: values[row] for field, values in columns.items() if values[row] is not None}
+        for row in range(len(sidecar["ids"]))
+    ]
+
+
+def write_namespace_snapshot(root: str, namespace: str, ids: Sequence[str], vectors: np.ndarray,
+                             metadata: Sequence[Dict[str, Any]], metric: str = "cosine",
+                             inverse_norms: Optional[np.ndarray] = None,
+                             grace_seconds: float = VECTOR_SNAPSHOT_RETIRE_GRACE_SECONDS) -> Dict[str, Any]:
+    """
+    Write one namespace as a new snapshot version and publish it in the manifest
+
+    Args:
+        root: Snapshot directory
+        namespace: Namespace name
+        ids, vectors, metadata: Rows of the namespace, in the same order
+        metric: Similarity metric the vectors are queried with
+        inverse_norms: Precomputed 1/||v|| per row (computed if omitted)
+        grace_seconds: How long retired versions are kept before a publish deletes them
+
+    Returns:
+        The namespace's manifest entry
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2 or vectors.shape[0] != len(ids) or len(metadata) != len(ids):
+        raise ValueError(f"Snapshot rows for '{namespace}' do not line up: "
+                         f"{len(ids)} ids, {vectors.shape} vectors, {len(metadata)} metadata rows")
+    if inverse_norms is None:
+        norms = np.linalg.norm(vectors, axis=1)
+        inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    # Unique per publish: workers may have the files of any earlier version
+    # memory-mapped, and rewriting a mapped file in place can crash them (SIGBUS)
+    version = time.strftime("%Y%m%dT%H%M%S") + f"-{uuid.uuid4().hex[:12]}"
+    relative = os.path.join(namespace, version)
+    directory = os.path.join(root, relative)
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    os.mkdir(directory)  # Fails rather than writing into an existing version
+    np.save(os.path.join(directory, "vectors.npy"), vectors)
+    np.save(os.path.join(directory, "inverse_norms.npy"), np.asarray(inverse_norms, dtype=np.float32))
+    _write_json(os.path.join(directory, "metadata.json"), _to_columns(ids, metadata))
+
+    entry = {
+        "path": relative,
+        "vector_count": len(ids),
+        "dimension": int(vectors.shape[1]),
+        "metric": metric,
+        "created_at": time.time(),
+    }
+    with _manifest_lock:
+        manifest = read_manifest(root)
+        retired = manifest.setdefault("retired", [])
+        previous = manifest["namespaces"].get(namespace)
+        manifest["namespaces"][namespace] = entry
+        now = time.time()
+        if previous:
+            retired.append({"path": previous["path"], "retired_at": now})
+        expired = [version["path"] for version in retired if now - version["retired_at"] >= grace_seconds]
+        manifest["retired"] = [version for version in retired if version["path"] not in expired]
+        _write_json(os.path.join(root, MANIFEST_FILE), manifest)
+
+    # Existing mappings and open files of the old versions stay valid after they are unlinked
+    for path in expired:
+        shutil.rmtree(os.path.join(root, path), ignore_errors=True)
+    logger.info(f"Wrote snapshot of namespace '{namespace}' ({len(ids)} vectors) to {directory}")
+    return entry
+
+
+def save_namespace(index: LocalVectorIndex, root: str, namespace: str) -> Dict[str, Any]:
+    """Snapshot one namespace of a local index"""
+    ids, vectors, inverse_norms, metadata = index.export_namespace(namespace)
+    return write_namespace_snapshot(root, namespace, ids, vectors, metadata,
+                                    metric=index.metric, inverse_norms=inverse_norms)
+
+
+class SnapshotNamespace(NamespaceStore):
+    """
+    Namespace served from a snapshot directory.
+
+    Opening is O(1): the vector files are memory-mapped read-only, so the OS
+    pages them in on demand and every worker process on the node shares the
+    same page-cached copy. Ids and metadata are read on the first query,
+    from a file opened up front so that deleting the version in the meantime
+    cannot take them away. The first write copies the namespace into private
+    memory.
+    """
+
+    def __init__(self, directory: str, entry: Dict[str, Any]):
+        self.directory = directory
+        self.dimension = entry["dimension"]
+        self._vector_count = entry["vector_count"]
+        # Empty files cannot be memory-mapped
+        mmap_mode = "r" if self._vector_count else None
+        self._matrix = np.load(os.path.join(directory, "vectors.npy"), mmap_mode=mmap_mode)
+        self._inverse_norms = np.load(os.path.join(directory, "inverse_norms.npy"), mmap_mode=mmap_mode)
+        if self._matrix.shape != (self._vector_count, self.dimension):
+            raise ValueError(f"Snapshot {directory} holds {self._matrix.shape} vectors, "
+                             f"manifest says ({self._vector_count}, {self.dimension})")
+        self._sidecar_file = open(os.path.join(directory, "metadata.json"), encoding="utf-8")
+        self._ids: Optional[List[str]] = None
+        self._rows: Optional[Dict[str, int]] = None
+        self._metadata: Optional[List[Dict[str, Any]]] = None
+        self._masks: Dict[str, np.ndarray] = {}
+        self._writable = False
+        self.lock = threading.RLock()
+
+    def _load_sidecar(self):
+        with self.lock:
+            if self._ids is not None:
+                return
+            with self._sidecar_file as f:
+                sidecar = json.load(f)
+            self._metadata = _from_columns(sidecar)
+            self._rows = {vector_id: row for row, vector_id in enumerate(sidecar["ids"])}
+            self._ids = sidecar["ids"]
+
+    @property
+    def ids(self) -> List[str]:
+        self._load_sidecar()
+        return self._ids
+
+    @property
+    def rows(self) -> Dict[str, int]:
+        self._load_sidecar()
+        return self._rows
+
+    @property
+    def metadata(self) -> List[Dict[str, Any]]:
+        self._load_sidecar()
+        return self._metadata
+
+    def __len__(self):
+        # Answer from the manifest until the sidecar is needed anyway
+        return len(self._ids) if self._ids is not None else self._vector_count
+
+    def _before_write(self):
+        super()._before_write()
+        if not self._writable:
+            self._load_sidecar()
+            self._matrix = np.array(self._matrix)
+            self._inverse_norms = np.array(self._inverse_norms)
+            self._writable = True
+            logger.info(f"Copied snapshot namespace at {self.directory} into memory for writing")
+
+
+def open_snapshot(root: str, namespace: str) -> SnapshotNamespace:
+    """Open one namespace of a snapshot directory"""
+    entry = read_manifest(root)["namespaces"].get(namespace)
+    if entry is None:
+        raise KeyError(f"Namespace '{namespace}' not found in the snapshot at {root}")
+    return SnapshotNamespace(os.path.join(root, entry["path"]), entry)
+
+
+def attach_snapshots(index: LocalVectorIndex, root: str, namespaces: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    Serve namespaces of a snapshot directory from a local index
+
+    Args:
+        index: Local index to attach the namespaces to
+        root: Snapshot directory
+        namespaces: Namespaces to attach; defaults to every namespace in the manifest
+
+    Returns:
+        The attached namespaces
+    """
+    manifest = read_manifest(root)
+    attached = []
+    for namespace, entry in manifest["namespaces"].items():
+        if namespaces is not None and namespace not in namespaces:
+            continue
+        if entry["metric"] != index.metric:
+            raise ValueError(f"Snapshot of '{namespace}' uses metric '{entry['metric']}', index uses '{index.metric}'")
+        index.attach_namespace(namespace, SnapshotNamespace(os.path.join(root, entry["path"]), entry))
+        attached.append(namespace)
+    logger.info(f"Attached {len(attached)} snapshot namespaces from {root}")
+    return attached
@@ -1,28 +1,61 @@
 import os
+import threading
 import pinecone
-from langchain_openai import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from langchain.schema import Document
-from app.core.config import PINECONE_API_KEY, OPENAI_API_KEY, INDEX_NAME
+from app.core.config import (
+    PINECONE_API_KEY,
+    INDEX_NAME,
+    VECTOR_BACKEND,
+    LOCAL_VECTOR_NAMESPACES,
+    VECTOR_SNAPSHOT_DIR,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    EMBEDDING_CACHE_PATH,
+)
+from app.core.clients import get_embeddings
+from app.db.embedding_cache import CachedEmbeddings
+from app.db.retrieval_cache import retrieval_cache
+from app.db.local_index import LocalVectorIndex, NamespaceRoutedIndex, load_namespace
+from app.db.namespace_aliases import namespace_aliases
+from app.db.vector_snapshot import attach_snapshots
 from pinecone import Pinecone
 import logging
-from app.services.agent_index_wrapper import get_restricted_index
+from app.services.agent_index_wrapper import get_restricted_index, namespace_registry
 
-# Initialize embeddings
-embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+logger = logging.getLogger(__name__)
 
-# Initialize Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(name=INDEX_NAME)
+# Shared embeddings client (pooled connections, see app.core.clients). Repeated
+# texts (the same query in several graph nodes, the fast router's examples) are
+# served from the embedding cache instead of calling OpenAI again
+embeddings = CachedEmbeddings(
+    get_embeddings(),
+    max_entries=EMBEDDING_CACHE_SIZE,
+    ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS or None,
+    disk_path=EMBEDDING_CACHE_PATH,
+)
 
-# Create vector store
-vectorstore = PineconeVectorStore(index=index, embedding=embeddings, text_key="text")
+# In-process index serving VECTOR_BACKEND=local, or the LOCAL_VECTOR_NAMESPACES
+local_index = LocalVectorIndex(metric="cosine")
 
-# Make sure the _index attribute is accessible for our wrapper
-# If your implementation is different, you may need to adjust the wrapping approach
+# Pinecone client, index and vector store are created on first use (or during
+# application warmup) so importing this module never touches the network
+_lock = threading.RLock()
+_pc = None
+_index = None
+_vectorstore = None
 
-def initialize_vector_store():
-    """Initialize and configure Pinecone vector store"""
+def get_pinecone():
+    """Return the shared Pinecone client"""
+    global _pc
+    with _lock:
+        if _pc is None:
+            _pc = Pinecone(api_key=PINECONE_API_KEY)
+        return _pc
+
+def _connect_pinecone_index():
+    """Connect to the Pinecone index, creating it if it does not exist"""
+    pc = get_pinecone()
     # Check if index exists, if not create it
     existing_indexes = [index.name for index in pc.list_indexes()]
     if INDEX_NAME not in existing_indexes:
@@ -38,64 +71,205 @@ def initialize_vector_store():
         )
 
     # Get the index
-    index = pc.Index(INDEX_NAME)
+    return pc.Index(INDEX_NAME)
 
-    # Initialize embeddings and vector store
-    embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-    # Updated to use PineconeVectorStore instead of Pinecone
-    vectorstore = PineconeVectorStore(index=index, embedding=embeddings, text_key="text")
-    
-    return vectorstore
+def initialize_vector_store():
+    """Initialize and configure the vector store on the backend selected by VECTOR_BACKEND"""
+    global _index, _vectorstore
+    with _lock:
+        if _vectorstore is not None:
+            return _vectorstore
 
-# Initialize the vector store
-vectorstore = initialize_vector_store()
+        # Local namespaces are held under the physical namespace serving them at startup;
+        # versions swapped in later are read from Pinecone until the next restart
+        local_namespaces = [namespace_aliases.resolve(namespace) for namespace in LOCAL_VECTOR_NAMESPACES]
 
-logger = logging.getLogger(__name__)
+        # Memory-mapping a snapshot is O(1); vectors are paged in by the first queries
+        from_snapshot = []
+        if VECTOR_SNAPSHOT_DIR:
+            wanted = None if VECTOR_BACKEND == "local" else local_namespaces
+            from_snapshot = attach_snapshots(local_index, VECTOR_SNAPSHOT_DIR, namespaces=wanted)
+
+        if VECTOR_BACKEND == "local":
+            _index = local_index
+            logger.info("Serving all namespaces from the in-process vector index")
+        elif VECTOR_BACKEND == "pinecone":
+            remote_index = _connect_pinecone_index()
+            logger.info(f"Connected to Pinecone index '{INDEX_NAME}'")
+            if local_namespaces:
+                for namespace in local_namespaces:
+                    if namespace not in from_snapshot:
+                        load_namespace(remote_index, local_index, namespace)
+                _index = NamespaceRoutedIndex(remote_index, local_index, local_namespaces)
+                logger.info(f"Serving namespaces {local_namespaces} from the in-process vector index")
+            else:
+                _index = remote_index
+        else:
+            raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}', expected 'pinecone' or 'local'")
+
+        # Initialize the vector store with the shared embeddings client
+        # Updated to use PineconeVectorStore instead of Pinecone
+        _vectorstore = PineconeVectorStore(index=_index, embedding=embeddings, text_key="text")
+        return _vectorstore
+
+def get_vectorstore():
+    """Return the shared (unrestricted) vector store, connecting to Pinecone on first use"""
+    return _vectorstore if _vectorstore is not None else initialize_vector_store()
+
+def get_index():
+    """Return the underlying index (Pinecone, local or routed between the two), connecting on first use"""
+    get_vectorstore()
+    return _index
+
+def __getattr__(name):
+    # Keep `vectorstore`, `index` and `pc` importable without connecting at import time
+    if name == "vectorstore":
+        return get_vectorstore()
+    if name == "index":
+        return get_index()
+    if name == "pc":
+        return get_pinecone()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Global cache to store agent-specific vectorstores
 _agent_vectorstore_cache = {}
+# Agents that asked for a vector store, in order, so warmup can build them all
+_requested_agents = {}
+
+class LazyAgentVectorStore:
+    """
+    Stand-in for an agent's vector store, returned by get_agent_vectorstore.
+
+    Modules keep creating their vector store at import time; the real store
+    (and the Pinecone connection behind it) is only built on first attribute
+    access, or ahead of time by warm_agent_vectorstores().
+
+    Similarity searches go through the shared retrieval cache; other calls are
+    forwarded to the real store.
+    """
+
+    def __init__(self, agent_id: str):
+        self.agent_id = agent_id
+
+    def resolve(self) -> PineconeVectorStore:
+        """Return the agent's real vector store, building it on first use"""
+        return _build_agent_vectorstore(self.agent_id)
+
+    def __getattr__(self, name):
+        # Introspection (e.g. LangGraph probing nodes for `__self__` while compiling)
+        # must not build the store, so private and dunder names are never forwarded
+        if name.startswith("_"):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        return getattr(self.resolve(), name)
+
+    def _cache_key(self, namespace, **key):
+        """Retrieval cache key, or None when the search should bypass the cache"""
+        if not retrieval_cache.enabled:
+            return None
+        namespace = namespace or f"{self.agent_id}_namespace"
+        # A hit never reaches the restricted index, so check the agent's access here
+        from app.services.namespace_config import ensure_agent_namespaces
+        ensure_agent_namespaces()
+        if not namespace_registry.has_namespace_access(self.agent_id, namespace):
+            return None
+        return retrieval_cache.key(namespace, **key)
+
+    def similarity_search(self, query, k=4, filter=None, namespace=None, **kwargs):
+        key = self._cache_key(namespace, query=query, filter=filter, k=k)
+        cached = retrieval_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+        docs = self.resolve().similarity_search(query, k=k, filter=filter, namespace=namespace, **kwargs)
+        if key:
+            retrieval_cache.put(key, docs)
+        return docs
+
+    async def asimilarity_search(self, query, k=4, filter=None, namespace=None, **kwargs):
+        key = self._cache_key(namespace, query=query, filter=filter, k=k)
+        cached = retrieval_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+        docs = await self.resolve().asimilarity_search(query, k=k, filter=filter, namespace=namespace, **kwargs)
+        if key:
+            retrieval_cache.put(key, docs)
+        return docs
+
+    def similarity_search_by_vector_with_score(self, embedding, *, k=4, filter=None, namespace=None):
+        key = self._cache_key(namespace, embedding=embedding, filter=filter, k=k, kind="scored")
+        cached = retrieval_cache.get(key) if key else None
+        if cached is not None:
+            return cached
+        results = self.resolve().similarity_search_by_vector_with_score(
+            embedding, k=k, filter=filter, namespace=namespace
+        )
+        if key:
+            retrieval_cache.put(key, results)
+        return results
+
+    def __repr__(self):
+        return f"LazyAgentVectorStore(agent_id={self.agent_id!r})"
+
+def _build_agent_vectorstore(agent_id):
+    # Fast path without the lock once the store exists
+    agent_vectorstore = _agent_vectorstore_cache.get(agent_id)
+    if agent_vectorstore is not None:
+        return agent_vectorstore
+
+    from app.services.namespace_config import ensure_agent_namespaces
+
+    with _lock:
+        if agent_id in _agent_vectorstore_cache:
+            return _agent_vectorstore_cache[agent_id]
+
+        # The restricted index snapshots the agent's namespaces, so register them first
+        ensure_agent_namespaces()
+
+        # Don't try to deep copy, create a new instance instead
+        # Get the original index from the global vectorstore
+        original_index = get_index()
+
+        # Create a restricted index for this agent
+        restricted_index = get_restricted_index(original_index, agent_id)
+
+        # Every agent shares the one embeddings client and its connection pool
+        # Create a new vector store with the restricted index
+        namespace = f"{agent_id}_namespace"
+        agent_vectorstore = PineconeVectorStore(
+            index=restricted_index,
+            embedding=embeddings,
+            text_key="text",
+            namespace=namespace
+        )
+
+        logger.info(f"Created vector store for agent '{agent_id}' with namespace '{namespace}'")
+
+        # Cache the vector store
+        _agent_vectorstore_cache[agent_id] = agent_vectorstore
+        return agent_vectorstore
 
 def get_agent_vectorstore(agent_id):
     """
     Returns a vector store configured for the specified agent.
-    Uses a cache to avoid recreating the same vector store multiple times.
+
+    The store is created lazily: the returned object builds (and caches) the
+    real PineconeVectorStore the first time it is used.
+    """
+    _requested_agents.setdefault(agent_id, None)
+    return LazyAgentVectorStore(agent_id)
+
+def warm_agent_vectorstores(agent_ids=None):
+    """
+    Build agent vector stores ahead of their first request
+
+    Args:
+        agent_ids: Agents to build; defaults to every agent that asked for a store
+
+    Returns:
+        Number of agent vector stores that are ready
     """
-    global _agent_vectorstore_cache
-    
-    # Return cached instance if available
-    if agent_id in _agent_vectorstore_cache:
-        logger.debug(f"Using cached vector store for agent '{agent_id}'")
-        return _agent_vectorstore_cache[agent_id]
-    
-    # Don't try to deep copy, create a new instance instead
-    from app.core.config import OPENAI_API_KEY
-    from langchain_openai import OpenAIEmbeddings
-    from langchain_pinecone import PineconeVectorStore
-    
-    # Get the original index from the global vectorstore
-    original_index = vectorstore._index  # Use the existing vectorstore's index
-    
-    # Create a restricted index for this agent
-    restricted_index = get_restricted_index(original_index, agent_id)
-    
-    # Create a new embeddings object
-    embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-    
-    # Create a new vector store with the restricted index
-    namespace = f"{agent_id}_namespace"
-    agent_vectorstore = PineconeVectorStore(
-        index=restricted_index,
-        embedding=embeddings,
-        text_key="text",
-        namespace=namespace
-    )
-    
-    logger.info(f"Created vector store for agent '{agent_id}' with namespace '{namespace}'")
-    
-    # Cache the vector store
-    _agent_vectorstore_cache[agent_id] = agent_vectorstore
-    
-    return agent_vectorstore
+    for agent_id in list(agent_ids if agent_ids is not None else _requested_agents):
+        _build_agent_vectorstore(agent_id)
+    return len(_agent_vectorstore_cache)
 
 def verify_namespace_contents(agent_id):
     """Verify contents of a namespace for debugging"""
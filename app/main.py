@@ -4,10 +4,17 @@ from fastapi.responses import JSONResponse, Response as FastAPIResponse
 from app.api.router import api_router
 from app.models.schemas import State, QueryRequest
 from app.services.routing import route_to_department
-from app.services.advisor import process_query as advisor
+from app.services.advisor import aprocess_query as advisor
 from app.services.advisor import memory as advisor_memory
+from app.services.warmup import warmup, startup_state
 from app.services.whatsapp_handler import handle_whatsapp_message
 from app.services.utils import ensure_compatible_state, add_message_to_state
+from app.core.config import ASYNC_WORKER_THREADS, NAMESPACE_ALIAS_REPORT_SECONDS, STARTUP_WARMUP_RETRY_SECONDS
+from app.db.namespace_aliases import namespace_aliases
+from app.core.clients import aclose_clients
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 from twilio.twiml.messaging_response import MessagingResponse
 import json
@@ -18,10 +25,43 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def warmup_until_ready():
+    """Run the application warmup, retrying until it succeeds"""
+    while not await warmup():
+        logger.info(f"Retrying warmup in {STARTUP_WARMUP_RETRY_SECONDS} seconds")
+        await asyncio.sleep(STARTUP_WARMUP_RETRY_SECONDS)
+
+async def report_namespace_aliases():
+    """Keep telling scripts/manage_namespaces.py gc which namespaces this server resolves to"""
+    while True:
+        try:
+            await asyncio.to_thread(namespace_aliases.report)
+        except Exception as e:
+            logger.error(f"Could not report namespace aliases: {str(e)}")
+        await asyncio.sleep(NAMESPACE_ALIAS_REPORT_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up in the background so the server is live at once and ready after warmup"""
+    # Blocking retrieval calls run in the default executor; size it for many in-flight queries
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=ASYNC_WORKER_THREADS, thread_name_prefix="advisor")
+    )
+    warmup_task = asyncio.create_task(warmup_until_ready())
+    report_task = asyncio.create_task(report_namespace_aliases())
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        report_task.cancel()
+        # Close the shared OpenAI connection pools
+        await aclose_clients()
+
 app = FastAPI(
     title="Academic Advisor API",
     description="API for the Academic Advisor System",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Set up CORS middleware
@@ -62,18 +102,9 @@ def ensure_state(obj):
 
 # Helper function to safely check if a session exists
 def session_exists(session_id):
-    """Safely check if a session exists in memory"""
+    """Safely check if a session has stored conversation history"""
     try:
-        # First try to use exists method if available
-        if hasattr(advisor_memory, 'exists'):
-            return advisor_memory.exists(session_id)
-        
-        # Otherwise try to get the session and see if it succeeds
-        try:
-            advisor_memory.get(session_id)
-            return True
-        except:
-            return False
+        return advisor_memory.thread_exists(session_id)
     except Exception as e:
         logger.error(f"Error checking session existence: {str(e)}")
         return False
@@ -82,6 +113,12 @@ def session_exists(session_id):
 async def root():
     return {"message": "Welcome to the Academic Advisor API"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the startup warmup has completed"""
+    status = startup_state.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Global exception: {exc}", exc_info=True)
@@ -114,7 +151,7 @@ async def query(query_request: QueryRequest, request: Request):
             logger.info(f"Using existing session: {session_id}")
         
         # Process the query with the session ID
-        response = advisor(query_request.text, session_id)
+        response = await advisor(query_request.text, session_id)
         
         # Create the response
         response_obj = JSONResponse(content=response.dict())
@@ -155,8 +192,11 @@ async def whatsapp_webhook(request: Request):
         
         # Handle reset command
         if incoming_msg.lower() in ["reset", "restart", "start over"]:
-            # We'll use the sender as the session ID
-            # The memory will be automatically reset on the next query
+            # The sender is the session ID; drop its stored conversation
+            try:
+                await asyncio.to_thread(advisor_memory.delete_thread, sender)
+            except Exception as e:
+                logger.error(f"Error resetting WhatsApp session: {str(e)}")
             response = MessagingResponse()
             response.message("Conversation has been reset. How can I help you with your academic inquiries?")
             return FastAPIResponse(content=str(response), media_type="application/xml")
@@ -166,7 +206,7 @@ async def whatsapp_webhook(request: Request):
         
         try:
             # Process the message with the LangGraph memory system
-            response_obj = advisor(incoming_msg, session_id)
+            response_obj = await advisor(incoming_msg, session_id)
             response_text = response_obj.content
             
             # Format and return response
@@ -199,20 +239,10 @@ async def reset_session(session_id: str):
     """
     try:
         # Check if the session exists
-        if session_exists(session_id):
-            # Delete the session from memory
+        if await asyncio.to_thread(session_exists, session_id):
+            # Delete the session from memory and the session store
             try:
-                if hasattr(advisor_memory, 'delete'):
-                    advisor_memory.delete(session_id)
-                # If delete is not supported, we can try other approaches
-                # like putting an empty state
-                else:
-                    empty_state = {
-                        "messages": [],
-                        "is_valid": True,
-                    }
-                    advisor_memory.put(session_id, empty_state)
-                
+                await asyncio.to_thread(advisor_memory.delete_thread, session_id)
                 return {"message": f"Session {session_id} reset successfully"}
             except Exception as e:
                 logger.error(f"Error deleting session: {str(e)}")
@@ -11,6 +11,9 @@ class State(TypedDict):
     track: Optional[str]
     query_type: Optional[str]
     documents: Optional[List[Dict[str, Any]]]  # Add documents field for passing course info
+    summary: Optional[str]  # Running summary of turns that fell out of the prompt window
+    prompt_tokens: Optional[int]  # Prompt size of this turn's answering LLM call
+    query_embedding: Optional[List[float]]  # Embedding of this turn's user message, computed once per request
 
 # New models for API request/response
 class QueryRequest(BaseModel):
@@ -24,6 +27,7 @@ class QueryResponse(BaseModel):
     
     # Optional fields for additional data
     status: Optional[str] = None
+    prompt_tokens: Optional[int] = None
     
 class ErrorResponse(BaseModel):
     """Model for error responses"""
@@ -6,8 +6,5 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-# Import after configuring logging
-from .namespace_config import initialize_agent_namespaces
-
-# Initialize agent namespaces on module import
-initialize_agent_namespaces()
\ No newline at end of file
+# Agent namespaces are registered during application warmup or on the first
+# vector store lookup (see namespace_config.ensure_agent_namespaces)
\ No newline at end of file
@@ -1,5 +1,4 @@
 from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
 from app.models.schemas import State
 from app.services.supervisor import supervisor
 from app.services.departments.chemical import chemical_department
@@ -13,29 +12,51 @@ from app.services.tracks.ece import ece_track
 from app.services.tracks.cce import cce_track
 from app.services.routing import route_to_department, route_to_ece_track
 from app.services.schedule_helper import schedule_helper
-from langchain_openai import ChatOpenAI
-from app.core.config import OPENAI_API_KEY
-from app.db.vector_store import vectorstore, get_agent_vectorstore
+from app.core.clients import get_llm
+from app.db.vector_store import get_agent_vectorstore, embeddings
+from app.db.session_store import create_checkpointer
 from app.models.schemas import QueryResponse
 import logging
 from app.services.utils import ensure_compatible_state, get_last_user_message
+from app.services.graph_registry import CompiledGraphRegistry
+from app.services.streaming import ANSWER_TAG, SOURCES_EVENT
+from app.services.answer_cache import answer_cache, is_follow_up
+from app.services.conversation_memory import summarize_memory
+from app.services.retrieval import retrieval_stats
+import asyncio
+import threading
+import time
 import re
 import json
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI LLM
-llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model_name="gpt-4o"
-)
+# Shared OpenAI LLM (pooled connections, see app.core.clients)
+llm = get_llm("answerer")
 
 # Get a dedicated vector store for advisor
 advisor_vectorstore = get_agent_vectorstore("advisor")
 
-# Create a memory saver for persistent conversation history
-memory = MemorySaver()
+# Checkpointer persisting conversation history in the configured session store
+memory = create_checkpointer()
+
+# Process-wide registry holding the compiled graph so it is built once, not per query
+graph_registry = CompiledGraphRegistry(lambda: build_graph())
+
+def get_graph():
+    """Return the shared compiled advisor graph, compiling it on first use"""
+    return graph_registry.get()
+
+def rebuild_graph():
+    """Recompile the advisor graph, e.g. after the set of agents changed"""
+    return graph_registry.rebuild()
+
+def __getattr__(name):
+    # Expose the compiled graph lazily as `advisor_graph` without compiling at import time
+    if name == "advisor_graph":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Add a function to detect calendar integration requests
 def detect_calendar_request(message):
@@ -58,126 +79,242 @@ def detect_calendar_request(message):
     message_lower = message.lower()
     return any(keyword in message_lower for keyword in calendar_keywords)
 
+# Long-lived event loop for synchronous callers. The shared async HTTP pool
+# keeps connections bound to the loop that opened them, so every sync call
+# must run on the same loop rather than a fresh asyncio.run() loop.
+_sync_loop = None
+_sync_loop_lock = threading.Lock()
+
+def _get_sync_loop():
+    """Return the background event loop used by process_query, starting it on first use"""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="advisor-sync-loop", daemon=True).start()
+            _sync_loop = loop
+        return _sync_loop
+
 def process_query(query_text: str, session_id: str = None) -> QueryResponse:
     """
-    Process a student query and generate a response
+    Synchronous wrapper around aprocess_query for non-async callers (CLI, scripts)
     
     Args:
         query_text: The query text from the user
         session_id: Optional session ID for retrieving conversation history
     """
-    try:
-        # Create the chat graph
-        graph = build_graph()
+    future = asyncio.run_coroutine_threadsafe(aprocess_query(query_text, session_id), _get_sync_loop())
+    return future.result()
+
+def build_initial_state(query_text: str, session_id: str = None, query_embedding=None) -> dict:
+    """
+    Create the initial graph state for a query
+    
+    Earlier turns of the conversation are restored by the checkpointer from
+    the session's thread ID, and the new message is appended to them.
+    
+    Args:
+        query_text: The query text from the user
+        session_id: Optional session ID for retrieving conversation history
+        query_embedding: Embedding of the query if it was already computed (answer cache lookup)
+    """
+    return {
+        "messages": [{"role": "user", "content": query_text}],
+        "is_valid": True,
+        # Cleared so a turn that never reaches an answering node doesn't report the previous count
+        "prompt_tokens": None,
+        # Reused by every node of this turn; None (not the previous turn's vector) makes the supervisor embed it
+        "query_embedding": query_embedding,
+    }
+
+def extract_schedule_data(content: str):
+    """
+    Extract the structured schedule JSON block from an answer, if any
+    
+    Args:
+        content: The final answer text
         
-        # Create the initial state or retrieve from memory if session_id is provided
-        if session_id:
-            # Try to safely check if session exists
-            session_exists = False
-            try:
-                # First try to use exists method if available
-                if hasattr(memory, 'exists'):
-                    session_exists = memory.exists(session_id)
-                else:
-                    # Otherwise try to get the session and see if it succeeds
-                    try:
-                        memory.get(session_id)
-                        session_exists = True
-                    except:
-                        session_exists = False
-            except Exception as e:
-                logger.error(f"Error checking session existence: {str(e)}")
-                session_exists = False
-                
-            if session_exists:
-                # Retrieve existing conversation state
-                state = memory.get(session_id)
-                # Add the new user message
-                state["messages"].append({"role": "user", "content": query_text})
-            else:
-                # Create a new state
-                state = {
-                    "messages": [{"role": "user", "content": query_text}],
-                    "is_valid": True,
-                }
-        else:
-            # Create a new state
-            state = {
-                "messages": [{"role": "user", "content": query_text}],
-                "is_valid": True,
-            }
+    Returns:
+        The parsed schedule dict when the answer contains one with is_schedule set, else None
+    """
+    schedule_match = re.search(r'```json\s*(\{[\s\S]*?\})\s*```', content)
+    if not schedule_match:
+        return None
+    try:
+        schedule_data = json.loads(schedule_match.group(1))
+        if schedule_data.get('is_schedule') == True:
+            return schedule_data
+    except Exception as e:
+        logger.error(f"Error processing schedule data: {str(e)}")
+    return None
+
+def build_query_response(result: dict, query_text: str):
+    """
+    Turn the final graph state into the API response
+    
+    Args:
+        result: The final graph state
+        query_text: The query text from the user
+    """
+    # Extract the response content
+    if "messages" in result and len(result["messages"]) > 0:
+        response_content = result["messages"][-1].content
         
-        # Execute the graph with the state
-        result = graph.invoke(state, config={"configurable": {"thread_id": session_id}})
+        # Check for schedule data
+        if extract_schedule_data(response_content):
+            # Add indication about Google Calendar
+            response_content = response_content.replace(
+                "```json", 
+                "You can add this schedule to your Google Calendar by clicking the 'Add to Google Calendar' button below.\n\n```json"
+            )
+    else:
+        response_content = "I'm sorry, I couldn't process your request."
+    
+    # Get the routing path
+    path = result.get("path", [])
+    department = determine_department_from_path(path)
+    
+    # Check if the user is asking to add their schedule to Google Calendar
+    if detect_calendar_request(query_text):
+        # Create a response with instructions on how to add to Google Calendar
+        calendar_info = {
+            "content": (
+                "I'd be happy to help you add your class schedule to your Google Calendar! "
+                "To do this, I need your permission to access your Google Calendar. "
+                "\n\n"
+                "First, let me know if you have a specific schedule you want to add, or if you want "
+                "to add the schedule we've discussed. When you're ready, click the 'Add to Google Calendar' "
+                "button that appears with your schedule, and you'll be asked to sign in to your Google account. "
+                "\n\n"
+                "Once you grant permission, I'll add all your classes as recurring events to your calendar. "
+                "I'll also check for any potential conflicts with your existing calendar events."
+            ),
+            "department": "MSFEA Advisor"
+        }
+        return calendar_info
+    
+    # Create response with path info
+    return QueryResponse(
+        content=response_content,
+        department=department,
+        status="success",
+        prompt_tokens=result.get("prompt_tokens")
+    )
+
+async def check_answer_cache(graph, query_text: str, session_id: str = None):
+    """
+    Look the query up in the answer cache before running the graph
+    
+    Conversational follow-ups and calendar requests bypass the cache, since
+    their answers depend on earlier turns or on per-user actions.
+    
+    Args:
+        graph: The compiled advisor graph (used to inspect conversation history)
+        query_text: The query text from the user
+        session_id: Optional session ID for the conversation
         
-        # Save the updated state if session_id is provided
-        if session_id:
-            try:
-                # Try the most common ways to call put() with different parameters
-                try:
-                    # Simple version first
-                    memory.put(session_id, result)
-                except TypeError:
-                    try:
-                        # Try with empty dicts for metadata and versions
-                        memory.put(session_id, result, {}, {})
-                    except TypeError:
-                        # Try with pending_sends parameter
-                        memory.put(session_id, result, {}, {}, pending_sends={})
-            except Exception as e:
-                # Just log the error but continue - the conversation will work
-                # but won't be saved for next time
-                logger.error(f"Error saving session: {str(e)}")
+    Returns:
+        Tuple of (cached response dict or None, cache context for storing the
+        answer afterwards, or None when the query bypasses the cache)
+    """
+    if not answer_cache.enabled or detect_calendar_request(query_text):
+        return None, None
+    
+    has_history = False
+    if session_id:
+        try:
+            snapshot = await graph.aget_state({"configurable": {"thread_id": session_id}})
+            has_history = bool(snapshot.values.get("messages"))
+        except Exception as e:
+            logger.error(f"Error reading conversation history: {str(e)}")
+    if is_follow_up(query_text, has_history):
+        answer_cache.record_bypass()
+        return None, None
+    
+    # Cheap local routing decides the cache partition without an LLM call
+    department = determine_department(query_text)
+    cached = answer_cache.get_exact(query_text, department)
+    if cached:
+        return cached, None
+    
+    query_embedding = None
+    if answer_cache.semantic_enabled:
+        try:
+            query_embedding = await embeddings.aembed_query(query_text.strip())
+        except Exception as e:
+            logger.error(f"Error embedding query for the answer cache: {str(e)}")
+        cached = answer_cache.get_semantic(query_embedding, department)
+        if cached:
+            return cached, None
+    
+    answer_cache.record_miss()
+    return None, {"department": department, "embedding": query_embedding}
+
+def store_answer(query_text: str, cache_context, result: dict, response):
+    """Store a successful graph answer in the answer cache"""
+    if cache_context is None or not isinstance(response, QueryResponse):
+        return
+    if result.get("is_valid") is False or response.status != "success":
+        return
+    # A cached answer is served without sending any prompt
+    cached = {**response.dict(), "prompt_tokens": 0}
+    answer_cache.put(query_text, cache_context["department"], cached, cache_context["embedding"])
+
+async def record_cached_turn(graph, query_text: str, session_id: str, cached: dict):
+    """
+    Append a turn answered from the answer cache to the session's conversation
+    
+    The graph does not run on a cache hit, so without this the checkpoint
+    would miss the exchange and a follow-up question would lose its context.
+    
+    Args:
+        graph: The compiled advisor graph
+        query_text: The query text from the user
+        session_id: Session ID of the conversation (nothing is recorded without one)
+        cached: The cached response dict
+    """
+    if not session_id:
+        return
+    messages = [
+        {"role": "user", "content": query_text},
+        {"role": "assistant", "content": cached.get("content", "")},
+    ]
+    try:
+        # Written as the memory node's output: the turn ends there, like a graph run does
+        await graph.aupdate_state(
+            {"configurable": {"thread_id": session_id}}, {"messages": messages}, as_node="memory"
+        )
+    except Exception as e:
+        logger.error(f"Error recording cached answer in the conversation: {str(e)}")
+
+async def aprocess_query(query_text: str, session_id: str = None) -> QueryResponse:
+    """
+    Process a student query and generate a response without blocking the event loop
+    
+    Args:
+        query_text: The query text from the user
+        session_id: Optional session ID for retrieving conversation history
+    """
+    try:
+        # Reuse the compiled chat graph instead of rebuilding it for every query
+        graph = get_graph()
         
-        # Extract the response content
-        if "messages" in result and len(result["messages"]) > 0:
-            response_content = result["messages"][-1].content
-            
-            # Check for schedule data
-            schedule_match = re.search(r'```json\s*(\{[\s\S]*?\})\s*```', response_content)
-            if schedule_match:
-                try:
-                    schedule_data = json.loads(schedule_match.group(1))
-                    if schedule_data.get('is_schedule') == True:
-                        # Add indication about Google Calendar
-                        response_content = response_content.replace(
-                            "```json", 
-                            "You can add this schedule to your Google Calendar by clicking the 'Add to Google Calendar' button below.\n\n```json"
-                        )
-                except Exception as e:
-                    logger.error(f"Error processing schedule data: {str(e)}")
-        else:
-            response_content = "I'm sorry, I couldn't process your request."
+        cached, cache_context = await check_answer_cache(graph, query_text, session_id)
+        if cached:
+            await record_cached_turn(graph, query_text, session_id, cached)
+            return QueryResponse(**cached)
         
-        # Get the routing path
-        path = result.get("path", [])
-        department = determine_department_from_path(path)
+        query_embedding = cache_context["embedding"] if cache_context else None
+        state = build_initial_state(query_text, session_id, query_embedding)
         
-        # Check if the user is asking to add their schedule to Google Calendar
-        if detect_calendar_request(query_text):
-            # Create a response with instructions on how to add to Google Calendar
-            calendar_info = {
-                "content": (
-                    "I'd be happy to help you add your class schedule to your Google Calendar! "
-                    "To do this, I need your permission to access your Google Calendar. "
-                    "\n\n"
-                    "First, let me know if you have a specific schedule you want to add, or if you want "
-                    "to add the schedule we've discussed. When you're ready, click the 'Add to Google Calendar' "
-                    "button that appears with your schedule, and you'll be asked to sign in to your Google account. "
-                    "\n\n"
-                    "Once you grant permission, I'll add all your classes as recurring events to your calendar. "
-                    "I'll also check for any potential conflicts with your existing calendar events."
-                ),
-                "department": "MSFEA Advisor"
-            }
-            return calendar_info
+        # Execute the graph with the state
+        started = time.perf_counter()
+        result = await graph.ainvoke(state, config={"configurable": {"thread_id": session_id}})
+        retrieval_stats.record_answer(time.perf_counter() - started)
         
-        # Create response with path info
-        return QueryResponse(
-            content=response_content,
-            department=department,
-            status="success"
-        )
+        response = build_query_response(result, query_text)
+        store_answer(query_text, cache_context, result, response)
+        return response
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         return QueryResponse(
@@ -185,6 +322,74 @@ def process_query(query_text: str, session_id: str = None) -> QueryResponse:
             department="Error Handler"
         )
 
+async def astream_query(query_text: str, session_id: str = None):
+    """
+    Process a student query and yield typed events as the graph runs
+    
+    Events (as (event_type, data) tuples):
+        route   - the supervisor's department and the branch taken, then the ECE track if any
+        sources - documents retrieved by the answering node
+        token   - a chunk of the final answer as it is generated
+        done    - the complete response, including any extracted schedule JSON
+        error   - an error message; no further events follow
+    
+    Args:
+        query_text: The query text from the user
+        session_id: Optional session ID for retrieving conversation history
+    """
+    try:
+        graph = get_graph()
+        
+        cached, cache_context = await check_answer_cache(graph, query_text, session_id)
+        if cached:
+            await record_cached_turn(graph, query_text, session_id, cached)
+            yield "done", {**cached, "schedule": extract_schedule_data(cached.get("content", "")), "cached": True}
+            return
+        
+        query_embedding = cache_context["embedding"] if cache_context else None
+        state = build_initial_state(query_text, session_id, query_embedding)
+        result = None
+        started = time.perf_counter()
+        
+        async for event in graph.astream_events(
+            state, config={"configurable": {"thread_id": session_id}}, version="v2"
+        ):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+            
+            if kind == "on_chat_model_stream" and ANSWER_TAG in event.get("tags", []):
+                text = event["data"]["chunk"].content
+                if text:
+                    yield "token", {"text": text}
+            elif kind == "on_custom_event" and event["name"] == SOURCES_EVENT:
+                yield "sources", {"node": node, **event["data"]}
+            elif kind == "on_chain_end" and event["name"] == node == "supervisor":
+                output = event["data"].get("output") or {}
+                yield "route", {
+                    "department": output.get("department"),
+                    "route": route_to_department(output),
+                }
+            elif kind == "on_chain_end" and event["name"] == node == "ece":
+                output = event["data"].get("output") or {}
+                yield "route", {"track": route_to_ece_track(output)}
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # End of the top-level graph run carries the final state
+                result = event["data"].get("output")
+        
+        if result is None:
+            raise RuntimeError("Graph finished without producing a final state")
+        retrieval_stats.record_answer(time.perf_counter() - started)
+        
+        response = build_query_response(result, query_text)
+        store_answer(query_text, cache_context, result, response)
+        payload = response.dict() if hasattr(response, "dict") else dict(response)
+        payload["schedule"] = extract_schedule_data(payload.get("content", ""))
+        yield "done", payload
+    except Exception as e:
+        logger.error(f"Error streaming query: {str(e)}", exc_info=True)
+        yield "error", {"detail": f"I apologize, but an error occurred: {str(e)}"}
+
+
 def extract_content_from_llm_response(result):
     """Extract content from LLM response"""
     try:
@@ -235,6 +440,7 @@ def build_graph():
     graph.add_node("ece_track", ece_track)
     graph.add_node("schedule_helper", schedule_helper)
     graph.add_node("invalid_handler", invalid_query_handler)  # Add the new node
+    graph.add_node("memory", summarize_memory)  # Folds old turns into the running summary
     
     # Define edges
     graph.add_edge(START, "supervisor")
@@ -253,8 +459,8 @@ def build_graph():
         }
     )
     
-    # Connect invalid_handler to END
-    graph.add_edge("invalid_handler", END)
+    # Connect invalid_handler to the memory node
+    graph.add_edge("invalid_handler", "memory")
     
     # Add conditional edges for ECE routes without using transformers
     # Simpler approach compatible with the current LangGraph version
@@ -268,15 +474,16 @@ def build_graph():
         }
     )
     
-    # Connect all department nodes to END
-    graph.add_edge("chemical", END)
-    graph.add_edge("mechanical", END)
-    graph.add_edge("civil", END)
-    graph.add_edge("industrial", END)
-    graph.add_edge("msfea_advisor", END)
-    graph.add_edge("cse", END)
-    graph.add_edge("cce", END)
-    graph.add_edge("ece_track", END)
+    # Connect all department nodes to the memory node, which ends the run
+    graph.add_edge("chemical", "memory")
+    graph.add_edge("mechanical", "memory")
+    graph.add_edge("civil", "memory")
+    graph.add_edge("industrial", "memory")
+    graph.add_edge("msfea_advisor", "memory")
+    graph.add_edge("cse", "memory")
+    graph.add_edge("cce", "memory")
+    graph.add_edge("ece_track", "memory")
+    graph.add_edge("memory", END)
     
     # Compile the graph with memory checkpointer
     return graph.compile(checkpointer=memory)
@@ -1,7 +1,12 @@
 from typing import Dict, List, Optional, Union, Any, Literal, cast
-from concurrent.futures import ThreadPoolExecutor, as_completed, Future
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, Future, wait
 import json
 import logging
+import threading
+import time
+
+from app.core.config import FANOUT_MAX_WORKERS, FANOUT_NAMESPACE_TIMEOUT_SECONDS
+from app.db.namespace_aliases import namespace_aliases
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -47,22 +52,36 @@ class AgentRestrictedIndex:
     verifies the agent has access to the requested namespace.
     """
     
-    def __init__(self, index, agent_id: str):
+    def __init__(self, index, agent_id: str, allowed_namespaces: Optional[List[str]] = None):
         """
         Initialize the restricted index.
         
         Args:
             index: The underlying Pinecone index
             agent_id: The ID of the agent using this index
+            allowed_namespaces: Namespaces this index may access; defaults to the
+                agent's namespaces in the registry
         """
         self._index = index
         self._agent_id = agent_id
-        self._allowed_namespaces = namespace_registry.get_allowed_namespaces(agent_id)
+        self._explicit_namespaces = allowed_namespaces is not None
+        if self._explicit_namespaces:
+            self._allowed_namespaces = list(allowed_namespaces)
+        else:
+            self._allowed_namespaces = namespace_registry.get_allowed_namespaces(agent_id)
         logger.info(f"Created restricted index for agent '{agent_id}' with allowed namespaces: {self._allowed_namespaces}")
     
+    def _has_access(self, namespace: str) -> bool:
+        if self._explicit_namespaces:
+            return namespace in self._allowed_namespaces
+        return namespace_registry.has_namespace_access(self._agent_id, namespace)
+    
     def _check_namespace_access(self, namespace: Optional[str]) -> str:
         """
         Check if the agent has access to the specified namespace.
+        
+        Permissions are granted on logical namespaces; the physical namespace
+        currently serving it (see app.db.namespace_aliases) is returned.
         """
         # If namespace is None or empty, use the agent's specific namespace
         if not namespace:
@@ -73,13 +92,13 @@ class AgentRestrictedIndex:
             else:
                 namespace = ''  # Empty string is default if no allowed namespaces
         
-        if not namespace_registry.has_namespace_access(self._agent_id, namespace):
+        if not self._has_access(namespace):
             raise PermissionError(
                 f"Agent '{self._agent_id}' does not have access to namespace '{namespace}'. "
                 f"Allowed namespaces: {self._allowed_namespaces}"
             )
         
-        return namespace
+        return namespace_aliases.resolve(namespace)
     
     def query(self, vector, namespace=None, top_k=None, filter=None, include_values=None, 
               include_metadata=None, sparse_vector=None, **kwargs):
@@ -110,7 +129,7 @@ class AgentRestrictedIndex:
         # Filter namespaces to only include those the agent has access to
         authorized_namespaces = [
             ns for ns in namespaces 
-            if namespace_registry.has_namespace_access(self._agent_id, ns)
+            if self._has_access(ns)
         ]
         
         if not authorized_namespaces:
@@ -124,7 +143,7 @@ class AgentRestrictedIndex:
         # Call the original query_namespaces with only the authorized namespaces
         return self._index.query_namespaces(
             vector=vector,
-            namespaces=authorized_namespaces,
+            namespaces=[namespace_aliases.resolve(ns) for ns in authorized_namespaces],
             metric=metric,
             top_k=top_k,
             filter=filter,
@@ -134,6 +153,111 @@ class AgentRestrictedIndex:
             **kwargs
         )
     
+    def fan_out_query(self, vector, namespaces=None, top_k=10, filter=None, metric="cosine",
+                      include_metadata=True, timeout=None, **kwargs) -> Dict[str, Any]:
+        """
+        Query several authorized namespaces concurrently and merge the matches by score.
+        
+        Each namespace is queried on the shared fan-out pool. Namespaces that do
+        not answer within the timeout (or fail) are reported and left out of
+        the merge instead of failing the whole query. The timeout runs from
+        when a namespace's query starts and is also passed to the request
+        itself, so a slow namespace frees its pool worker instead of holding
+        it after the merge; a query still queued in the pool after the timeout
+        is cancelled.
+        
+        Args:
+            vector: Query embedding
+            namespaces: Namespaces to search; defaults to every namespace the agent may access
+            top_k: Number of merged matches to return (and per-namespace candidates)
+            filter: Metadata filter applied in every namespace
+            metric: Index metric; "euclidean" ranks lower scores first
+            include_metadata: Whether matches carry their metadata
+            timeout: Seconds each namespace may take (FANOUT_NAMESPACE_TIMEOUT_SECONDS by default)
+            
+        Returns:
+            Dict with "matches" (each with its "namespace") and "namespaces",
+            mapping each namespace to its status, latency_ms and match count
+        """
+        requested = list(namespaces) if namespaces is not None else list(self._allowed_namespaces)
+        authorized = [ns for ns in requested if self._has_access(ns)]
+        if not authorized:
+            raise PermissionError(
+                f"Agent '{self._agent_id}' does not have access to any of the requested namespaces: {requested}. "
+                f"Allowed namespaces: {self._allowed_namespaces}"
+            )
+        timeout = FANOUT_NAMESPACE_TIMEOUT_SECONDS if timeout is None else timeout
+        
+        started = time.perf_counter()
+        started_at = {}
+        finished_at = {}
+        
+        def query_namespace(namespace):
+            started_at.setdefault(namespace, time.perf_counter())
+            try:
+                # Pinecone gives up on the request itself (local indexes ignore it)
+                return self._index.query(vector=vector, namespace=namespace_aliases.resolve(namespace),
+                                         top_k=top_k, filter=filter, include_metadata=include_metadata,
+                                         **{"_request_timeout": timeout, **kwargs})
+            finally:
+                finished_at[namespace] = time.perf_counter()
+        
+        pool = _get_fanout_pool()
+        futures = {pool.submit(query_namespace, namespace): namespace for namespace in authorized}
+        
+        # Each namespace gets `timeout` from when it starts; time spent queued behind
+        # other fan-outs does not count, but a query not started within `timeout` is cancelled
+        pending = set(futures)
+        timed_out = set()
+        while pending:
+            now = time.perf_counter()
+            deadlines = []
+            for future in list(pending):
+                namespace = futures[future]
+                if namespace not in started_at and now - started >= timeout:
+                    if future.cancel():
+                        pending.discard(future)
+                        timed_out.add(future)
+                        continue
+                    # Already running; its clock starts now at the latest
+                    started_at.setdefault(namespace, now)
+                deadline = started_at.get(namespace, started) + timeout
+                if now >= deadline:
+                    pending.discard(future)
+                    timed_out.add(future)
+                else:
+                    deadlines.append(deadline)
+            if pending:
+                done, _ = wait(pending, timeout=min(deadlines) - now, return_when=FIRST_COMPLETED)
+                pending -= done
+        
+        report = {}
+        matches = []
+        for future, namespace in futures.items():
+            if future in timed_out:
+                report[namespace] = {"status": "timeout", "latency_ms": round(timeout * 1000, 1), "matches": 0}
+                continue
+            latency_ms = round((finished_at.get(namespace, started) - started_at.get(namespace, started)) * 1000, 1)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Fan-out query of namespace '{namespace}' failed: {str(e)}")
+                report[namespace] = {"status": "error", "latency_ms": latency_ms, "matches": 0}
+                continue
+            namespace_matches = [
+                {"id": match["id"], "score": match["score"], "metadata": match.get("metadata") or {},
+                 "namespace": namespace}
+                for match in result["matches"]
+            ]
+            matches.extend(namespace_matches)
+            report[namespace] = {"status": "ok", "latency_ms": latency_ms, "matches": len(namespace_matches)}
+        
+        matches.sort(key=lambda match: match["score"], reverse=metric != "euclidean")
+        logger.info(f"Agent '{self._agent_id}' fan-out over {len(authorized)} namespaces in "
+                    f"{(time.perf_counter() - started) * 1000:.1f} ms: "
+                    + ", ".join(f"{ns}={info['latency_ms']}ms/{info['status']}" for ns, info in report.items()))
+        return {"matches": matches[:top_k], "namespaces": report}
+    
     def upsert(self, vectors, namespace=None, batch_size=None, show_progress=None, **kwargs):
         """
         Wrapper for the upsert method that enforces namespace restrictions.
@@ -212,18 +336,33 @@ class AgentRestrictedIndex:
         return getattr(self._index, name)
 
 
-def get_restricted_index(index, agent_id: str) -> AgentRestrictedIndex:
+_fanout_pool = None
+_fanout_pool_lock = threading.Lock()
+
+
+def _get_fanout_pool() -> ThreadPoolExecutor:
+    """Bounded thread pool shared by all fan-out queries"""
+    global _fanout_pool
+    if _fanout_pool is None:
+        with _fanout_pool_lock:
+            if _fanout_pool is None:
+                _fanout_pool = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
+    return _fanout_pool
+
+
+def get_restricted_index(index, agent_id: str, allowed_namespaces: Optional[List[str]] = None) -> AgentRestrictedIndex:
     """
     Factory function to create a namespace-restricted index for an agent.
     
     Args:
         index: The Pinecone index to wrap
         agent_id: The ID of the agent that will use this index
+        allowed_namespaces: Optional explicit namespaces, instead of the agent's registered ones
         
     Returns:
         A namespace-restricted index
     """
-    return AgentRestrictedIndex(index, agent_id)
+    return AgentRestrictedIndex(index, agent_id, allowed_namespaces)
 
 
 def register_agent_namespaces(agent_id: str, namespaces: List[str]):
@@ -0,0 +1,181 @@
+from typing import Any, Dict, Optional, Sequence
+import logging
+import re
+import threading
+
+import numpy as np
+
+from app.core.config import (
+    ANSWER_CACHE_ENABLED,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_SEMANTIC_ENABLED,
+    ANSWER_CACHE_SEMANTIC_MAX_ENTRIES,
+    ANSWER_CACHE_SEMANTIC_THRESHOLD,
+)
+from app.services.ttl_cache import TTLLRUCache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Words whose meaning depends on earlier turns ("what about its prerequisites?")
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|that|this|those|these|they|them|their|he|she|his|her|him|same|"
+    r"above|previous|earlier|instead|also|else|more|another|other)\b"
+    r"|^(and|but|so|what about|how about|then)\b",
+    re.IGNORECASE,
+)
+
+def normalize_query(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace so trivially different queries match"""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+def is_follow_up(text: str, has_history: bool) -> bool:
+    """
+    Check whether a query's meaning likely depends on earlier turns
+
+    Args:
+        text: The user's query
+        has_history: Whether the conversation already has previous turns
+    """
+    if not has_history:
+        return False
+    normalized = normalize_query(text)
+    # Very short messages in an ongoing conversation ("why?", "and CCE?") are follow-ups
+    return len(normalized.split()) <= 3 or bool(FOLLOW_UP_PATTERN.search(normalized))
+
+
+class AnswerCache:
+    """
+    Two-tier answer cache in front of the advisor graph.
+
+    The exact tier is keyed on (routed department, normalized query). The
+    semantic tier stores the query embedding and returns a cached answer
+    when a new query in the same department is within the cosine threshold.
+    Both tiers use TTL expiry and LRU eviction.
+    """
+
+    def __init__(self, enabled: bool = True, max_entries: int = 1000, ttl_seconds: float = 3600,
+                 semantic_enabled: bool = True, semantic_max_entries: int = 500,
+                 semantic_threshold: float = 0.95):
+        self.enabled = enabled
+        self.semantic_enabled = semantic_enabled
+        self.semantic_threshold = semantic_threshold
+        self._exact = TTLLRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._semantic = TTLLRUCache(max_entries=semantic_max_entries, ttl_seconds=ttl_seconds)
+        self._lock = threading.Lock()
+        self._counters = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "invalidated": 0,
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def record_bypass(self):
+        """Count a query that skipped the cache (e.g. a conversational follow-up)"""
+        self._count("bypassed")
+
+    def get_exact(self, query: str, department: str) -> Optional[Dict[str, Any]]:
+        """Look up a stored answer for exactly this (normalized) query and department"""
+        if not self.enabled:
+            return None
+        response = self._exact.get((department, normalize_query(query)))
+        if response is not None:
+            self._count("exact_hits")
+        return response
+
+    def get_semantic(self, embedding: Sequence[float], department: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the most similar stored query in the same department
+
+        Returns:
+            The stored answer if its cosine similarity is at least the threshold, else None
+        """
+        if not (self.enabled and self.semantic_enabled) or embedding is None:
+            return None
+        candidates = [(key, value) for key, value in self._semantic.items() if key[0] == department]
+        if not candidates:
+            return None
+        query_vector = _unit(embedding)
+        matrix = np.stack([vector for _, (vector, _) in candidates])
+        scores = matrix @ query_vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+        key, (_, response) = candidates[best]
+        # Touch the entry so frequently matched answers stay resident
+        self._semantic.get(key)
+        self._count("semantic_hits")
+        logger.info(f"Semantic answer cache hit for department '{department}' (cosine={scores[best]:.3f})")
+        return response
+
+    def record_miss(self):
+        self._count("misses")
+
+    def put(self, query: str, department: str, response: Dict[str, Any],
+            embedding: Optional[Sequence[float]] = None):
+        """Store an answer in the exact tier and, if an embedding is given, the semantic tier"""
+        if not self.enabled:
+            return
+        key = (department, normalize_query(query))
+        self._exact.put(key, response)
+        if self.semantic_enabled and embedding is not None:
+            self._semantic.put(key, (_unit(embedding), response))
+        self._count("stores")
+
+    def invalidate(self, department: Optional[str] = None) -> int:
+        """
+        Drop cached answers for one department, or everything when department is None
+
+        Returns:
+            Number of entries removed across both tiers
+        """
+        if department is None:
+            removed = len(self._exact) + len(self._semantic)
+            self._exact.clear()
+            self._semantic.clear()
+        else:
+            in_department = lambda key, _: key[0] == department
+            removed = self._exact.remove_where(in_department) + self._semantic.remove_where(in_department)
+        self._count("invalidated", removed)
+        logger.info(f"Invalidated {removed} cached answers for department: {department or 'all'}")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["exact_hits"] + counters["semantic_hits"] + counters["misses"]
+        hits = counters["exact_hits"] + counters["semantic_hits"]
+        return {
+            "enabled": self.enabled,
+            **counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "exact_tier": self._exact.stats(),
+            "semantic_tier": {**self._semantic.stats(), "threshold": self.semantic_threshold},
+        }
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    """Return the vector as a float32 unit vector so dot products are cosine similarities"""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+# Global answer cache instance
+answer_cache = AnswerCache(
+    enabled=ANSWER_CACHE_ENABLED,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+    semantic_enabled=ANSWER_CACHE_SEMANTIC_ENABLED,
+    semantic_max_entries=ANSWER_CACHE_SEMANTIC_MAX_ENTRIES,
+    semantic_threshold=ANSWER_CACHE_SEMANTIC_THRESHOLD,
+)
@@ -0,0 +1,362 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import re
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import PyPDFLoader, TextLoader, UnstructuredMarkdownLoader
+
+from app.core.config import INGEST_PDF_PAGES_PER_TASK, INGEST_PDF_PROCESSES
+
+try:
+    import pypdf
+except ImportError:  # Optional dependency, only needed for PDF documents
+    pypdf = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# One match per line: a term header ("Term III (Fall)", any case), possibly
+# followed by the first row of its table, or a course code of any subject
+# ("EECE 230", "MECH 310 Thermodynamics", "CHEN 311L ...") with an optional
+# title; a title starts with a capital or digit, so a cross-reference wrapped to
+# the start of a line ("MECH 310 for background.") stays in the running text
+STRUCTURE_LINE_PATTERN = re.compile(
+    r"^\s*(?:"
+    r"(?P<term>(?i:Term\s+[IVX]+\s*\((?:Fall|Spring|Summer)\)))\s*(?P<rest>.*)"
+    r"|(?P<subject>[A-Z]{4})\s(?P<number>\d{3}[A-Z]?)(?:\s+(?P<title>[A-Z0-9(].*?))?\s*$"
+    r")"
+)
+
+# Rows of a term's course table name a course or end in a credit count ("Technical Elective 3",
+# "Total 17"); until its first course, shorter lines are read as column headings
+TABLE_ROW_PATTERN = re.compile(r"\d+(?:\.\d+)?\s*(?:cr\.?|credits?)?$", re.IGNORECASE)
+TABLE_HEADING_MAX_CHARS = 80
+# A term or course section is closed once its text reaches this many characters
+SECTION_MAX_CHARS = 4000
+
+
+class CatalogScanner:
+    """
+    Single-pass scanner of a catalog's term and course structure.
+
+    The text is read line by line, page after page, and each line is matched
+    once against STRUCTURE_LINE_PATTERN. A term header opens the term's
+    course table, whose rows follow it; a course header of any subject
+    opens a course description running to the next header. A table row
+    followed by prose is read as the header of a description instead. Every
+    finished section becomes one chunk: term chunks carry `term` and the
+    `course_codes` in their table, course chunks `course_code`, `course_title`
+    and `subject`. The only state kept between pages is the section being
+    read, which is closed at SECTION_MAX_CHARS.
+    """
+
+    def __init__(self, source: str, max_section_chars: int = SECTION_MAX_CHARS):
+        self.source = source
+        self.max_section_chars = max_section_chars
+        self._section: Optional[Dict[str, Any]] = None
+
+    def feed(self, text: str) -> List[Document]:
+        """Scan the next page and return the chunks it completed"""
+        chunks: List[Document] = []
+        for line in text.split("\n"):
+            self._scan_line(line, chunks)
+        return chunks
+
+    def close(self) -> List[Document]:
+        """Return the section left open at the end of the document"""
+        chunks: List[Document] = []
+        self._close_section(chunks)
+        return chunks
+
+    def _scan_line(self, line: str, chunks: List[Document]):
+        match = STRUCTURE_LINE_PATTERN.match(line)
+        section = self._section
+        if match and match.group("term"):
+            self._close_section(chunks)
+            self._section = {"kind": "term", "term": " ".join(match.group("term").split()),
+                             "lines": [], "course_codes": [], "last_row_code": None, "chars": 0}
+            if match.group("rest"):
+                self._scan_line(match.group("rest"), chunks)
+            return
+
+        code = f"{match.group('subject')} {match.group('number')}" if match else None
+        if section is not None and section["kind"] == "term":
+            row = line.strip()
+            if not row:
+                return
+            if code or TABLE_ROW_PATTERN.search(row) \
+                    or (not section["course_codes"] and len(row) <= TABLE_HEADING_MAX_CHARS):
+                section["lines"].append(row)
+                section["chars"] += len(row) + 1
+                section["last_row_code"] = code
+                if code:
+                    section["course_codes"].append(code)
+                if section["chars"] >= self.max_section_chars:
+                    self._close_section(chunks)
+                return
+            # Prose after the table: a last row naming a course was a description's header
+            header = None
+            if section["last_row_code"]:
+                header = STRUCTURE_LINE_PATTERN.match(section["lines"].pop())
+                section["course_codes"].pop()
+            self._close_section(chunks)
+            if header and header.group("title"):
+                self._open_course(header)
+                self._add_to_course(line, chunks)
+            return
+
+        if code and match.group("title"):
+            self._close_section(chunks)
+            self._open_course(match)
+        elif section is not None:
+            self._add_to_course(line, chunks)
+        # Lines outside any section only go into the general chunks
+
+    def _open_course(self, match: re.Match):
+        self._section = {"kind": "course", "subject": match.group("subject"),
+                         "course_code": f"{match.group('subject')} {match.group('number')}",
+                         "course_title": match.group("title"), "lines": [], "chars": 0}
+
+    def _add_to_course(self, line: str, chunks: List[Document]):
+        self._section["lines"].append(line)
+        self._section["chars"] += len(line) + 1
+        if self._section["chars"] >= self.max_section_chars:
+            self._close_section(chunks)
+
+    def _close_section(self, chunks: List[Document]):
+        section, self._section = self._section, None
+        if section is None:
+            return
+        if section["kind"] == "term":
+            metadata = {"term": section["term"], "source": self.source}
+            if section["course_codes"]:
+                metadata["course_codes"] = section["course_codes"]
+            content = "\n".join([section["term"], *section["lines"]])
+        else:
+            metadata = {key: section[key] for key in ("course_code", "course_title", "subject")}
+            metadata["source"] = self.source
+            body = "\n".join(section["lines"]).strip()
+            content = f"{section['course_code']} {section['course_title']}\n{body}".strip()
+        chunks.append(Document(page_content=content, metadata=metadata))
+
+    def fingerprint(self) -> str:
+        """Digest of the open section; two scanners with the same one scan the rest of a text alike"""
+        return hashlib.sha1(json.dumps(self._section, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def state(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._section)
+
+    def resume(self, state: Optional[Dict[str, Any]]):
+        """Continue from another scanner's state, as if it had been fed the same pages"""
+        self._section = copy.deepcopy(state)
+
+
+def scan_catalog(text: str, source: str) -> List[Document]:
+    """Term and course description chunks of a whole text"""
+    scanner = CatalogScanner(source)
+    return scanner.feed(text) + scanner.close()
+
+
+def general_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        is_separator_regex=False,
+    )
+
+
+# PDF reader of a worker process, kept for its next tasks on the same file
+_worker_reader: Dict[str, Any] = {}
+
+
+def _pdf_reader(document_path: str):
+    if _worker_reader.get("path") != document_path:
+        _worker_reader.update(path=document_path, reader=pypdf.PdfReader(document_path))
+    return _worker_reader["reader"]
+
+
+def _chunk_pdf_pages(document_path: str, first: int, last: int, document_metadata: Dict[str, Any],
+                     page_labels: List[str], chunk_size: int, chunk_overlap: int,
+                     source: str) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Worker task: extract and chunk pages [first, last) of a PDF
+
+    The catalog scanner starts afresh at `first`; the parent reconciles it
+    with the pages before (see StreamingChunker.pdf_chunks).
+
+    Returns:
+        Per page its text, general and structure chunks and the scanner's
+        fingerprint after it, and the scanner's state at the end
+    """
+    reader = _pdf_reader(document_path)
+    splitter = general_splitter(chunk_size, chunk_overlap)
+    scanner = CatalogScanner(source)
+    pages = []
+    for number in range(first, last):
+        # The same text and metadata PyPDFLoader gives the page
+        text = reader.pages[number].extract_text().strip()
+        page = Document(page_content=text,
+                        metadata={**document_metadata, "page": number, "page_label": page_labels[number - first]})
+        pages.append({
+            "text": text,
+            "general": splitter.split_documents([page]),
+            "structure": scanner.feed(text),
+            "fingerprint": scanner.fingerprint(),
+        })
+    return pages, scanner.state()
+
+
+class StreamingChunker:
+    """
+    Turns a document's pages into general, term and course description chunks
+    as the pages arrive, so chunks can be embedded while later pages are still
+    being parsed and no page is kept once it has been split.
+    """
+
+    def __init__(self, source: str, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 metadata: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            source: Source document name set on every chunk
+            chunk_size: Characters per general chunk
+            chunk_overlap: Characters shared by consecutive general chunks
+            metadata: Extra metadata added to every chunk
+        """
+        self.source = source
+        self.metadata = metadata
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.splitter = general_splitter(chunk_size, chunk_overlap)
+        self.counts = {"pages": 0, "general": 0, "term": 0, "course": 0}
+        # Course code -> the first term whose table lists it
+        self._course_terms: Dict[str, str] = {}
+
+    def _finish(self, chunks: List[Document], kind: Optional[str] = None) -> List[Document]:
+        for chunk in chunks:
+            chunk_kind = kind or ("term" if "term" in chunk.metadata else "course")
+            self.counts[chunk_kind] += 1
+            if chunk_kind == "term":
+                for code in chunk.metadata.get("course_codes", []):
+                    self._course_terms.setdefault(code, chunk.metadata["term"])
+            elif chunk_kind == "course" and chunk.metadata["course_code"] in self._course_terms:
+                # Curricula come before course descriptions in a catalog
+                chunk.metadata["term"] = self._course_terms[chunk.metadata["course_code"]]
+            chunk.metadata.setdefault("source", self.source)
+            if self.metadata:
+                chunk.metadata.update(self.metadata)
+        return chunks
+
+    def chunks(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """
+        Chunk the pages lazily
+
+        Args:
+            pages: The document's pages in order (e.g. a loader's lazy_load())
+
+        Yields:
+            Chunks in the order they are completed
+        """
+        scanner = CatalogScanner(self.source)
+        for page in pages:
+            self.counts["pages"] += 1
+            yield from self._finish(self.splitter.split_documents([page]), kind="general")
+            yield from self._finish(scanner.feed(page.page_content))
+        yield from self._close(scanner)
+
+    def pdf_chunks(self, document_path: str, processes: int = INGEST_PDF_PROCESSES,
+                   pages_per_task: int = INGEST_PDF_PAGES_PER_TASK) -> Iterator[Document]:
+        """
+        Chunk a PDF with its pages extracted and chunked in worker processes
+
+        The pages are split into ranges of `pages_per_task` that the workers
+        extract and chunk in parallel, and the results are merged in page
+        order. A worker's catalog scanner starts without the section left open
+        by the previous range, so the parent replays the start of each range
+        through its own scanner until their state matches the worker's
+        (usually after the first page) and takes the worker's chunks from
+        there. The chunks, and so their ids, are the same as chunks()
+        over PyPDFLoader's pages.
+
+        Args:
+            document_path: The PDF file
+            processes: Worker processes
+            pages_per_task: Pages extracted and chunked per worker task
+
+        Yields:
+            Chunks in page order
+        """
+        if pypdf is None:
+            raise ImportError("Parsing PDF documents requires the 'pypdf' package")
+        # Document-level metadata exactly as PyPDFLoader sets it on every page
+        loaded_pages = PyPDFLoader(document_path).lazy_load()
+        first_page = next(loaded_pages, None)
+        loaded_pages.close()
+        if first_page is None:
+            return
+        document_metadata = {key: value for key, value in first_page.metadata.items()
+                             if key not in ("page", "page_label")}
+        reader = pypdf.PdfReader(document_path)
+        page_count = len(reader.pages)
+        # Computed once here; PyPDFLoader recomputes every label for each page
+        page_labels = reader.page_labels
+        del first_page, reader
+
+        ranges = iter([(first, min(first + pages_per_task, page_count))
+                       for first in range(0, page_count, pages_per_task)])
+        scanner = CatalogScanner(self.source)
+        # Spawned workers do not inherit the ingesting process's threads and open connections
+        tasks = deque()
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            def submit(count):
+                for first, last in itertools.islice(ranges, count):
+                    tasks.append(pool.submit(_chunk_pdf_pages, document_path, first, last, document_metadata,
+                                             page_labels[first:last], self.chunk_size, self.chunk_overlap,
+                                             self.source))
+
+            # One task queued behind each busy worker, so parsing does not run far ahead of the embedding
+            submit(2 * processes)
+            while tasks:
+                pages, state = tasks.popleft().result()
+                submit(1)
+                yield from self._merge_range(pages, state, scanner)
+        yield from self._close(scanner)
+
+    def _merge_range(self, pages: List[Dict[str, Any]], state: Optional[Dict[str, Any]],
+                     scanner: CatalogScanner) -> Iterator[Document]:
+        # The first range starts where the document does, so its worker was in step from the start
+        in_step = self.counts["pages"] == 0
+        for page in pages:
+            self.counts["pages"] += 1
+            yield from self._finish(page["general"], kind="general")
+            if in_step:
+                yield from self._finish(page["structure"])
+            else:
+                yield from self._finish(scanner.feed(page["text"]))
+                in_step = scanner.fingerprint() == page["fingerprint"]
+        if in_step:
+            scanner.resume(state)
+
+    def _close(self, scanner: CatalogScanner) -> Iterator[Document]:
+        yield from self._finish(scanner.close())
+        logger.info(f"Chunked {self.counts['pages']} pages of '{self.source}': {self.counts['general']} general, "
+                    f"{self.counts['term']} term and {self.counts['course']} course description chunks")
+
+
+def get_document_loader(document_path: str):
+    """Loader for a PDF, Markdown or text file"""
+    file_extension = os.path.splitext(document_path)[1].lower()
+    if file_extension == '.pdf':
+        return PyPDFLoader(document_path)
+    if file_extension == '.md':
+        return UnstructuredMarkdownLoader(document_path)
+    return TextLoader(document_path, encoding='utf-8')
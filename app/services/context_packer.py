@@ -0,0 +1,161 @@
+from typing import Any, Dict, FrozenSet, List, Optional
+import hashlib
+import logging
+import re
+import threading
+
+from app.core.config import (
+    CONTEXT_DUPLICATE_THRESHOLD,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_TOKEN_BUDGETS,
+    LLM_ANSWERER_MODEL,
+)
+from app.services.conversation_memory import count_tokens, truncate_to_tokens
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+# Chunks are compared as sets of overlapping word 5-grams
+SHINGLE_SIZE = 5
+
+
+def _normalized_words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+def _shingles(words: List[str]) -> FrozenSet[str]:
+    if len(words) <= SHINGLE_SIZE:
+        return frozenset([" ".join(words)]) if words else frozenset()
+    return frozenset(" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+
+
+def _containment(inner: FrozenSet[str], outer: FrozenSet[str]) -> float:
+    """Fraction of inner's shingles that also occur in outer"""
+    if not inner:
+        return 1.0
+    return len(inner & outer) / len(inner)
+
+
+class ContextPacker:
+    """
+    Assembles retrieved chunks into the context of an answering prompt.
+
+    Ingestion stores overlapping general, term and course-description chunks
+    of the same text, so retrieval often returns one paragraph several times.
+    The packer drops exact duplicates (after case and whitespace folding) and
+    chunks whose word 5-grams are mostly contained in a chunk already kept; a
+    kept chunk that is contained in a later, longer one is replaced by it in
+    place. Chunks are ordered by their "score" when they carry one (otherwise
+    the retrieval order is kept) and packed greedily into the model's token
+    budget.
+    """
+
+    def __init__(self, default_budget: int = 3000, budgets: Optional[Dict[str, int]] = None,
+                 duplicate_threshold: float = 0.8):
+        """
+        Args:
+            default_budget: Context token budget for models without their own
+            budgets: Token budget per model name
+            duplicate_threshold: Shingle containment at which a chunk counts as a near duplicate
+        """
+        self.default_budget = default_budget
+        self.budgets = dict(budgets or {})
+        self.duplicate_threshold = duplicate_threshold
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "chunks_in": 0, "chunks_out": 0, "duplicates": 0,
+                        "over_budget": 0, "tokens_in": 0, "tokens_out": 0}
+
+    def budget_for(self, model: Optional[str] = None) -> int:
+        return self.budgets.get(model or LLM_ANSWERER_MODEL, self.default_budget)
+
+    def deduplicate(self, context: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Remove exact and near-duplicate chunks, keeping the best-ranked position"""
+        kept: List[Dict[str, Any]] = []
+        kept_shingles: List[FrozenSet[str]] = []
+        seen_hashes = set()
+        for item in context:
+            words = _normalized_words(item["content"])
+            digest = hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+            if digest in seen_hashes:
+                continue
+            seen_hashes.add(digest)
+            shingles = _shingles(words)
+            duplicate = False
+            for position, other in enumerate(kept_shingles):
+                if _containment(shingles, other) >= self.duplicate_threshold:
+                    duplicate = True
+                    break
+                if _containment(other, shingles) >= self.duplicate_threshold:
+                    # The new chunk covers a kept one: keep the longer text at the better rank
+                    kept[position], kept_shingles[position] = item, shingles
+                    duplicate = True
+                    break
+            if not duplicate:
+                kept.append(item)
+                kept_shingles.append(shingles)
+        return kept
+
+    def pack(self, context: List[Dict[str, Any]], agent: str = "", model: Optional[str] = None,
+             budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Deduplicate, order and budget the context of one prompt
+
+        Args:
+            context: Items with "content" (and "source", optionally "score"), best first
+            agent: Name used in the log line
+            model: Model the prompt is sent to (selects the token budget)
+            budget: Explicit token budget, overriding the model's
+
+        Returns:
+            The packed context items
+        """
+        if not context:
+            return context
+        budget = budget if budget is not None else self.budget_for(model)
+        tokens_in = sum(count_tokens(item["content"]) for item in context)
+
+        ordered = context
+        if any("score" in item for item in context):
+            ordered = sorted(context, key=lambda item: item.get("score", float("-inf")), reverse=True)
+        unique = self.deduplicate(ordered)
+
+        packed = []
+        used = 0
+        for item in unique:
+            tokens = count_tokens(item["content"])
+            if used + tokens <= budget:
+                packed.append(item)
+                used += tokens
+            elif not packed:
+                # Even the best chunk is over budget: keep its beginning rather than nothing
+                packed.append({**item, "content": truncate_to_tokens(item["content"], budget)})
+                used = budget
+
+        with self._lock:
+            self._counts["requests"] += 1
+            self._counts["chunks_in"] += len(context)
+            self._counts["chunks_out"] += len(packed)
+            self._counts["duplicates"] += len(context) - len(unique)
+            self._counts["over_budget"] += len(unique) - len(packed)
+            self._counts["tokens_in"] += tokens_in
+            self._counts["tokens_out"] += used
+        logger.info(f"Context packer{f' ({agent})' if agent else ''}: {len(context)} chunks -> {len(packed)} "
+                    f"({len(context) - len(unique)} duplicates), {tokens_in} -> {used} tokens "
+                    f"({tokens_in - used} saved, budget {budget})")
+        return packed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["tokens_saved"] = counts["tokens_in"] - counts["tokens_out"]
+        counts["budgets"] = {"default": self.default_budget, **self.budgets}
+        return counts
+
+
+# Global packer shared by the department and track nodes
+context_packer = ContextPacker(
+    default_budget=CONTEXT_TOKEN_BUDGET,
+    budgets=CONTEXT_TOKEN_BUDGETS,
+    duplicate_threshold=CONTEXT_DUPLICATE_THRESHOLD,
+)
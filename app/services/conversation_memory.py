@@ -0,0 +1,144 @@
+from typing import Any, List
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage
+from langchain_core.runnables import RunnableConfig
+from app.core.config import (
+    MEMORY_WINDOW_TURNS,
+    MEMORY_SUMMARY_BATCH_TURNS,
+)
+from app.core.clients import get_llm
+from app.models.schemas import State
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Small model that folds old turns into the running summary (MEMORY_SUMMARY_MODEL)
+summary_llm = get_llm("summarizer")
+
+_encoding = None
+_encoding_failed = False
+
+def _get_encoding():
+    """Load the gpt-4o tokenizer once; None if tiktoken or its data is unavailable"""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model("gpt-4o")
+        except Exception as e:
+            _encoding_failed = True
+            logger.warning(f"tiktoken unavailable, estimating prompt tokens from length: {str(e)}")
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Count tokens in a string, estimating ~4 characters per token without tiktoken"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a string down to at most max_tokens tokens"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+def _role_and_content(message) -> tuple:
+    if isinstance(message, dict):
+        return message.get("role", "user"), str(message.get("content", ""))
+    return message.type, str(message.content)
+
+def count_prompt_tokens(messages: List[Any]) -> int:
+    """
+    Count the prompt tokens of a chat request
+
+    Args:
+        messages: Dict or LangChain messages as sent to the LLM
+
+    Returns:
+        Token count including the per-message chat formatting overhead
+    """
+    # Each message costs ~3 formatting tokens and the reply is primed with 3 more
+    return sum(3 + count_tokens(content) for _, content in map(_role_and_content, messages)) + 3
+
+def _turn_starts(messages: List[BaseMessage]) -> List[int]:
+    """Indices of the messages that start a turn (a user message)"""
+    return [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+
+def recent_messages(messages: List[BaseMessage], turns: int) -> List[BaseMessage]:
+    """Return the messages of the last `turns` turns"""
+    starts = _turn_starts(messages)
+    if len(starts) <= turns:
+        return list(messages)
+    return list(messages[starts[-turns]:])
+
+def build_prompt_messages(system_message: str, state: State) -> List[Any]:
+    """
+    Build the LLM prompt for a department or track node
+
+    The system prompt carries the running summary of older turns, followed by
+    the turns not yet summarized. summarize_memory keeps those to at most
+    MEMORY_WINDOW_TURNS + MEMORY_SUMMARY_BATCH_TURNS turns, so prompt size
+    stays bounded however long the conversation gets.
+
+    Args:
+        system_message: The node's system prompt
+        state: The current graph state
+    """
+    summary = state.get("summary")
+    if summary:
+        system_message = f"{system_message}\n    Summary of the earlier conversation with this student:\n    {summary}\n"
+    # The cap only matters if summarizing keeps failing and the history grows
+    window = recent_messages(state["messages"], MEMORY_WINDOW_TURNS + MEMORY_SUMMARY_BATCH_TURNS)
+    return [{"role": "system", "content": system_message}] + window
+
+def _format_transcript(messages: List[BaseMessage]) -> str:
+    lines = []
+    for message in messages:
+        role, content = _role_and_content(message)
+        lines.append(f"{'Student' if role == 'human' else 'Advisor'}: {content.strip()}")
+    return "\n".join(lines)
+
+async def summarize_memory(state: State, config: RunnableConfig = None):
+    """
+    Fold turns that fell out of the window into the running summary
+
+    Runs after the answering node. To keep the summary incremental, only the
+    newly evicted turns are summarized (together with the previous summary)
+    and then removed from the state, and only once MEMORY_SUMMARY_BATCH_TURNS
+    turns beyond the window have accumulated.
+    """
+    messages = state.get("messages", [])
+    starts = _turn_starts(messages)
+    # Summarize before the next turn would push the history past the prompt cap
+    if len(starts) < MEMORY_WINDOW_TURNS + MEMORY_SUMMARY_BATCH_TURNS:
+        return {}
+
+    evicted = messages[:starts[-MEMORY_WINDOW_TURNS]]
+    previous = state.get("summary") or "(none yet)"
+    prompt = f"""
+    You maintain a running summary of a conversation between a student and the academic advisor at AUB's MSFEA.
+
+    Current summary:
+    {previous}
+
+    New conversation lines to fold in:
+    {_format_transcript(evicted)}
+
+    Return the updated summary in at most 150 words. Keep the student's program, courses, constraints,
+    decisions and open questions; drop greetings and details that no longer matter.
+    """
+    try:
+        response = await summary_llm.ainvoke([{"role": "user", "content": prompt}], config=config)
+    except Exception as e:
+        # Keep the full history this turn and try again on the next one
+        logger.error(f"Error updating conversation summary: {str(e)}")
+        return {}
+
+    logger.info(f"Folded {len(evicted)} messages into the conversation summary")
+    return {
+        "summary": response.content.strip(),
+        "messages": [RemoveMessage(id=message.id) for message in evicted],
+    }
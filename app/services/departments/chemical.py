@@ -1,25 +1,30 @@
-from langchain_openai import ChatOpenAI
-from app.core.config import OPENAI_API_KEY
+from app.core.clients import get_llm
 from app.models.schemas import State
+from app.services.streaming import answer_config, emit_sources
+from app.services.conversation_memory import build_prompt_messages, count_prompt_tokens
+from app.services.context_packer import context_packer
+from langchain_core.runnables import RunnableConfig
 from app.db.vector_store import get_agent_vectorstore
+from app.db.course_index import resolve_course_code, lookup_course_documents
+from app.services.retrieval import search_documents
 import logging
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI LLM
-llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model_name="gpt-4o"
-)
+# Shared OpenAI LLM (pooled connections, see app.core.clients)
+llm = get_llm("answerer")
 
 # Get a dedicated vector store for chemical department
 chemical_vectorstore = get_agent_vectorstore("chemical")
 
-def chemical_department(state: State):
+async def chemical_department(state: State, config: RunnableConfig = None):
     """Handle queries about the Chemical Engineering department"""
     user_message = state["messages"][-1].content
     query_type = state.get("query_type", "General")
+
+    # CHEN and PETR codes, or any other course indexed in chemical_namespace
+    course_code = resolve_course_code(user_message, "chemical_namespace", subjects=("CHEN", "PETR"))
     
     # Always retrieve from chemical's namespace, regardless of passed context
     search_query = f"Chemical Engineering: {query_type} - {user_message}"
@@ -28,13 +33,20 @@ def chemical_department(state: State):
         # Debug output to track the search
         logger.info(f"Searching chemical_namespace with query: {search_query}")
         
-        # Ensure we're using the correct vectorstore and namespace
-        chem_docs = chemical_vectorstore.similarity_search(
-            search_query, 
-            k=3,
-            namespace="chemical_namespace",  # Explicitly specify namespace
-            filter={"department": "chemical"}  # Add a filter for chemical department
-        )
+        # Exact lookup in the course index when a course is named: no embedding or vector query
+        chem_docs = lookup_course_documents(course_code, "chemical", "chemical_namespace", k=5) if course_code else []
+        if chem_docs:
+            logger.info(f"Found {len(chem_docs)} documents for {course_code} in the course index")
+        else:
+            # Ensure we're using the correct vectorstore and namespace
+            chem_docs = await search_documents(
+                chemical_vectorstore, "chemical", search_query,
+                keyword_query=user_message,
+                embedding=state.get("query_embedding"),
+                k=3,
+                namespace="chemical_namespace",  # Explicitly specify namespace
+                filter={"department": "chemical"}  # Add a filter for chemical department
+            )
         
         logger.info(f"Found {len(chem_docs)} documents in chemical_namespace")
         
@@ -61,6 +73,8 @@ def chemical_department(state: State):
             "source": "error_fallback"
         }]
     
+    # Drop duplicate chunks and fit the rest into the answer model's token budget
+    context = context_packer.pack(context, agent="chemical")
     context_str = "\n".join([item["content"] for item in context])
     
     system_message = f"""
@@ -83,19 +97,20 @@ def chemical_department(state: State):
     Respond in a professional, helpful manner appropriate for an academic advisor at AUB.
     """
     
-    messages = [{"role": "system", "content": system_message}] + state["messages"]
+    # Recent turns verbatim plus the running summary of older ones
+    messages = build_prompt_messages(system_message, state)
+    prompt_tokens = count_prompt_tokens(messages)
+    logger.info(f"Prompt tokens: {prompt_tokens}")
     
     # Get thread_id from configurable state if available (for conversation memory)
     thread_id = None
     if hasattr(state, "get") and callable(state.get):
-        config = state.get("configurable", {})
-        if isinstance(config, dict):
-            thread_id = config.get("thread_id")
+        configurable = state.get("configurable", {})
+        if isinstance(configurable, dict):
+            thread_id = configurable.get("thread_id")
     
-    # Pass thread_id to maintain conversation context if available
-    if thread_id:
-        response = llm.invoke(messages, config={"configurable": {"thread_id": thread_id}})
-    else:
-        response = llm.invoke(messages)
+    # Publish the sources, then tag the answer call so its tokens can be streamed
+    await emit_sources(context, config)
+    response = await llm.ainvoke(messages, config=answer_config(config, thread_id))
     
-    return {"messages": response}
+    return {"messages": response, "prompt_tokens": prompt_tokens}
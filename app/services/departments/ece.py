@@ -1,21 +1,21 @@
-from langchain_openai import ChatOpenAI
-from app.core.config import OPENAI_API_KEY
+from app.core.clients import get_llm
 from app.models.schemas import State
 from app.db.vector_store import get_agent_vectorstore
+from app.db.course_index import resolve_course_code, lookup_course_documents
+from app.services.retrieval import hybrid_available, search_documents
 import logging
-import re
 
 logger = logging.getLogger(__name__)
 
-llm = ChatOpenAI(api_key=OPENAI_API_KEY, model_name="gpt-4o")
+llm = get_llm("classifier")
 ece_vectorstore = get_agent_vectorstore("ece")
 
-def ece_department(state: State):
+async def ece_department(state: State):
     user_message = state["messages"][-1].content
     query_type = state.get("query_type", "General")
 
-    course_match = re.search(r'(EECE)\s*(\d{3})', user_message, re.IGNORECASE)
-    course_code = f"{course_match.group(1)} {course_match.group(2)}" if course_match else None
+    # EECE codes, or any other course indexed in ece_namespace
+    course_code = resolve_course_code(user_message, "ece_namespace", subjects=("EECE",))
 
     search_query = f"Electrical and Computer Engineering: {query_type} - {user_message}"
     context = []
@@ -26,33 +26,47 @@ def ece_department(state: State):
         if course_code:
             logger.info(f"Detected course code: {course_code}")
             
-            # Use exact metadata filtering which works according to our tests
-            logger.info(f"Searching with exact course code filter: {course_code}")
-            course_docs = ece_vectorstore.similarity_search(
-                "course information",  # Generic query that will rely on filtering
-                k=5,
-                namespace="ece_namespace",
-                filter={"course_code": {"$eq": course_code}}
-            )
-            
-            logger.info(f"Found {len(course_docs)} documents with course filter")
-            
+            # Exact lookup in the course index: no embedding or vector query
+            course_docs = lookup_course_documents(course_code, "ece", "ece_namespace", k=5)
+            logger.info(f"Found {len(course_docs)} documents in the course index")
+
             if course_docs:
                 ece_docs = course_docs
+            elif hybrid_available("ece_namespace"):
+                # One fused BM25 + dense query instead of the filter-then-semantic chain:
+                # the course code matches lexically even where its embedding does not
+                ece_docs = await search_documents(
+                    ece_vectorstore, "ece", search_query, k=5, namespace="ece_namespace",
+                    keyword_query=user_message, embedding=state.get("query_embedding")
+                )
+                logger.info(f"Found {len(ece_docs)} documents with hybrid search")
             else:
-                # If no exact match, fall back to direct semantic search
-                logger.info(f"No exact matches found, trying with semantic search for course code")
-                ece_docs = ece_vectorstore.similarity_search(
-                    course_code,
+                # Not indexed (e.g. ingested before the course index existed): exact metadata filtering
+                logger.info(f"Searching with exact course code filter: {course_code}")
+                course_docs = await ece_vectorstore.asimilarity_search(
+                    "course information",  # Generic query that will rely on filtering
                     k=5,
-                    namespace="ece_namespace"
+                    namespace="ece_namespace",
+                    filter={"course_code": {"$eq": course_code}}
                 )
-                logger.info(f"Found {len(ece_docs)} documents with semantic search")
+                
+                logger.info(f"Found {len(course_docs)} documents with course filter")
+            
+                if course_docs:
+                    ece_docs = course_docs
+                else:
+                    # If no exact match, fall back to direct semantic search
+                    logger.info(f"No exact matches found, trying with semantic search for course code")
+                    ece_docs = await ece_vectorstore.asimilarity_search(
+                        course_code,
+                        k=5,
+                        namespace="ece_namespace"
+                    )
+                    logger.info(f"Found {len(ece_docs)} documents with semantic search")
         else:
-            ece_docs = ece_vectorstore.similarity_search(
-                search_query,
-                k=3,
-                namespace="ece_namespace"
+            ece_docs = await search_documents(
+                ece_vectorstore, "ece", search_query, k=3, namespace="ece_namespace",
+                keyword_query=user_message, embedding=state.get("query_embedding")
             )
 
         logger.info(f"Found {len(ece_docs)} documents in ece_namespace")
@@ -110,7 +124,7 @@ def ece_department(state: State):
     """
 
     thread_id = state.get("configurable", {}).get("thread_id") if hasattr(state, "get") else None
-    response = llm.invoke([{"role": "user", "content": prompt}], config={"configurable": {"thread_id": thread_id}} if thread_id else {})
+    response = await llm.ainvoke([{"role": "user", "content": prompt}], config={"configurable": {"thread_id": thread_id}} if thread_id else {})
 
     track = response.content.strip().upper()
     if track not in {"CSE", "CCE", "ECE"}:
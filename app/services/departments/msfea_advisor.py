@@ -1,23 +1,24 @@
-from langchain_openai import ChatOpenAI
-from app.core.config import OPENAI_API_KEY
+from app.core.clients import get_llm
 from app.models.schemas import State
+from app.services.streaming import answer_config, emit_sources
+from app.services.conversation_memory import build_prompt_messages, count_prompt_tokens
+from app.services.context_packer import context_packer
+from langchain_core.runnables import RunnableConfig
 from app.db.vector_store import get_agent_vectorstore
+from app.services.retrieval import search_documents
 import logging
 from app.services.utils import get_last_user_message
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI LLM
-llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model_name="gpt-4o"
-)
+# Shared OpenAI LLM (pooled connections, see app.core.clients)
+llm = get_llm("answerer")
 
 # Get a dedicated vector store for MSFEA advisor
 msfea_advisor_vectorstore = get_agent_vectorstore("msfea_advisor")
 
-def msfea_advisor(state: State):
+async def msfea_advisor(state: State, config: RunnableConfig = None):
     """Handle general queries about the Maroun Semaan Faculty of Engineering and Architecture"""
     # Safely get the user message
     user_message = get_last_user_message(state)
@@ -31,8 +32,10 @@ def msfea_advisor(state: State):
         logger.info(f"Searching msfea_advisor_namespace with query: {search_query}")
         
         # Ensure we're using the correct vectorstore and namespace
-        msfea_docs = msfea_advisor_vectorstore.similarity_search(
-            search_query, 
+        msfea_docs = await search_documents(
+            msfea_advisor_vectorstore, "msfea_advisor", search_query,
+            keyword_query=user_message,
+            embedding=state.get("query_embedding"),
             k=3,
             namespace="msfea_advisor_namespace",  # Explicitly specify namespace
         )
@@ -63,6 +66,8 @@ def msfea_advisor(state: State):
             "source": "error_fallback"
         }]
     
+    # Drop duplicate chunks and fit the rest into the answer model's token budget
+    context = context_packer.pack(context, agent="msfea_advisor")
     context_str = "\n".join([item["content"] for item in context])
     
     logger.info(f"Constructed context_str: {context_str[:500]}...") # Log the context string (truncated)
@@ -127,24 +132,26 @@ def msfea_advisor(state: State):
 
     # Assume LLM call happens shortly after this
     # Example structure (actual call might differ slightly):
-    messages = [{"role": "system", "content": system_message}] + state["messages"]
+    # Recent turns verbatim plus the running summary of older ones
+    messages = build_prompt_messages(system_message, state)
+    prompt_tokens = count_prompt_tokens(messages)
+    logger.info(f"Prompt tokens: {prompt_tokens}")
     
     # Get thread_id from configurable state if available (for conversation memory)
     thread_id = None
     if hasattr(state, "get") and callable(state.get):
-        config = state.get("configurable", {})
-        if isinstance(config, dict):
-            thread_id = config.get("thread_id")
+        configurable = state.get("configurable", {})
+        if isinstance(configurable, dict):
+            thread_id = configurable.get("thread_id")
 
-    # Invoke the LLM
-    if thread_id:
-        response = llm.invoke(messages, config={"configurable": {"thread_id": f"{thread_id}_msfea"}}) 
-    else:
-        response = llm.invoke(messages)
+    # Publish the sources, then tag the answer call so its tokens can be streamed
+    await emit_sources(context, config)
+    response = await llm.ainvoke(messages, config=answer_config(config, f"{thread_id}_msfea" if thread_id else None))
 
     # Update the state with the response
     state["messages"] = state["messages"] + [{"role": "assistant", "content": response.content}]
     state["response"] = response.content  # Store the latest response
     state["department"] = "MSFEA Advisor" # Set the department context
+    state["prompt_tokens"] = prompt_tokens
 
     return state # Return the updated state
\ No newline at end of file
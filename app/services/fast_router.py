@@ -0,0 +1,429 @@
+from typing import Any, Dict, List, Optional, Sequence
+import asyncio
+import logging
+import random
+import re
+import threading
+
+import numpy as np
+
+from app.core.config import (
+    FAST_ROUTER_ENABLED,
+    FAST_ROUTER_THRESHOLD,
+    FAST_ROUTER_CENTROID_TEMPERATURE,
+    FAST_ROUTER_SHADOW_RATE,
+)
+from app.db.vector_store import embeddings
+from app.services.routing import route_to_department
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+CHEE = "Chemical Engineering and Advanced Energy (CHEE)"
+CEE = "Civil and Environmental Engineering (CEE)"
+ECE = "Electrical and Computer Engineering (ECE)"
+ENMG = "Industrial Engineering and Management (ENMG)"
+MECH = "Mechanical Engineering (MECH)"
+ARCH = "Architecture and Design (ARCH)"
+MSFEA = "MSFEA Advisor"
+SCHEDULE = "Schedule Helper"
+# Centroid label for off-topic examples; never taken on the fast path
+INVALID = "Invalid"
+
+# Course subject prefix -> owning department
+COURSE_PREFIXES = {
+    "EECE": ECE,
+    "CHEN": CHEE,
+    "PETR": CHEE,
+    "MECH": MECH,
+    "CIVE": CEE,
+    "ENST": CEE,
+    "INDE": ENMG,
+    "ENMG": ENMG,
+    "ARCH": ARCH,
+    "GRDS": ARCH,
+    "URPL": ARCH,
+}
+
+COURSE_CODE_PATTERN = re.compile(
+    r"\b(" + "|".join(COURSE_PREFIXES) + r")\s*-?\s*(\d{3})\b", re.IGNORECASE
+)
+
+# Department name signals, mirroring determine_department and route_to_department
+DEPARTMENT_PATTERNS = {
+    CHEE: re.compile(r"\b(chemical|petroleum|chee|chen|advanced energy)\b", re.IGNORECASE),
+    MECH: re.compile(r"\b(mechanical|mech|thermofluids?)\b", re.IGNORECASE),
+    CEE: re.compile(r"\b(civil|cee|cive|environmental engineering|structural engineering)\b", re.IGNORECASE),
+    ECE: re.compile(r"\b(electrical|computer engineering|ece|eece|cse|cce|electronics?)\b", re.IGNORECASE),
+    ENMG: re.compile(r"\b(industrial|enmg|inde|engineering management)\b", re.IGNORECASE),
+    ARCH: re.compile(r"\b(architecture|graphic design|urban planning)\b", re.IGNORECASE),
+}
+
+SCHEDULE_PATTERN = re.compile(
+    r"\b(schedule|timetable|class times?|course times?|scheduling|who (is )?teach(es|ing)|"
+    r"what time|sections?|instructor)\b",
+    re.IGNORECASE,
+)
+
+# Academic calendar signals handled by the MSFEA advisor (see route_to_department)
+CALENDAR_PATTERN = re.compile(
+    r"\b(calendar|semester break|spring break|exams?|finals|holidays?|reading period|vacation|"
+    r"graduation|opening ceremony|commencement|term dates|deadlines?|last day)\b",
+    re.IGNORECASE,
+)
+
+# Requests the supervisor's guardrail rejects (doing coursework for the student,
+# prompt injection, off-topic advice); these never take the fast path, even
+# with a course code in them ("write my EECE 230 homework for me")
+GUARDRAIL_PATTERN = re.compile(
+    r"\b((write|do|solve|finish|complete|answer)\s+(my|the|this|these|our)\s+(\S+\s+){0,3}?"
+    r"(homework|assignments?|essays?|projects?|exams?|quiz(zes)?|lab reports?|reports?|problem sets?|thesis)"
+    r"|(homework|assignment|exam|quiz|midterm|final)\s+(answers|solutions)"
+    r"|cheat(ing)?|plagiari[sz](e|ing)"
+    r"|ignore\s+(all\s+|your\s+|the\s+)?(previous\s+|prior\s+|above\s+)?(instructions|rules|prompt)"
+    r"|vote|election|medications?|diagnos[ei]s|jokes?)\b",
+    re.IGNORECASE,
+)
+
+# Confidence assigned to each kind of rule hit
+COURSE_CODE_CONFIDENCE = 0.97
+KEYWORD_CONFIDENCE = 0.9
+
+# Labeled example queries used to build one embedding centroid per label
+ROUTER_EXAMPLES = {
+    CHEE: [
+        "What does the chemical engineering curriculum cover?",
+        "Which petroleum engineering electives are offered?",
+        "Tell me about research in advanced energy and catalysis",
+        "What is the process design sequence for chemical engineers?",
+    ],
+    CEE: [
+        "What concentrations are available in civil engineering?",
+        "Which courses cover structural analysis and concrete design?",
+        "Tell me about the environmental engineering and water resources program",
+        "What do students learn about transportation and geotechnical engineering?",
+    ],
+    ECE: [
+        "What are the technical electives for computer engineering?",
+        "Which track should I choose between CCE and CSE?",
+        "What courses cover circuits, signals and embedded systems?",
+        "Tell me about software engineering and machine learning courses in ECE",
+    ],
+    ENMG: [
+        "What does the industrial engineering program focus on?",
+        "Which courses cover operations research and supply chains?",
+        "Tell me about the engineering management minor",
+        "What do students learn about production systems and quality control?",
+    ],
+    MECH: [
+        "What are the mechanical engineering thermal systems courses?",
+        "Which courses cover fluid mechanics and heat transfer?",
+        "Tell me about manufacturing and materials in mechanical engineering",
+        "What design projects do mechanical engineering students do?",
+    ],
+    ARCH: [
+        "What does the architecture program studio sequence look like?",
+        "Tell me about the graphic design degree",
+        "Which urban planning courses are offered?",
+    ],
+    MSFEA: [
+        "How do I transfer to another engineering major?",
+        "When does the fall semester start?",
+        "What are the admission requirements for engineering at AUB?",
+        "Which engineering major has the best career prospects?",
+        "Where is the faculty student services office?",
+        "What are the rules for academic probation?",
+    ],
+    SCHEDULE: [
+        "Who is teaching this course next semester?",
+        "At what time is the lecture held?",
+        "Help me build a class schedule for next term",
+        "Which sections are available and when do they meet?",
+    ],
+    INVALID: [
+        "Write my essay for me",
+        "What medication should I take for a headache?",
+        "Who should I vote for in the election?",
+        "Tell me a joke about cats",
+    ],
+}
+
+
+class FastRouter:
+    """
+    Local pre-router in front of the supervisor LLM.
+
+    Regex and keyword rules catch explicit signals (course codes, department
+    names, schedule or calendar terms). Queries without a decisive rule hit
+    are compared against one embedding centroid per label built from
+    labeled example queries. The result carries a confidence, and the
+    supervisor only calls the LLM when it is below the threshold.
+
+    The fast path skips the supervisor's validity check as well, so it is
+    only taken when a local guardrail passes: no GUARDRAIL_PATTERN hit, and
+    the centroid classifier does not put the query nearest the invalid
+    examples.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]], embeddings=None, enabled: bool = True,
+                 threshold: float = 0.85, temperature: float = 0.05, shadow_rate: float = 0.0):
+        """
+        Initialize the router.
+
+        Args:
+            examples: Mapping of label -> example queries for the centroids
+            embeddings: LangChain embeddings used for the centroid classifier;
+                        None restricts the router to its rules
+            enabled: Whether the fast path may be taken at all
+            threshold: Minimum confidence for skipping the supervisor LLM
+            temperature: Softmax temperature over centroid cosine similarities
+            shadow_rate: Fraction of fast-path queries also sent to the LLM in
+                         the background to measure disagreement
+        """
+        self.examples = examples
+        self.embeddings = embeddings
+        self.enabled = enabled
+        self.threshold = threshold
+        self.temperature = temperature
+        self.shadow_rate = shadow_rate
+        self._labels: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._centroid_lock: Optional[asyncio.Lock] = None
+        self._lock = threading.Lock()
+        self._counters = {
+            "queries": 0,
+            "fast_path": 0,
+            "fast_path_rules": 0,
+            "fast_path_centroid": 0,
+            "guardrail_blocked": 0,
+            "llm_calls": 0,
+            "llm_compared": 0,
+            "llm_disagreements": 0,
+            "shadow_compared": 0,
+            "shadow_disagreements": 0,
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def match_rules(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Apply the regex and keyword rules to a query
+
+        Returns:
+            Dict with department, confidence and method, or None when no rule
+            fires or the rule hits point to different departments
+        """
+        course_departments = {COURSE_PREFIXES[m.group(1).upper()] for m in COURSE_CODE_PATTERN.finditer(text)}
+        keyword_departments = {dept for dept, pattern in DEPARTMENT_PATTERNS.items() if pattern.search(text)}
+        wants_schedule = bool(SCHEDULE_PATTERN.search(text))
+        wants_calendar = bool(CALENDAR_PATTERN.search(text))
+
+        # "final exam schedule" mixes both signals; let the supervisor decide
+        if wants_schedule and wants_calendar:
+            return None
+        if wants_schedule:
+            return {"department": SCHEDULE, "confidence": KEYWORD_CONFIDENCE, "method": "rules"}
+        if wants_calendar:
+            # "When is the EECE 230 final?" could be the calendar or a course question
+            if course_departments:
+                return None
+            return {"department": MSFEA, "confidence": KEYWORD_CONFIDENCE, "method": "rules"}
+        if len(course_departments) == 1 and keyword_departments <= course_departments:
+            return {"department": course_departments.pop(), "confidence": COURSE_CODE_CONFIDENCE, "method": "rules"}
+        if not course_departments and len(keyword_departments) == 1:
+            return {"department": keyword_departments.pop(), "confidence": KEYWORD_CONFIDENCE, "method": "rules"}
+        return None
+
+    @staticmethod
+    def guardrail(text: str, centroid: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Cheap local stand-in for the supervisor's validity check
+
+        Args:
+            text: The user's query
+            centroid: The centroid classification of the query, if available
+
+        Returns:
+            Why the query must go to the supervisor LLM, or None when it passes
+        """
+        if GUARDRAIL_PATTERN.search(text):
+            return "pattern"
+        if centroid is not None and centroid["department"] == INVALID:
+            return "centroid"
+        return None
+
+    async def _ensure_centroids(self) -> bool:
+        """Embed the labeled examples once and build the normalized centroid matrix"""
+        if self._centroids is not None:
+            return True
+        if self.embeddings is None:
+            return False
+        if self._centroid_lock is None:
+            self._centroid_lock = asyncio.Lock()
+        async with self._centroid_lock:
+            if self._centroids is not None:
+                return True
+            try:
+                labels = list(self.examples)
+                texts = [text for label in labels for text in self.examples[label]]
+                vectors = np.asarray(await self.embeddings.aembed_documents(texts), dtype=np.float32)
+                centroids, start = [], 0
+                for label in labels:
+                    end = start + len(self.examples[label])
+                    centroids.append(_unit(vectors[start:end].mean(axis=0)))
+                    start = end
+                self._labels = labels
+                self._centroids = np.stack(centroids)
+                logger.info(f"Built fast router centroids for {len(labels)} labels from {len(texts)} examples")
+            except Exception as e:
+                logger.error(f"Error building fast router centroids: {str(e)}")
+                return False
+        return True
+
+    async def warmup(self) -> bool:
+        """Build the centroids ahead of the first query; False if disabled or embedding failed"""
+        return self.enabled and await self._ensure_centroids()
+
+    async def classify_centroid(self, text: str, embedding: Optional[Sequence[float]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Classify a query by its nearest label centroid
+
+        Args:
+            text: The user's query
+            embedding: Optional precomputed query embedding
+
+        Returns:
+            Dict with department, confidence (softmax over cosine similarities)
+            and method, or None when the centroids are unavailable
+        """
+        if not await self._ensure_centroids():
+            return None
+        try:
+            if embedding is None:
+                embedding = await self.embeddings.aembed_query(text.strip())
+        except Exception as e:
+            logger.error(f"Error embedding query for the fast router: {str(e)}")
+            return None
+        scores = self._centroids @ _unit(embedding)
+        weights = np.exp((scores - scores.max()) / self.temperature)
+        probabilities = weights / weights.sum()
+        best = int(np.argmax(probabilities))
+        return {"department": self._labels[best], "confidence": float(probabilities[best]), "method": "centroid"}
+
+    async def route(self, text: str, embedding: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """
+        Pre-route a query without calling the supervisor LLM
+
+        Queries failing the guardrail always go to the supervisor LLM.
+        Otherwise course-code hits are decisive on their own, and other rule
+        hits are combined with the centroid classifier: agreement raises the
+        confidence, disagreement lowers it below the threshold.
+
+        Returns:
+            Dict with department (None if unknown), confidence, method and
+            fast_path (True when the supervisor LLM can be skipped)
+        """
+        self._count("queries")
+        if not self.enabled:
+            return {"department": None, "confidence": 0.0, "method": "disabled", "fast_path": False}
+
+        result = self.match_rules(text)
+        # Guardrail hits are validated by the supervisor LLM, so skip the centroid lookup for them
+        guardrail = self.guardrail(text)
+        centroid = None
+        if guardrail is None:
+            # Computed even after a decisive course-code hit: its invalid class is part of the guardrail
+            centroid = await self.classify_centroid(text, embedding)
+            guardrail = self.guardrail(text, centroid)
+        if guardrail is not None:
+            self._count("guardrail_blocked")
+            return {"department": INVALID, "confidence": 0.0, "method": f"guardrail:{guardrail}",
+                    "fast_path": False}
+
+        if result is None or result["confidence"] < COURSE_CODE_CONFIDENCE:
+            if result is None:
+                result = centroid
+            elif centroid is not None:
+                if centroid["department"] == result["department"]:
+                    confidence = 1 - (1 - result["confidence"]) * (1 - centroid["confidence"])
+                    result = {**result, "confidence": confidence, "method": "rules+centroid"}
+                else:
+                    result = {**result, "confidence": result["confidence"] * (1 - centroid["confidence"])}
+        if result is None:
+            return {"department": None, "confidence": 0.0, "method": "none", "fast_path": False}
+
+        fast_path = result["department"] != INVALID and result["confidence"] >= self.threshold
+        if fast_path:
+            self._count("fast_path")
+            self._count("fast_path_centroid" if result["method"] == "centroid" else "fast_path_rules")
+        return {**result, "fast_path": fast_path}
+
+    def record_llm_decision(self, route: Dict[str, Any], decision: Dict[str, Any]):
+        """
+        Record a supervisor LLM decision made for a query below the threshold,
+        counting whether the router's best guess disagreed with it
+        """
+        self._count("llm_calls")
+        if route.get("department") is None:
+            return
+        self._count("llm_compared")
+        if not self._same_route(route, decision):
+            self._count("llm_disagreements")
+
+    def should_shadow(self) -> bool:
+        """Whether a fast-path query should also be sent to the LLM for comparison"""
+        return self.shadow_rate > 0 and random.random() < self.shadow_rate
+
+    def record_shadow_decision(self, route: Dict[str, Any], decision: Dict[str, Any]):
+        """Record the LLM decision for a query that took the fast path"""
+        self._count("shadow_compared")
+        if not self._same_route(route, decision):
+            self._count("shadow_disagreements")
+            logger.info(f"Fast router chose '{route['department']}' but the supervisor LLM chose "
+                        f"'{decision.get('department')}'")
+
+    @staticmethod
+    def _same_route(route: Dict[str, Any], decision: Dict[str, Any]) -> bool:
+        """Compare by graph branch, so equivalent department labels match"""
+        guess = {"is_valid": route["department"] != INVALID, "department": route["department"]}
+        return route_to_department(guess) == route_to_department(decision)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return fast-path and disagreement counters"""
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "centroids_ready": self._centroids is not None,
+            **counters,
+            "fast_path_rate": round(counters["fast_path"] / counters["queries"], 4) if counters["queries"] else 0.0,
+            "llm_disagreement_rate": (
+                round(counters["llm_disagreements"] / counters["llm_compared"], 4)
+                if counters["llm_compared"] else 0.0
+            ),
+            "shadow_disagreement_rate": (
+                round(counters["shadow_disagreements"] / counters["shadow_compared"], 4)
+                if counters["shadow_compared"] else 0.0
+            ),
+        }
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    """Return the vector as a float32 unit vector so dot products are cosine similarities"""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+# Global fast router instance
+fast_router = FastRouter(
+    ROUTER_EXAMPLES,
+    embeddings=embeddings,
+    enabled=FAST_ROUTER_ENABLED,
+    threshold=FAST_ROUTER_THRESHOLD,
+    temperature=FAST_ROUTER_CENTROID_TEMPERATURE,
+    shadow_rate=FAST_ROUTER_SHADOW_RATE,
+)
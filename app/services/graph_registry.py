@@ -0,0 +1,81 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class CompiledGraphRegistry:
+    """
+    Process-wide holder for a compiled LangGraph.
+
+    The graph is built lazily on first use (or eagerly during application
+    startup) and the same compiled instance is shared by every request.
+    Call `rebuild()` when the set of agents changes.
+    """
+
+    def __init__(self, builder: Callable[[], Any]):
+        """
+        Initialize the registry.
+
+        Args:
+            builder: Zero-argument callable returning a compiled graph
+        """
+        self._builder = builder
+        self._graph = None
+        self._lock = threading.Lock()
+        self._build_count = 0
+        self._last_build_seconds: Optional[float] = None
+
+    def _build(self):
+        """Build the graph and record how long it took. Caller must hold the lock."""
+        start = time.perf_counter()
+        graph = self._builder()
+        self._last_build_seconds = time.perf_counter() - start
+        self._build_count += 1
+        logger.info(f"Compiled advisor graph in {self._last_build_seconds * 1000:.1f} ms "
+                    f"(build #{self._build_count})")
+        return graph
+
+    def get(self):
+        """Return the compiled graph, building it on first use."""
+        graph = self._graph
+        if graph is None:
+            with self._lock:
+                if self._graph is None:
+                    self._graph = self._build()
+                graph = self._graph
+        return graph
+
+    def rebuild(self, builder: Optional[Callable[[], Any]] = None):
+        """
+        Rebuild the compiled graph, e.g. after agents were added or removed.
+
+        Args:
+            builder: Optional replacement builder to use from now on
+
+        Returns:
+            The newly compiled graph
+        """
+        with self._lock:
+            if builder is not None:
+                self._builder = builder
+            self._graph = self._build()
+            return self._graph
+
+    def is_built(self) -> bool:
+        """Check whether a compiled graph is currently available."""
+        return self._graph is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return build statistics for monitoring."""
+        return {
+            "built": self.is_built(),
+            "build_count": self._build_count,
+            "last_build_ms": (
+                round(self._last_build_seconds * 1000, 3)
+                if self._last_build_seconds is not None else None
+            ),
+        }
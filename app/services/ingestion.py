@@ -0,0 +1,269 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import itertools
+import logging
+import threading
+import time
+import uuid
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import INGEST_BATCH_SIZE, INGEST_MAX_IN_FLIGHT, INGEST_MAX_RETRIES, INGEST_RETRY_BACKOFF_SECONDS
+from app.db.ingest_manifest import IngestManifest, chunk_id
+from app.services.conversation_memory import count_tokens
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Pinecone accepts at most 1000 ids per delete request
+DELETE_BATCH_SIZE = 1000
+
+
+def _batches(documents: Iterable[Document], ids: Iterator[str], size: int) -> Iterator[Tuple[List[str], List[Document]]]:
+    documents = iter(documents)
+    while True:
+        batch = list(itertools.islice(documents, size))
+        if not batch:
+            return
+        yield [next(ids) for _ in batch], batch
+
+
+class IngestionPipeline:
+    """
+    Embeds chunks and upserts them into a namespace in concurrent batches.
+
+    Up to `max_in_flight` batches are in progress at once, each embedded in
+    one call and then upserted, so the upsert of one batch overlaps the
+    embedding of the next ones. New batches are only taken from the input
+    when a slot frees up, so a streamed input is never read far ahead of the
+    index. A failing embedding or upsert call is retried for that batch alone
+    with exponential backoff; a batch that still fails is reported and the
+    others carry on.
+    """
+
+    def __init__(self, embeddings: Embeddings, index, namespace: str, text_key: str = "text",
+                 batch_size: int = INGEST_BATCH_SIZE, max_in_flight: int = INGEST_MAX_IN_FLIGHT,
+                 max_retries: int = INGEST_MAX_RETRIES, retry_backoff: float = INGEST_RETRY_BACKOFF_SECONDS):
+        """
+        Args:
+            embeddings: Embeddings client (its async embed_documents is used)
+            index: Pinecone or local index to upsert into
+            namespace: Target namespace
+            text_key: Metadata key holding the chunk text, as PineconeVectorStore expects
+            batch_size: Chunks per embedding call and upsert
+            max_in_flight: Batches being embedded or upserted at the same time
+            max_retries: Retries of a failed call before its batch is given up
+            retry_backoff: Seconds before the first retry, doubled for each further one
+        """
+        self.embeddings = embeddings
+        self.index = index
+        self.namespace = namespace
+        self.text_key = text_key
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    async def _with_retries(self, stage: str, batch_number: int, call: Callable[[], Awaitable[Any]],
+                            stats: Dict[str, Any]) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await call()
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                stats["retries"] += 1
+                logger.warning(f"Batch {batch_number} {stage} failed ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _process(self, batch_number: int, ids: List[str], documents: List[Document],
+                       stats: Dict[str, Any],
+                       on_upserted: Optional[Callable[[List[str], List[Document]], None]]) -> bool:
+        texts = [document.page_content for document in documents]
+        try:
+            started = time.perf_counter()
+            vectors = await self._with_retries(
+                "embedding", batch_number, lambda: self.embeddings.aembed_documents(texts), stats
+            )
+            embedded = time.perf_counter()
+            records = [
+                {"id": vector_id, "values": values, "metadata": {**document.metadata, self.text_key: text}}
+                for vector_id, values, document, text in zip(ids, vectors, documents, texts)
+            ]
+            await self._with_retries(
+                "upsert", batch_number,
+                lambda: asyncio.to_thread(self.index.upsert, vectors=records, namespace=self.namespace), stats
+            )
+            stats["embed_seconds"] += embedded - started
+            stats["upsert_seconds"] += time.perf_counter() - embedded
+        except Exception as e:
+            logger.error(f"Batch {batch_number} ({len(documents)} chunks) failed after "
+                         f"{self.max_retries} retries: {str(e)}")
+            stats["failed_batches"] += 1
+            stats["failed_chunks"] += len(documents)
+            return False
+        stats["chunks"] += len(documents)
+        stats["tokens"] += sum(count_tokens(text) for text in texts)
+        if on_upserted is not None:
+            on_upserted(ids, documents)
+        return True
+
+    async def run(self, documents: Iterable[Document], ids: Optional[Iterable[str]] = None,
+                  on_upserted: Optional[Callable[[List[str], List[Document]], None]] = None) -> Dict[str, Any]:
+        """
+        Embed and upsert the chunks
+
+        Args:
+            documents: Chunks to ingest (any iterable; it is consumed batch by batch)
+            ids: Vector ids in document order; random UUIDs (as PineconeVectorStore uses) by default
+            on_upserted: Called with the ids and chunks of each batch once it is in the index
+
+        Returns:
+            Dict with "ids" (in document order, None for chunks of failed batches)
+            and "stats" (chunks, tokens, throughput, retries, failed batches)
+        """
+        ids = iter(ids) if ids is not None else (str(uuid.uuid4()) for _ in itertools.count())
+        stats = {"chunks": 0, "tokens": 0, "batches": 0, "failed_batches": 0, "failed_chunks": 0,
+                 "retries": 0, "embed_seconds": 0.0, "upsert_seconds": 0.0}
+        slots = asyncio.Semaphore(self.max_in_flight)
+        batch_ids: List[List[str]] = []
+        tasks = []
+
+        async def process(batch_number, chunk_ids, batch):
+            try:
+                return await self._process(batch_number, chunk_ids, batch, stats, on_upserted)
+            finally:
+                slots.release()
+
+        started = time.perf_counter()
+        batches = _batches(documents, ids, self.batch_size)
+        while True:
+            await slots.acquire()
+            # Reading a streamed input may parse the document; do it off the event
+            # loop so the batches in flight keep going meanwhile
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                slots.release()
+                break
+            chunk_ids, documents_batch = batch
+            batch_ids.append(chunk_ids)
+            tasks.append(asyncio.create_task(process(len(tasks), chunk_ids, documents_batch)))
+        succeeded = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        stats["batches"] = len(tasks)
+        stats["seconds"] = round(elapsed, 3)
+        stats["chunks_per_second"] = round(stats["chunks"] / elapsed, 1) if elapsed else 0.0
+        stats["tokens_per_second"] = round(stats["tokens"] / elapsed, 1) if elapsed else 0.0
+        stats["embed_seconds"] = round(stats["embed_seconds"], 3)
+        stats["upsert_seconds"] = round(stats["upsert_seconds"], 3)
+        logger.info(f"Ingested {stats['chunks']} chunks into '{self.namespace}' in {elapsed:.2f}s "
+                    f"({stats['chunks_per_second']} chunks/s, {stats['tokens_per_second']} tokens/s, "
+                    f"{stats['retries']} retries, {stats['failed_batches']} failed batches)")
+        return {
+            "ids": [chunk_id if ok else None
+                    for chunk_ids, ok in zip(batch_ids, succeeded) for chunk_id in chunk_ids],
+            "stats": stats,
+        }
+
+    async def delete(self, ids: Sequence[str]) -> List[str]:
+        """
+        Delete vectors by id in batches, retrying failed requests
+
+        Returns:
+            The ids that were deleted
+        """
+        stats = {"retries": 0}
+        deleted = []
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = list(ids[start:start + DELETE_BATCH_SIZE])
+            try:
+                await self._with_retries(
+                    "delete", start // DELETE_BATCH_SIZE,
+                    lambda: asyncio.to_thread(self.index.delete, ids=batch, namespace=self.namespace), stats
+                )
+                deleted.extend(batch)
+            except Exception as e:
+                logger.error(f"Could not delete {len(batch)} vectors from '{self.namespace}': {str(e)}")
+        return deleted
+
+
+async def ingest_source(pipeline: IngestionPipeline, manifest: IngestManifest, source: str,
+                        documents: Iterable[Document],
+                        on_live: Optional[Callable[[List[str], List[Document]], None]] = None) -> Dict[str, Any]:
+    """
+    Bring a namespace up to date with the current chunks of one source document
+
+    Chunks get content-addressed ids (see app.db.ingest_manifest.chunk_id).
+    Only ids missing from the manifest are embedded and upserted, ids the
+    manifest lists for the source that are no longer produced are deleted,
+    and the manifest is updated with what actually reached the index, so
+    failed chunks are retried by the next run.
+
+    Args:
+        pipeline: Pipeline writing to the namespace
+        manifest: The namespace's manifest (saved by the caller)
+        source: Source document name the chunks belong to
+        documents: The source's chunks (any iterable; a generator is read as the batches go)
+        on_live: Called (under a lock, possibly from a worker thread) with the
+            ids and chunks that are live in the namespace: unchanged chunks as
+            they are read and new ones once upserted. The chunks are then not
+            kept, so a streamed document is never held in memory as a whole
+
+    Returns:
+        Dict with "ids" and, without `on_live`, "documents" of the source's live
+        chunks (for the course and BM25 indexes), the "added", "unchanged",
+        "removed" and "failed" counts, and the pipeline's "stats"
+    """
+    previous = manifest.chunk_ids(source)
+    recorded = set(previous)
+    # Chunk id -> the chunk, or None once it was handed to on_live
+    chunks: Dict[str, Optional[Document]] = {}
+    new_ids: List[str] = []
+    lock = threading.Lock()
+
+    def keep(ids: List[str], batch: List[Document]):
+        if on_live is not None:
+            with lock:
+                on_live(ids, batch)
+
+    def new_chunks():
+        # Consumed by the pipeline batch by batch, so a streamed document is
+        # embedded while it is still being read
+        for document in documents:
+            vector_id = chunk_id(source, document)
+            # Identical chunks collapse into one vector
+            if vector_id in chunks:
+                continue
+            chunks[vector_id] = document if on_live is None else None
+            if vector_id in recorded:
+                keep([vector_id], [document])
+            else:
+                new_ids.append(vector_id)
+                yield document
+
+    # The list iterator picks up ids appended while the chunks are generated
+    result = await pipeline.run(new_chunks(), ids=iter(new_ids), on_upserted=keep)
+    vanished = [vector_id for vector_id in previous if vector_id not in chunks]
+    added = {vector_id for vector_id in result["ids"] if vector_id is not None}
+    deleted = set(await pipeline.delete(vanished)) if vanished else set()
+
+    live = [vector_id for vector_id in chunks if vector_id in recorded or vector_id in added]
+    # Vectors that could not be deleted stay in the manifest so the next run removes them
+    manifest.set_chunk_ids(source, live + [vector_id for vector_id in vanished if vector_id not in deleted])
+    summary = {
+        "added": len(added),
+        "unchanged": len(chunks) - len(new_ids),
+        "removed": len(deleted),
+        "failed": len(new_ids) - len(added) + len(vanished) - len(deleted),
+    }
+    logger.info(f"Source '{source}' in '{pipeline.namespace}': {summary['added']} added, "
+                f"{summary['unchanged']} unchanged, {summary['removed']} removed, {summary['failed']} failed")
+    return {
+        "ids": live,
+        "documents": [chunks[vector_id] for vector_id in live] if on_live is None else [],
+        **summary,
+        "stats": result["stats"],
+    }
@@ -1,7 +1,14 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 import os
 import json
 import logging
+import threading
+from app.core.config import (
+    ADAPTIVE_RETRIEVAL_CANDIDATES,
+    ADAPTIVE_RETRIEVAL_MAX_TOKENS,
+    ADAPTIVE_RETRIEVAL_MIN_SCORE,
+    ADAPTIVE_RETRIEVAL_RELATIVE_SCORE,
+)
 from .agent_index_wrapper import register_agent_namespaces
 
 # Set up logging
@@ -92,4 +99,103 @@ def initialize_agent_namespaces():
     for agent_id, namespaces in config.items():
         register_agent_namespaces(agent_id, namespaces)
     
-    logger.info(f"Registered {len(config)} agents with their namespace permissions")
\ No newline at end of file
+    logger.info(f"Registered {len(config)} agents with their namespace permissions")
+
+_namespaces_lock = threading.Lock()
+_namespaces_initialized = False
+
+def ensure_agent_namespaces():
+    """
+    Initialize the namespace registry once; later calls are no-ops.
+    Called by application warmup and before an agent's vector store is first built.
+    """
+    global _namespaces_initialized
+    if _namespaces_initialized:
+        return
+    with _namespaces_lock:
+        if not _namespaces_initialized:
+            initialize_agent_namespaces()
+            _namespaces_initialized = True
+
+# Adaptive retrieval settings applied to a namespace's searches (see
+# app.services.retrieval.adaptive_cutoff):
+#   candidates      - scored results fetched before the cutoff
+#   max_results     - results kept at most; None keeps the k the agent asks for
+#   min_results     - results kept even when they fail the score tests
+#   min_score       - absolute similarity floor
+#   relative_score  - fraction of the best hit's similarity a result must reach
+#   max_tokens      - token cap on the kept chunks
+DEFAULT_RETRIEVAL_POLICY = {
+    "candidates": ADAPTIVE_RETRIEVAL_CANDIDATES,
+    "max_results": None,
+    "min_results": 1,
+    "min_score": ADAPTIVE_RETRIEVAL_MIN_SCORE,
+    "relative_score": ADAPTIVE_RETRIEVAL_RELATIVE_SCORE,
+    "max_tokens": ADAPTIVE_RETRIEVAL_MAX_TOKENS,
+}
+
+# Per-namespace overrides of DEFAULT_RETRIEVAL_POLICY
+DEFAULT_NAMESPACE_RETRIEVAL_CONFIG = {
+    # General advising questions draw on several loosely related chunks
+    "msfea_advisor_namespace": {"relative_score": 0.85},
+}
+
+def load_retrieval_config() -> Dict[str, Dict[str, Any]]:
+    """
+    Load the per-namespace retrieval overrides from environment, file, or use default.
+    
+    Returns:
+        A dictionary mapping namespaces to their retrieval setting overrides
+    """
+    config_json = os.environ.get("NAMESPACE_RETRIEVAL_CONFIG")
+    if config_json:
+        try:
+            config = json.loads(config_json)
+            logger.info("Loaded namespace retrieval configuration from environment variable")
+            return _validate_retrieval_config(config)
+        except json.JSONDecodeError:
+            logger.warning("Invalid JSON in NAMESPACE_RETRIEVAL_CONFIG environment variable")
+    
+    config_path = os.environ.get("NAMESPACE_RETRIEVAL_CONFIG_PATH", "namespace_retrieval.json")
+    if os.path.exists(config_path):
+        try:
+            with open(config_path, 'r') as f:
+                config = json.load(f)
+                logger.info(f"Loaded namespace retrieval configuration from file: {config_path}")
+                return _validate_retrieval_config(config)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"Could not load namespace retrieval config file: {e}")
+    
+    return DEFAULT_NAMESPACE_RETRIEVAL_CONFIG
+
+def _validate_retrieval_config(config):
+    """Keep only known settings of namespaces given as dictionaries"""
+    if not isinstance(config, dict):
+        logger.warning("Invalid retrieval configuration format, expecting a dictionary. Using default configuration.")
+        return DEFAULT_NAMESPACE_RETRIEVAL_CONFIG
+    
+    validated_config = {}
+    for namespace, settings in config.items():
+        if not isinstance(settings, dict):
+            logger.warning(f"Invalid retrieval settings for namespace '{namespace}', expecting a dictionary. Skipping.")
+            continue
+        unknown = set(settings) - set(DEFAULT_RETRIEVAL_POLICY)
+        if unknown:
+            logger.warning(f"Ignoring unknown retrieval settings for namespace '{namespace}': {sorted(unknown)}")
+        validated_config[namespace] = {key: value for key, value in settings.items() if key in DEFAULT_RETRIEVAL_POLICY}
+    
+    return validated_config
+
+_retrieval_config = None
+_retrieval_config_lock = threading.Lock()
+
+def get_retrieval_policy(namespace: str) -> Dict[str, Any]:
+    """
+    Return the adaptive retrieval settings of a namespace (defaults merged with its overrides)
+    """
+    global _retrieval_config
+    if _retrieval_config is None:
+        with _retrieval_config_lock:
+            if _retrieval_config is None:
+                _retrieval_config = load_retrieval_config()
+    return {**DEFAULT_RETRIEVAL_POLICY, **_retrieval_config.get(namespace, {})}
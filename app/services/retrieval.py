@@ -0,0 +1,322 @@
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import hashlib
+import logging
+import threading
+
+import numpy as np
+from langchain.schema import Document
+
+from app.core.config import ADAPTIVE_RETRIEVAL_ENABLED, HYBRID_CANDIDATES, RETRIEVAL_MODE, RRF_K
+from app.db.bm25_index import BM25Index, get_bm25_index
+from app.services.agent_index_wrapper import namespace_registry
+from app.services.conversation_memory import count_tokens
+from app.services.namespace_config import ensure_agent_namespaces, get_retrieval_policy
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def _document_key(document: Document) -> str:
+    """Identity used to merge the same chunk coming from both retrievers"""
+    if document.id:
+        return document.id
+    return hashlib.sha1(document.page_content.encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[Sequence[Document]], k: int, rrf_k: int = RRF_K) -> List[Document]:
+    """
+    Merge ranked lists with reciprocal rank fusion
+
+    Each document scores sum(1 / (rrf_k + rank)) over the lists it appears in,
+    so a chunk ranked well by both retrievers beats one ranked first by only one.
+
+    Returns:
+        The top k documents, best first
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, document in enumerate(results, start=1):
+            key = _document_key(document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in ranked[:k]]
+
+
+async def dense_search(vectorstore, query: str, k: int, namespace: Optional[str] = None,
+                       filter: Optional[Dict[str, Any]] = None,
+                       embedding: Optional[List[float]] = None) -> List[Document]:
+    """
+    Vector search by query text, or by a precomputed query embedding when given
+
+    The graph embeds the user's message once per request (State.query_embedding);
+    passing it here skips another embedding call.
+    """
+    if embedding is None:
+        return await vectorstore.asimilarity_search(query, k=k, namespace=namespace, filter=filter)
+    results = await asyncio.to_thread(
+        vectorstore.similarity_search_by_vector_with_score, embedding, k=k, filter=filter, namespace=namespace
+    )
+    return [document for document, _ in results]
+
+
+async def scored_dense_search(vectorstore, query: str, k: int, namespace: Optional[str] = None,
+                              filter: Optional[Dict[str, Any]] = None,
+                              embedding: Optional[List[float]] = None) -> List[Tuple[Document, float]]:
+    """Vector search returning (document, similarity) pairs, best first"""
+    if embedding is None:
+        embedding = await vectorstore.embeddings.aembed_query(query)
+    return await asyncio.to_thread(
+        vectorstore.similarity_search_by_vector_with_score, embedding, k=k, filter=filter, namespace=namespace
+    )
+
+
+async def fan_out_search(vectorstore, query: str, k: int, namespaces: Optional[List[str]] = None,
+                         filter: Optional[Dict[str, Any]] = None,
+                         embedding: Optional[List[float]] = None) -> List[Document]:
+    """
+    Vector search across several namespaces in one round trip
+
+    The vector store's index must be an AgentRestrictedIndex; its fan_out_query
+    queries the namespaces concurrently and merges the matches by score.
+
+    Args:
+        vectorstore: Vector store over a restricted index
+        query: Search query (embedded unless embedding is given)
+        k: Number of documents to return across all namespaces
+        namespaces: Namespaces to search; defaults to all the index may access
+        filter: Metadata filter applied in every namespace
+        embedding: Precomputed query embedding
+
+    Returns:
+        Up to k documents, best first, with their namespace in the metadata
+    """
+    if embedding is None:
+        embedding = await vectorstore.embeddings.aembed_query(query)
+    result = await asyncio.to_thread(
+        vectorstore._index.fan_out_query, embedding, namespaces=namespaces, top_k=k, filter=filter
+    )
+    documents = []
+    for match in result["matches"]:
+        metadata = dict(match["metadata"])
+        text = metadata.pop(vectorstore._text_key, None)
+        if text is None:
+            logger.warning(f"Match {match['id']} in '{match['namespace']}' has no text, skipping")
+            continue
+        metadata["namespace"] = match["namespace"]
+        documents.append(Document(id=match["id"], page_content=text, metadata=metadata))
+    return documents
+
+
+def sparse_search(bm25_index: BM25Index, query: str, k: int, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+    """Run a BM25 query and return the hits as LangChain documents"""
+    return [
+        Document(id=entry["id"], page_content=entry["text"], metadata=dict(entry["metadata"]))
+        for entry, _ in bm25_index.search(query, k=k, filter=filter)
+    ]
+
+
+async def scored_hybrid_search(vectorstore, bm25_index: BM25Index, query: str, k: int, namespace: str,
+                               filter: Optional[Dict[str, Any]] = None, keyword_query: Optional[str] = None,
+                               embedding: Optional[List[float]] = None,
+                               candidates: int = HYBRID_CANDIDATES) -> List[Tuple[Document, Optional[float]]]:
+    """
+    Run dense and BM25 retrieval in parallel and fuse the rankings
+
+    Args:
+        vectorstore: Vector store for the dense side
+        bm25_index: BM25 index of the namespace
+        query: Query embedded for the dense side
+        k: Number of documents to return
+        namespace: Namespace to search
+        filter: Metadata filter applied by both retrievers
+        keyword_query: Text for the BM25 side (defaults to query); the bare user
+            message works better than a prompt-style query there
+        embedding: Precomputed query embedding for the dense side
+        candidates: Documents taken from each retriever before fusion
+
+    Returns:
+        Up to k (document, dense similarity) pairs in fused order, best first; the
+        similarity is None for chunks only BM25 found. If one retriever fails the
+        other's results are used.
+    """
+    candidates = max(k, candidates)
+    dense, sparse = await asyncio.gather(
+        scored_dense_search(vectorstore, query, candidates, namespace, filter=filter, embedding=embedding),
+        asyncio.to_thread(sparse_search, bm25_index, keyword_query or query, candidates, filter),
+        return_exceptions=True,
+    )
+    if isinstance(dense, BaseException) and isinstance(sparse, BaseException):
+        raise dense
+    if isinstance(dense, BaseException):
+        logger.error(f"Dense search in '{namespace}' failed, using BM25 results only: {str(dense)}")
+        return [(document, None) for document in sparse[:k]]
+    if isinstance(sparse, BaseException):
+        logger.error(f"BM25 search in '{namespace}' failed, using dense results only: {str(sparse)}")
+        return dense[:k]
+    similarities = {_document_key(document): score for document, score in dense}
+    fused = reciprocal_rank_fusion([[document for document, _ in dense], sparse], k)
+    return [(document, similarities.get(_document_key(document))) for document in fused]
+
+
+async def hybrid_search(vectorstore, bm25_index: BM25Index, query: str, k: int, namespace: str,
+                        filter: Optional[Dict[str, Any]] = None, keyword_query: Optional[str] = None,
+                        embedding: Optional[List[float]] = None,
+                        candidates: int = HYBRID_CANDIDATES) -> List[Document]:
+    """Fused dense and BM25 retrieval (see scored_hybrid_search), documents only"""
+    results = await scored_hybrid_search(vectorstore, bm25_index, query, k, namespace, filter=filter,
+                                         keyword_query=keyword_query, embedding=embedding, candidates=candidates)
+    return [document for document, _ in results]
+
+
+def adaptive_cutoff(scored: Sequence[Tuple[Document, Optional[float]]], max_results: int, min_score: float,
+                    relative_score: float, max_tokens: int, min_results: int = 1) -> Tuple[List[Document], int]:
+    """
+    Keep the results worth putting in a prompt
+
+    Walking the candidates best first, a result is skipped when its similarity
+    is below min_score or below relative_score times the best similarity, and
+    the walk stops at max_results or when the next chunk would exceed
+    max_tokens. The first min_results results are kept regardless of score.
+    Results without a similarity (chunks only BM25 found) pass the score tests.
+
+    Returns:
+        The kept documents and their total tokens
+    """
+    similarities = [score for _, score in scored if score is not None]
+    best = max(similarities) if similarities else None
+    kept: List[Document] = []
+    tokens = 0
+    for document, score in scored:
+        if len(kept) >= max_results:
+            break
+        required = len(kept) < min_results
+        if score is not None and not required:
+            if score < min_score or (best > 0 and score < best * relative_score):
+                continue
+        document_tokens = count_tokens(document.page_content)
+        if tokens + document_tokens > max_tokens and not required:
+            break
+        kept.append(document)
+        tokens += document_tokens
+    return kept, tokens
+
+
+class RetrievalStats:
+    """
+    Running numbers for tuning adaptive retrieval: results and context tokens
+    kept per namespace, and end-to-end answer latency.
+    """
+
+    def __init__(self, latency_window: int = 1000):
+        self._lock = threading.Lock()
+        self._namespaces: Dict[str, Dict[str, int]] = {}
+        self._latencies = deque(maxlen=latency_window)
+
+    def record_search(self, namespace: str, candidates: int, results: int, tokens: int):
+        with self._lock:
+            counts = self._namespaces.setdefault(namespace, {"searches": 0, "candidates": 0, "results": 0, "tokens": 0})
+            counts["searches"] += 1
+            counts["candidates"] += candidates
+            counts["results"] += results
+            counts["tokens"] += tokens
+
+    def record_answer(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {
+                namespace: {
+                    "searches": counts["searches"],
+                    "avg_candidates": round(counts["candidates"] / counts["searches"], 2),
+                    "avg_results": round(counts["results"] / counts["searches"], 2),
+                    "avg_context_tokens": round(counts["tokens"] / counts["searches"], 1),
+                }
+                for namespace, counts in self._namespaces.items()
+            }
+            latencies = np.array(self._latencies) * 1000 if self._latencies else None
+        return {
+            "adaptive": ADAPTIVE_RETRIEVAL_ENABLED,
+            "namespaces": namespaces,
+            "answers": len(latencies) if latencies is not None else 0,
+            "answer_latency_ms": {
+                "avg": round(float(latencies.mean()), 1),
+                "p50": round(float(np.percentile(latencies, 50)), 1),
+                "p95": round(float(np.percentile(latencies, 95)), 1),
+            } if latencies is not None else None,
+        }
+
+
+# Global retrieval statistics, exported through /api/advisor/stats
+retrieval_stats = RetrievalStats()
+
+
+def hybrid_available(namespace: str) -> bool:
+    """Whether searches in the namespace run in hybrid mode"""
+    if RETRIEVAL_MODE != "hybrid":
+        return False
+    bm25_index = get_bm25_index(namespace)
+    return bm25_index is not None and len(bm25_index) > 0
+
+
+async def search_documents(vectorstore, agent_id: str, query: str, k: int, namespace: str,
+                           filter: Optional[Dict[str, Any]] = None,
+                           keyword_query: Optional[str] = None,
+                           embedding: Optional[List[float]] = None) -> List[Document]:
+    """
+    Search a namespace for an agent in the configured retrieval mode
+
+    Hybrid search is used when RETRIEVAL_MODE is "hybrid" and the namespace has a
+    BM25 index; otherwise this is the vector store's similarity search. With
+    ADAPTIVE_RETRIEVAL_ENABLED the search over-fetches scored candidates and
+    adaptive_cutoff keeps those the namespace's retrieval policy allows, so k
+    is an upper bound rather than a fixed count.
+
+    Args:
+        vectorstore: The agent's vector store (enforces its namespace permissions)
+        agent_id: Agent doing the search; it must have access to the namespace
+        query: Search query
+        k: Number of documents to return
+        namespace: Namespace to search
+        filter: Metadata filter
+        keyword_query: Text for the BM25 side (defaults to query)
+        embedding: Precomputed query embedding (the graph's State.query_embedding)
+
+    Returns:
+        Up to k LangChain documents, best first
+    """
+    hybrid = hybrid_available(namespace)
+    if hybrid:
+        # The BM25 side reads outside the restricted index, so check the registry here
+        ensure_agent_namespaces()
+        if not namespace_registry.has_namespace_access(agent_id, namespace):
+            raise PermissionError(f"Agent '{agent_id}' does not have access to namespace '{namespace}'")
+
+    if not ADAPTIVE_RETRIEVAL_ENABLED:
+        if not hybrid:
+            return await dense_search(vectorstore, query, k, namespace, filter=filter, embedding=embedding)
+        return await hybrid_search(vectorstore, get_bm25_index(namespace), query, k, namespace,
+                                   filter=filter, keyword_query=keyword_query, embedding=embedding)
+
+    policy = get_retrieval_policy(namespace)
+    candidates = max(k, policy["candidates"])
+    if hybrid:
+        scored = await scored_hybrid_search(vectorstore, get_bm25_index(namespace), query, candidates, namespace,
+                                            filter=filter, keyword_query=keyword_query, embedding=embedding,
+                                            candidates=max(candidates, HYBRID_CANDIDATES))
+    else:
+        scored = await scored_dense_search(vectorstore, query, candidates, namespace, filter=filter,
+                                           embedding=embedding)
+    documents, tokens = adaptive_cutoff(
+        scored, policy["max_results"] or k, policy["min_score"], policy["relative_score"],
+        policy["max_tokens"], policy["min_results"],
+    )
+    retrieval_stats.record_search(namespace, len(scored), len(documents), tokens)
+    logger.info(f"Adaptive retrieval in '{namespace}' for '{agent_id}': kept {len(documents)} of "
+                f"{len(scored)} candidates ({tokens} tokens)")
+    return documents
@@ -1,6 +1,9 @@
-from langchain_openai import ChatOpenAI
-from app.core.config import OPENAI_API_KEY
+from app.core.clients import get_llm
 from app.models.schemas import State
+from app.services.streaming import answer_config, emit_sources
+from app.services.conversation_memory import build_prompt_messages, count_prompt_tokens
+from langchain_core.runnables import RunnableConfig
+import asyncio
 import json
 import logging
 import urllib.parse
@@ -9,13 +12,12 @@ from datetime import datetime, timedelta
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI LLM
-llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model_name="gpt-4o"
-)
+# Shared OpenAI LLM (pooled connections, see app.core.clients)
+llm = get_llm("answerer")
+# Short course-name extraction calls use the classifier settings
+extraction_llm = get_llm("classifier")
 
-def extract_course_names(message: str) -> list:
+async def extract_course_names(message: str) -> list:
     """
     Use LLM to extract course names from the user message
     """
@@ -31,11 +33,18 @@ def extract_course_names(message: str) -> list:
         {"role": "user", "content": message}
     ]
     
-    response = llm.invoke(messages)
+    response = await extraction_llm.ainvoke(messages)
     if not response.content.strip():
         return []
     return [course.strip() for course in response.content.split(",")]
 
+def load_courses_data() -> dict:
+    """
+    Load the scraped course offerings from courses.json
+    """
+    with open("./Scraper/output/courses.json", 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 def get_course_info(course_names: list, courses_data: dict) -> list:
     """
     Retrieve course information from courses.json for specified courses
@@ -197,30 +206,33 @@ def generate_google_calendar_link(schedule_data):
     
     return links
 
-def schedule_helper(state: State):
+async def schedule_helper(state: State, config: RunnableConfig = None):
     """
     Handle queries about course scheduling, conflicts, and classroom locations
     """
     user_message = state["messages"][-1].content
     
     # Step 1: Extract course names using LLM
-    course_names = extract_course_names(user_message)
+    course_names = await extract_course_names(user_message)
     logger.info(f"Extracted course names: {course_names}")
     
     # Step 2: Load and retrieve course information
     try:
-        with open("./Scraper/output/courses.json", 'r', encoding='utf-8') as f:
-            courses_data = json.load(f)
-            logger.info(f"Successfully loaded courses.json")
-            logger.info(f"Number of terms: {len(courses_data)}")
+        # File parsing and the course scan are blocking, keep them off the event loop
+        courses_data = await asyncio.to_thread(load_courses_data)
+        logger.info(f"Successfully loaded courses.json")
+        logger.info(f"Number of terms: {len(courses_data)}")
         
-        course_info = get_course_info(course_names, courses_data)
+        course_info = await asyncio.to_thread(get_course_info, course_names, courses_data)
         logger.info(f"Retrieved information for {len(course_info)} courses")
         
     except Exception as e:
         logger.error(f"Error retrieving course information: {str(e)}")
         course_info = []
     
+    # Sources shown to streaming clients: the course offerings found in courses.json
+    sources = [{"content": course['code'], "source": "courses.json"} for course in course_info]
+    
     # Step 3: Format course information for LLM
     context_str = ""
     if course_info:
@@ -297,19 +309,20 @@ def schedule_helper(state: State):
     # Combine the parts using format() instead of f-strings
     system_message = base_prompt.format(user_message=user_message, context_str=context_str) + json_instruction
     
-    messages = [{"role": "system", "content": system_message}] + state["messages"]
+    # Recent turns verbatim plus the running summary of older ones
+    messages = build_prompt_messages(system_message, state)
+    prompt_tokens = count_prompt_tokens(messages)
+    logger.info(f"Prompt tokens: {prompt_tokens}")
     
     # Get thread_id from configurable state if available (for conversation memory)
     thread_id = None
     if hasattr(state, "get") and callable(state.get):
-        config = state.get("configurable", {})
-        if isinstance(config, dict):
-            thread_id = config.get("thread_id")
+        configurable = state.get("configurable", {})
+        if isinstance(configurable, dict):
+            thread_id = configurable.get("thread_id")
     
-    # Pass thread_id to maintain conversation context if available
-    if thread_id:
-        response = llm.invoke(messages, config={"configurable": {"thread_id": thread_id}})
-    else:
-        response = llm.invoke(messages)
+    # Publish the sources, then tag the answer call so its tokens can be streamed
+    await emit_sources(sources, config)
+    response = await llm.ainvoke(messages, config=answer_config(config, thread_id))
     
-    return {"messages": response}  
\ No newline at end of file
+    return {"messages": response, "prompt_tokens": prompt_tokens}  
\ No newline at end of file
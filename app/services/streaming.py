@@ -0,0 +1,54 @@
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
+import json
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Tag attached to the LLM call that produces the user-facing answer, so the
+# streaming endpoint forwards its tokens and ignores classifier calls
+ANSWER_TAG = "advisor_answer"
+
+# Name of the custom event carrying the documents a node retrieved
+SOURCES_EVENT = "advisor_sources"
+
+def answer_config(config: Optional[RunnableConfig] = None, thread_id: Optional[str] = None) -> RunnableConfig:
+    """
+    Build the config for an answer-generating LLM call
+
+    Args:
+        config: The node's RunnableConfig, carrying the graph's callbacks
+        thread_id: Optional thread ID to keep conversation context
+
+    Returns:
+        A config tagged with ANSWER_TAG that keeps the parent callbacks
+    """
+    extra: RunnableConfig = {"tags": [ANSWER_TAG]}
+    if thread_id:
+        extra["configurable"] = {"thread_id": thread_id}
+    return merge_configs(config, extra)
+
+async def emit_sources(context: List[Dict[str, Any]], config: Optional[RunnableConfig] = None):
+    """
+    Publish the retrieved context as a custom event for streaming clients
+
+    Args:
+        context: List of {"content", "source"} dicts about to be used in the prompt
+        config: The node's RunnableConfig
+    """
+    sources = [
+        {"source": item.get("source", "unknown"), "preview": item.get("content", "").strip()[:200]}
+        for item in context
+    ]
+    try:
+        await adispatch_custom_event(SOURCES_EVENT, {"sources": sources}, config=config)
+    except Exception as e:
+        # Not running inside a traced graph run (e.g. a node called directly)
+        logger.debug(f"Could not dispatch sources event: {str(e)}")
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -1,39 +1,40 @@
-from langchain_openai import ChatOpenAI
-from app.core.config import OPENAI_API_KEY
+from app.core.clients import get_llm
+from app.core.config import SUPERVISOR_MODE
 from app.models.schemas import State
-from app.db.vector_store import vectorstore
+from pydantic import BaseModel, Field
+from typing import Literal
+from app.db.vector_store import get_vectorstore, embeddings
+from app.services.fast_router import fast_router
+from app.services.retrieval import fan_out_search
+from langchain_pinecone import PineconeVectorStore
+import asyncio
 from .agent_index_wrapper import get_restricted_index
 import logging
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI LLM
-llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model_name="gpt-4o"
-)
-
-# Get the restricted index for supervisor
-# Wrap the vector store's underlying Pinecone index
-original_index = vectorstore._index
+# Shared OpenAI LLM (pooled connections, see app.core.clients)
+llm = get_llm("classifier")
 
 # The supervisor needs access to all department namespaces to properly route queries
 allowed_namespaces = ["supervisor_namespace", "mechanical_namespace", "chemical_namespace", 
                       "civil_namespace", "ece_namespace", "cse_namespace", "cce_namespace", 
                       "msfea_advisor_namespace", "schedule_helper_namespace"]
 
-# Check if get_restricted_index accepts a list of namespaces
-try:
-    restricted_index = get_restricted_index(original_index, "supervisor", allowed_namespaces)
-except TypeError:
-    # If it doesn't accept a list, use the original index (unrestricted)
-    logger.info("Supervisor needs access to all namespaces for proper routing - using unrestricted index")
-    restricted_index = original_index
+_supervisor_vectorstore = None
+
+def get_supervisor_vectorstore():
+    """Return the supervisor's vector store over its restricted index (no network at import)"""
+    global _supervisor_vectorstore
+    if _supervisor_vectorstore is not None:
+        return _supervisor_vectorstore
 
-# Replace the vector store's index with the restricted one
-vectorstore._index = restricted_index
-logger.info("Created index for supervisor with access to all necessary department namespaces")
+    # A separate store over the shared index: the global vector store stays unrestricted
+    restricted_index = get_restricted_index(get_vectorstore()._index, "supervisor", allowed_namespaces)
+    _supervisor_vectorstore = PineconeVectorStore(index=restricted_index, embedding=embeddings, text_key="text")
+    logger.info("Created index for supervisor with access to all necessary department namespaces")
+    return _supervisor_vectorstore
 
 def handle_invalid_query(reason):
     """Generate a response for invalid queries"""
@@ -45,21 +46,30 @@ def handle_invalid_query(reason):
         "context": []
     }
 
-def supervisor(state: State):
-    """
-    Main supervisor node that determines which department the query is about
-    and routes to the appropriate department node, with added guardrails
-    """
-    # Get the latest user message
-    user_message = state["messages"][-1].content
-    
-    # Get thread_id from configurable state if available (for conversation memory)
-    thread_id = None
-    if hasattr(state, "get") and callable(state.get):
-        config = state.get("configurable", {})
-        if isinstance(config, dict):
-            thread_id = config.get("thread_id")
-    
+class SupervisorDecision(BaseModel):
+    """Structured result of the combined guardrail and routing call"""
+    is_valid: bool = Field(description="False ONLY if the query is clearly inappropriate or completely unrelated to engineering education")
+    reason: str = Field(description="Brief reason for the validity decision")
+    department: Literal[
+        "Architecture and Design (ARCH)",
+        "Civil and Environmental Engineering (CEE)",
+        "Chemical Engineering and Advanced Energy (CHEE)",
+        "Electrical and Computer Engineering (ECE)",
+        "Industrial Engineering and Management (ENMG)",
+        "Mechanical Engineering (MECH)",
+        "MSFEA Advisor",
+        "Schedule Helper",
+    ] = Field(description="The department or unit the query is most directly related to")
+
+# Structured-output variant of the supervisor LLM for the single-call mode
+structured_llm = llm.with_structured_output(SupervisorDecision)
+
+def _llm_config(thread_id, suffix):
+    """Config for a supervisor LLM call, keeping conversation context if available"""
+    return {"configurable": {"thread_id": f"{thread_id}_{suffix}"}} if thread_id else None
+
+async def _classify_two_calls(user_message, thread_id=None):
+    """Original mode: a VALID/INVALID guardrail call followed by a department routing call"""
     # STEP 1: Validate the query
     validation_prompt = f"""
     Determine if this query is appropriate for an academic advising system at AUB's MSFEA:
@@ -98,18 +108,13 @@ def supervisor(state: State):
     """
     
     # Pass thread_id to maintain conversation context if available
-    if thread_id:
-        validation_response = llm.invoke([{"role": "user", "content": validation_prompt}], 
-                                        config={"configurable": {"thread_id": f"{thread_id}_validation"}})
-    else:
-        validation_response = llm.invoke([{"role": "user", "content": validation_prompt}])
-    
+    validation_response = await llm.ainvoke([{"role": "user", "content": validation_prompt}],
+                                            config=_llm_config(thread_id, "validation"))
     validation_result = validation_response.content.strip()
     
-    # If invalid, return a rejection response
+    # If invalid, stop before spending a second call on routing
     if "INVALID:" in validation_result:
-        reason = validation_result.split("INVALID:")[1].strip()
-        return handle_invalid_query(reason)
+        return {"is_valid": False, "reason": validation_result.split("INVALID:")[1].strip(), "department": "Invalid"}
     
     # STEP 2: Determine which department the query is about
     department_prompt = f"""
@@ -142,21 +147,159 @@ def supervisor(state: State):
     Return only the department name or "Schedule Helper" without any explanation.
     """
     
-    # Pass thread_id to maintain conversation context if available
-    if thread_id:
-        department_response = llm.invoke([{"role": "user", "content": department_prompt}], 
-                                        config={"configurable": {"thread_id": f"{thread_id}_department"}})
-    else:
-        department_response = llm.invoke([{"role": "user", "content": department_prompt}])
+    department_response = await llm.ainvoke([{"role": "user", "content": department_prompt}],
+                                            config=_llm_config(thread_id, "department"))
+    return {"is_valid": True, "reason": validation_result, "department": department_response.content.strip()}
+
+async def _classify_single_call(user_message, thread_id=None):
+    """Combined mode: one structured-output call returning validity, reason and department"""
+    prompt = f"""
+    You are the main academic advisor at the Maroun Semaan Faculty of Engineering and Architecture (MSFEA) at the American University of Beirut (AUB).
+    For the student query below, decide (1) whether it is appropriate for an academic advising system and (2) which department or unit it is most directly related to.
+    Query: {user_message}
+
+    Validity rules:
+    1. ACCEPT any questions related to AUB's MSFEA departments, programs, courses, admissions, faculty, or careers
+    2. ACCEPT general questions about engineering education at AUB, even if somewhat vague
+    3. ACCEPT administrative questions about MSFEA (locations, contact info, deadlines, etc.)
+    4. ACCEPT comparative questions about different engineering departments or programs
+    5. ACCEPT questions about engineering student life, facilities, or activities
+    6. REJECT only clearly inappropriate content (offensive material, spam, etc.)
+    7. REJECT requests to write assignments or essays
+    8. REJECT questions completely unrelated to engineering education (e.g., medical advice, politics)
+    9. When in doubt, ACCEPT the query - it's much better to attempt to answer than to reject valid questions
+
+    Departments/units:
+    - Architecture and Design (ARCH): For queries specifically about architecture, graphic design, or urban planning
+    - Civil and Environmental Engineering (CEE): For queries specifically about civil engineering, construction, structural engineering, or environmental engineering
+    - Chemical Engineering and Advanced Energy (CHEE): For queries specifically about chemical engineering, petroleum, or advanced energy
+    - Electrical and Computer Engineering (ECE): For queries specifically about electrical engineering, computer engineering, CCE or CSE tracks
+    - Industrial Engineering and Management (ENMG): For queries specifically about industrial engineering, engineering management, or operations
+    - Mechanical Engineering (MECH): For queries specifically about mechanical engineering, thermal systems, materials, or manufacturing
+    - MSFEA Advisor: For general engineering queries, faculty-wide policies, interdisciplinary programs, or when no specific department applies MSFEA Advisor ALSO HAS ALL THE CALENDARS AND DATES OF MAIN UNIVERSITY EVENTS AND DEADLINES EXAMS SEMESTER BREAKS AND MORE....
+    - Schedule Helper: For queries specifically about class schedules, course schedules, or class timetables or who is giving a specific class or at what time
+
+    Routing guidelines:
+    1. If the query is general, vague, compares or mentions multiple departments, or is about faculty-wide matters, choose "MSFEA Advisor".
+    2. If the query is about non-academic matters (housing, tuition, campus life, etc.), choose "MSFEA Advisor".
+    3. ONLY choose a specific department when the query explicitly mentions that department or is unambiguously related to its distinct field.
+    4. When in doubt, choose "MSFEA Advisor" rather than a specific department.
+    """
+    decision = await structured_llm.ainvoke([{"role": "user", "content": prompt}],
+                                            config=_llm_config(thread_id, "supervisor"))
+    return {
+        "is_valid": decision.is_valid,
+        "reason": decision.reason,
+        "department": decision.department if decision.is_valid else "Invalid",
+    }
+
+async def classify_query(user_message, mode=None, thread_id=None):
+    """
+    Decide whether a query is valid and which department should handle it
+    
+    Args:
+        user_message: The student's query
+        mode: "single" (one structured call) or "two_call" (separate guardrail
+              and routing calls); defaults to SUPERVISOR_MODE
+        thread_id: Optional thread ID to maintain conversation context
+        
+    Returns:
+        Dict with is_valid, reason and department
+    """
+    mode = mode or SUPERVISOR_MODE
+    if mode == "two_call":
+        return await _classify_two_calls(user_message, thread_id)
+    try:
+        return await _classify_single_call(user_message, thread_id)
+    except Exception as e:
+        # Structured output can fail to parse; fall back to the two-call prompts
+        logger.error(f"Structured supervisor call failed, falling back to two calls: {str(e)}")
+        return await _classify_two_calls(user_message, thread_id)
+
+# Keep references to background shadow classifications until they finish
+_shadow_tasks = set()
+
+async def _shadow_classify(user_message, route):
+    """Classify a fast-path query with the LLM in the background, only to measure disagreement"""
+    try:
+        decision = await classify_query(user_message)
+        fast_router.record_shadow_decision(route, decision)
+    except Exception as e:
+        logger.error(f"Shadow supervisor classification failed: {str(e)}")
+
+async def route_query(user_message, thread_id=None, embedding=None):
+    """
+    Validate and route a query, calling the supervisor LLM only when the
+    fast router's confidence is below its threshold
+    
+    Args:
+        user_message: The student's query
+        thread_id: Optional thread ID to maintain conversation context
+        embedding: Optional precomputed embedding of the query
+        
+    Returns:
+        Dict with is_valid, reason and department
+    """
+    route = await fast_router.route(user_message, embedding)
+    if route["fast_path"]:
+        logger.info(f"Fast router chose '{route['department']}' via {route['method']} "
+                    f"(confidence={route['confidence']:.2f})")
+        if fast_router.should_shadow():
+            task = asyncio.create_task(_shadow_classify(user_message, route))
+            _shadow_tasks.add(task)
+            task.add_done_callback(_shadow_tasks.discard)
+        return {"is_valid": True, "reason": f"Fast path ({route['method']})", "department": route["department"]}
+    
+    decision = await classify_query(user_message, thread_id=thread_id)
+    fast_router.record_llm_decision(route, decision)
+    return decision
+
+async def supervisor(state: State):
+    """
+    Main supervisor node that determines which department the query is about
+    and routes to the appropriate department node, with added guardrails
+    """
+    # Get the latest user message
+    user_message = state["messages"][-1].content
+    
+    # Get thread_id from configurable state if available (for conversation memory)
+    thread_id = None
+    if hasattr(state, "get") and callable(state.get):
+        config = state.get("configurable", {})
+        if isinstance(config, dict):
+            thread_id = config.get("thread_id")
+    
+    # Embed the raw query once per request: the fast router, this node's retrieval
+    # and the department and track nodes all reuse the vector carried in the state
+    query_embedding = state.get("query_embedding")
+    if query_embedding is None:
+        try:
+            query_embedding = await embeddings.aembed_query(user_message.strip())
+        except Exception as e:
+            logger.error(f"Error embedding the query: {str(e)}")
+    
+    # STEP 1-2: Validate the query and determine its department, skipping the
+    # LLM when the local fast router is confident enough
+    decision = await route_query(user_message, thread_id=thread_id, embedding=query_embedding)
+    
+    # If invalid, return a rejection response
+    if not decision["is_valid"]:
+        return handle_invalid_query(decision["reason"])
     
-    department = department_response.content.strip()
+    department = decision["department"]
     
     # STEP 3: Use a default query type instead of LLM determination
     query_type = "General"  # Default value without making an API call
     
     # STEP 4: Retrieve context based on department and query type
-    # Using the restricted index for similarity search
-    docs = vectorstore.similarity_search(f"{department} department {query_type} {user_message}", k=3)
+    # Searching every namespace the supervisor may access concurrently, so questions
+    # that compare departments get context from all of them in one round trip
+    try:
+        docs = await fan_out_search(get_supervisor_vectorstore(), f"{department} department {query_type} {user_message}",
+                                    k=3, embedding=query_embedding)
+    except Exception as e:
+        logger.error(f"Error retrieving supervisor context: {str(e)}")
+        docs = []
     context = [{"content": doc.page_content, "source": doc.metadata.get("source", "unknown")} 
                for doc in docs]
     
@@ -165,6 +308,7 @@ def supervisor(state: State):
         "is_valid": True,
         "department": department,
         "query_type": query_type,
-        "context": context
+        "context": context,
+        "query_embedding": query_embedding
     }
 
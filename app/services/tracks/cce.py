@@ -1,23 +1,24 @@
-from langchain_openai import ChatOpenAI
-from app.core.config import OPENAI_API_KEY
+from app.core.clients import get_llm
 from app.models.schemas import State
+from app.services.streaming import answer_config, emit_sources
+from app.services.conversation_memory import build_prompt_messages, count_prompt_tokens
+from app.services.context_packer import context_packer
+from langchain_core.runnables import RunnableConfig
 from app.db.vector_store import get_agent_vectorstore
+from app.db.course_index import resolve_course_code, lookup_course_documents
+from app.services.retrieval import hybrid_available, search_documents
 import logging
-import re
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI LLM
-llm = ChatOpenAI(
-    api_key=OPENAI_API_KEY,
-    model_name="gpt-4o"
-)
+# Shared OpenAI LLM (pooled connections, see app.core.clients)
+llm = get_llm("answerer")
 
 # Get a dedicated vector store for CCE track
 cce_vectorstore = get_agent_vectorstore("cce")
 
-def cce_track(state: State):
+async def cce_track(state: State, config: RunnableConfig = None):
     """Handle queries about the Computer and Communications Engineering track"""
     user_message = state["messages"][-1].content
     query_type = state.get("query_type", "General")
@@ -29,18 +30,24 @@ def cce_track(state: State):
     # Direct search for course codes if we have no documents but the user is asking about a course
     if not department_docs:
         # Check if the user message contains a course code
-        course_match = re.search(r'(EECE)\s*(\d{3})', user_message, re.IGNORECASE)
-        if course_match:
-            course_code = f"{course_match.group(1)} {course_match.group(2)}"
+        course_code = resolve_course_code(user_message, "ece_namespace", subjects=("EECE",))
+        if course_code:
             logger.info(f"No documents passed but detected course code: {course_code}. Doing direct search.")
             try:
-                # Search directly for the course
-                course_docs = cce_vectorstore.similarity_search(
-                    "course information", 
-                    k=5,
-                    namespace="ece_namespace",
-                    filter={"course_code": {"$eq": course_code}}
-                )
+                # Exact lookup in the course index, then a hybrid (or filtered vector) search
+                course_docs = lookup_course_documents(course_code, "cce", "ece_namespace", k=5)
+                if not course_docs and hybrid_available("ece_namespace"):
+                    course_docs = await search_documents(
+                        cce_vectorstore, "cce", user_message, k=5, namespace="ece_namespace",
+                        embedding=state.get("query_embedding")
+                    )
+                elif not course_docs:
+                    course_docs = await cce_vectorstore.asimilarity_search(
+                        "course information", 
+                        k=5,
+                        namespace="ece_namespace",
+                        filter={"course_code": {"$eq": course_code}}
+                    )
                 
                 if course_docs:
                     logger.info(f"Direct course search found {len(course_docs)} documents")
@@ -64,8 +71,10 @@ def cce_track(state: State):
             logger.info(f"No documents from department, searching cce_namespace with query: {search_query}")
             
             # Ensure we're using the correct vectorstore and namespace
-            cce_docs = cce_vectorstore.similarity_search(
-                search_query, 
+            cce_docs = await search_documents(
+                cce_vectorstore, "cce", search_query,
+                keyword_query=user_message,
+                embedding=state.get("query_embedding"),
                 k=3,
                 namespace="cce_namespace",  # Explicitly specify namespace
                 filter={"track": "cce"}  # Add a filter for CCE track
@@ -99,6 +108,8 @@ def cce_track(state: State):
     if context:
         logger.info(f"Using document with content preview: {context[0]['content'][:100]}...")
     
+    # Drop duplicate chunks and fit the rest into the answer model's token budget
+    context = context_packer.pack(context, agent="cce")
     context_str = "\n".join([item["content"] for item in context])
     
     system_message = f"""
@@ -122,19 +133,20 @@ def cce_track(state: State):
     Respond in a professional, helpful manner appropriate for an academic advisor at AUB.
     """
     
-    messages = [{"role": "system", "content": system_message}] + state["messages"]
+    # Recent turns verbatim plus the running summary of older ones
+    messages = build_prompt_messages(system_message, state)
+    prompt_tokens = count_prompt_tokens(messages)
+    logger.info(f"Prompt tokens: {prompt_tokens}")
     
     # Get thread_id from configurable state if available (for conversation memory)
     thread_id = None
     if hasattr(state, "get") and callable(state.get):
-        config = state.get("configurable", {})
-        if isinstance(config, dict):
-            thread_id = config.get("thread_id")
+        configurable = state.get("configurable", {})
+        if isinstance(configurable, dict):
+            thread_id = configurable.get("thread_id")
     
-    # Pass thread_id to maintain conversation context if available
-    if thread_id:
-        response = llm.invoke(messages, config={"configurable": {"thread_id": thread_id}})
-    else:
-        response = llm.invoke(messages)
+    # Publish the sources, then tag the answer call so its tokens can be streamed
+    await emit_sources(context, config)
+    response = await llm.ainvoke(messages, config=answer_config(config, thread_id))
     
-    return {"messages": response}
+    return {"messages": response, "prompt_tokens": prompt_tokens}
@@ -0,0 +1,138 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import threading
+import time
+
+from app.core.config import BM25_INDEX_DIR, RETRIEVAL_MODE
+from app.db.bm25_index import missing_bm25_indexes
+from app.db.course_index import get_course_index
+from app.db.vector_store import get_vectorstore, warm_agent_vectorstores
+from app.services.namespace_config import ensure_agent_namespaces, load_namespace_config
+from app.services.supervisor import get_supervisor_vectorstore
+from app.services.fast_router import fast_router
+from app.services.advisor import get_graph, memory
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class StartupState:
+    """
+    Tracks application warmup for the readiness probe.
+
+    The process is live as soon as it serves requests; it is ready only once
+    every required warmup step has completed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.steps: Dict[str, float] = {}
+
+    def start(self):
+        with self._lock:
+            self.ready = False
+            self.started_at = time.perf_counter()
+            self.ready_at = None
+            self.error = None
+            self.steps = {}
+
+    def record_step(self, name: str, duration_ms: float):
+        with self._lock:
+            self.steps[name] = round(duration_ms, 2)
+
+    def mark_ready(self):
+        with self._lock:
+            self.ready = True
+            self.ready_at = time.perf_counter()
+
+    def mark_failed(self, error: str):
+        with self._lock:
+            self.error = error
+
+    def status(self) -> Dict[str, Any]:
+        """Return readiness, per-step warmup durations and any warmup error"""
+        with self._lock:
+            warmup_ms = None
+            if self.started_at is not None and self.ready_at is not None:
+                warmup_ms = round((self.ready_at - self.started_at) * 1000, 2)
+            return {
+                "ready": self.ready,
+                "warmup_ms": warmup_ms,
+                "steps_ms": dict(self.steps),
+                "error": self.error,
+            }
+
+
+# Global startup state read by the readiness probe
+startup_state = StartupState()
+
+
+async def _run_step(name: str, step: Callable[[], Awaitable[Any]]) -> Any:
+    start = time.perf_counter()
+    result = await step()
+    startup_state.record_step(name, (time.perf_counter() - start) * 1000)
+    return result
+
+
+def check_bm25_indexes() -> List[str]:
+    """
+    Log the agent namespaces whose hybrid searches will fall back to dense search
+
+    Returns:
+        The namespaces without a BM25 index
+    """
+    namespaces = sorted({namespace for namespaces in load_namespace_config().values() for namespace in namespaces})
+    missing = missing_bm25_indexes(namespaces)
+    if missing and len(missing) == len(namespaces):
+        # Most likely the ingestion scripts wrote the indexes somewhere this server does not read
+        logger.warning(f"No BM25 index found in {BM25_INDEX_DIR}; hybrid retrieval falls back to dense search")
+    elif missing:
+        logger.info(f"Namespaces without a BM25 index (dense search only): {missing}")
+    return missing
+
+
+async def warmup() -> bool:
+    """
+    Create everything the first request would otherwise build on demand
+
+    Connects to Pinecone (creating the index if needed), builds the agent
+    vector stores, compiles the advisor graph and purges expired sessions.
+    The fast router centroids are built too, but failing to embed them does
+    not block readiness since routing falls back to the LLM. Neither do a
+    missing course index or BM25 indexes, which are only logged.
+
+    Returns:
+        True once the application is ready, False if a required step failed
+    """
+    startup_state.start()
+    try:
+        await _run_step("namespaces", lambda: asyncio.to_thread(ensure_agent_namespaces))
+        await _run_step("vector_store", lambda: asyncio.to_thread(get_vectorstore))
+        await _run_step("agent_vector_stores", lambda: asyncio.to_thread(
+            lambda: (get_supervisor_vectorstore(), warm_agent_vectorstores())
+        ))
+        await _run_step("graph", lambda: asyncio.to_thread(get_graph))
+        # Drop conversations that expired while the service was down
+        removed = await _run_step("sessions", lambda: asyncio.to_thread(memory.backend.purge_expired))
+        logger.info(f"Purged {removed} expired sessions")
+    except Exception as e:
+        logger.error(f"Application warmup failed: {str(e)}")
+        startup_state.mark_failed(str(e))
+        return False
+
+    # Logs a warning when the ingestion scripts never wrote the index where this server reads it
+    await _run_step("course_index", lambda: asyncio.to_thread(get_course_index))
+    if RETRIEVAL_MODE == "hybrid":
+        await _run_step("bm25_indexes", lambda: asyncio.to_thread(check_bm25_indexes))
+
+    if not await _run_step("fast_router", fast_router.warmup) and fast_router.enabled:
+        logger.warning("Fast router centroids not built during warmup; they will be retried on first use")
+
+    startup_state.mark_ready()
+    logger.info(f"Application ready after {startup_state.status()['warmup_ms']} ms of warmup")
+    return True
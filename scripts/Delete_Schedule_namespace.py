@@ -13,9 +13,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Allow running as `python scripts/Delete_Schedule_namespace.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 # Import environment variables
 load_dotenv()
 
+from app.db.ingest_manifest import delete_manifest
+from app.db.namespace_versions import bump_namespace_versions
+
 # Get API keys and settings from environment
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
@@ -51,6 +57,10 @@ def delete_namespace_contents():
             # Delete all vectors in the namespace
             logger.info(f"Deleting all vectors in namespace '{namespace}'...")
             index.delete(delete_all=True, namespace=namespace)
+            # Servers drop their cached search results for the namespace
+            bump_namespace_versions([namespace])
+            # The next ingestion uploads every chunk again
+            delete_manifest(namespace)
             
             # Verify deletion
             updated_stats = index.describe_index_stats()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Microbenchmark for the per-request graph overhead in process_query.
+
+Compares the old behaviour (calling build_graph() on every query) with the
+compiled-graph registry (compile once, reuse for every query).
+"""
+import argparse
+import statistics
+import sys
+import time
+import os
+
+# Allow running as `python scripts/benchmark_graph_compile.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.advisor import build_graph, graph_registry
+
+
+def time_calls(func, iterations):
+    """Call func `iterations` times and return per-call durations in milliseconds"""
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def summarize(label, durations):
+    durations = sorted(durations)
+    p95 = durations[max(0, int(len(durations) * 0.95) - 1)]
+    print(f"{label:<28} mean={statistics.mean(durations):9.3f} ms  "
+          f"p50={statistics.median(durations):9.3f} ms  p95={p95:9.3f} ms")
+    return statistics.mean(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-request graph compile overhead")
+    parser.add_argument("--iterations", type=int, default=200, help="Number of simulated requests")
+    args = parser.parse_args()
+
+    print(f"Simulating {args.iterations} requests\n")
+
+    before = summarize("build_graph() per request", time_calls(build_graph, args.iterations))
+
+    # Warm the registry the same way application startup does
+    graph_registry.get()
+    after = summarize("registry.get() per request", time_calls(graph_registry.get, args.iterations))
+
+    print(f"\nPer-request overhead removed: {before - after:.3f} ms "
+          f"({before / max(after, 1e-9):.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+Ingestion benchmark: serial embedding and upserting (what a single
+PineconeVectorStore.add_documents call does) versus the batched, pipelined
+IngestionPipeline used by scripts/embed_document.py.
+
+Runs offline against a fake embedder with a configurable latency per call and
+the in-process vector index, whose upserts are slowed down the same way. An
+optional failure rate exercises the per-batch retries.
+
+    python scripts/benchmark_ingestion.py --chunks 2000 --embed-latency 0.3 --upsert-latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+# Allow running as `python scripts/benchmark_ingestion.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from app.db.local_index import LocalVectorIndex
+from app.services.ingestion import IngestionPipeline
+
+WORDS = ("course", "credits", "prerequisite", "semester", "laboratory", "design", "analysis", "systems",
+         "engineering", "project", "electives", "curriculum", "circuits", "thermodynamics", "structures")
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic random vectors after a fixed delay per call, failing a share of the calls"""
+
+    def __init__(self, dimension, latency, failure_rate=0.0):
+        self.dimension = dimension
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    def _vectors(self, texts):
+        self.calls += 1
+        if random.random() < self.failure_rate:
+            raise RuntimeError("simulated embedding API error")
+        vectors = []
+        for text in texts:
+            rng = random.Random(text)
+            vectors.append([rng.uniform(-1, 1) for _ in range(self.dimension)])
+        return vectors
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return self._vectors(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(self.latency)
+        return self._vectors(texts)
+
+
+class SlowLocalIndex(LocalVectorIndex):
+    """Local index whose upserts take as long as a remote call"""
+
+    def __init__(self, latency, dimension):
+        super().__init__(dimension=dimension)
+        self.latency = latency
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        time.sleep(self.latency)
+        return super().upsert(vectors=vectors, namespace=namespace, **kwargs)
+
+
+def make_chunks(count, words_per_chunk=150):
+    rng = random.Random(0)
+    return [
+        Document(page_content=" ".join(rng.choice(WORDS) for _ in range(words_per_chunk)),
+                 metadata={"source": "benchmark.txt", "chunk": number})
+        for number in range(count)
+    ]
+
+
+def run_serial(chunks, embeddings, index, namespace):
+    """One embedding call for every chunk, then one upsert of everything"""
+    started = time.perf_counter()
+    vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+    index.upsert(vectors=[(str(number), vector, {**chunk.metadata, "text": chunk.page_content})
+                          for number, (chunk, vector) in enumerate(zip(chunks, vectors))], namespace=namespace)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial versus pipelined document ingestion")
+    parser.add_argument("--chunks", type=int, default=2000, help="Number of synthetic chunks")
+    parser.add_argument("--dimension", type=int, default=64, help="Fake embedding dimension")
+    parser.add_argument("--embed-latency", type=float, default=0.3, help="Seconds per embedding call")
+    parser.add_argument("--serial-embed-latency", type=float, default=None,
+                        help="Seconds for the serial run's single embedding call "
+                             "(defaults to the per-batch latency times the number of batches, as the "
+                             "OpenAI client splits large inputs into sequential requests)")
+    parser.add_argument("--upsert-latency", type=float, default=0.05, help="Seconds per upsert call")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Share of pipelined embedding calls that fail and are retried")
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    batches = -(-args.chunks // args.batch_size)
+    print(f"Ingesting {args.chunks} chunks ({batches} batches of {args.batch_size})\n")
+
+    serial_latency = args.serial_embed_latency
+    if serial_latency is None:
+        serial_latency = args.embed_latency * batches
+    serial_seconds = run_serial(chunks, FakeEmbeddings(args.dimension, serial_latency),
+                                SlowLocalIndex(args.upsert_latency * batches, args.dimension), "benchmark")
+    print(f"{'serial':<10} {serial_seconds:8.2f} s  {args.chunks / serial_seconds:9.1f} chunks/s")
+
+    index = SlowLocalIndex(args.upsert_latency, args.dimension)
+    pipeline = IngestionPipeline(FakeEmbeddings(args.dimension, args.embed_latency, args.failure_rate), index,
+                                 "benchmark", batch_size=args.batch_size, max_in_flight=args.max_in_flight,
+                                 retry_backoff=0.05)
+    result = asyncio.run(pipeline.run(chunks))
+    stats = result["stats"]
+    print(f"{'pipelined':<10} {stats['seconds']:8.2f} s  {stats['chunks_per_second']:9.1f} chunks/s  "
+          f"{stats['tokens_per_second']:9.1f} tokens/s  ({stats['retries']} retries, "
+          f"{stats['failed_batches']} failed batches)")
+    print(f"\nStored vectors: {index.describe_index_stats()['namespaces']['benchmark']['vector_count']}")
+    print(f"Speedup: {serial_seconds / stats['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
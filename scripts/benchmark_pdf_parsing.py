@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+PDF parsing benchmark: extracting and chunking a catalog in the ingesting
+process (StreamingChunker.chunks over PyPDFLoader's pages) versus page ranges
+parsed by a pool of worker processes (StreamingChunker.pdf_chunks).
+
+A synthetic catalog is generated unless a PDF is given. Every mode must
+produce the same chunk ids as the serial run, so the parallel mode can replace
+it without re-embedding anything.
+
+    python scripts/benchmark_pdf_parsing.py --pages 500 --processes 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Allow running as `python scripts/benchmark_pdf_parsing.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.db.ingest_manifest import chunk_id
+from app.services.chunking import StreamingChunker, get_document_loader
+from benchmark_streaming_ingestion import write_catalog_pdf
+
+
+def timed_chunk_ids(chunks, source):
+    """Drain a chunk stream; return its chunk ids and the seconds it took"""
+    started = time.perf_counter()
+    ids = [chunk_id(source, chunk) for chunk in chunks]
+    return ids, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial versus multi-process PDF parsing and chunking")
+    parser.add_argument("--pages", type=int, default=500, help="Pages of the synthetic catalog")
+    parser.add_argument("--pdf", help="Use this PDF instead of generating one")
+    parser.add_argument("--processes", type=int, nargs="+", default=None,
+                        help="Worker process counts to try (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    counts = args.processes
+    if not counts:
+        cpus = os.cpu_count() or 1
+        counts = [1 << power for power in range(cpus.bit_length()) if 1 << power <= cpus]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.pdf
+        if not path:
+            path = os.path.join(directory, "catalog.pdf")
+            write_catalog_pdf(path, args.pages)
+        source = os.path.basename(path)
+        print(f"Parsing {path} ({os.path.getsize(path) / 2 ** 20:.1f} MiB) on {os.cpu_count()} CPUs\n")
+
+        chunker = StreamingChunker(source, args.chunk_size, args.chunk_overlap)
+        serial_ids, serial_seconds = timed_chunk_ids(chunker.chunks(get_document_loader(path).lazy_load()), source)
+        pages = chunker.counts["pages"]
+        print(f"{'mode':<14} {'seconds':>8} {'pages/s':>9} {'speedup':>8} {'chunks':>8}  same ids")
+        print(f"{'serial':<14} {serial_seconds:8.2f} {pages / serial_seconds:9.1f} {1.0:7.1f}x "
+              f"{len(serial_ids):>8}  -")
+
+        for processes in counts:
+            chunker = StreamingChunker(source, args.chunk_size, args.chunk_overlap)
+            ids, seconds = timed_chunk_ids(
+                chunker.pdf_chunks(path, processes=processes, pages_per_task=args.pages_per_task), source)
+            print(f"{f'processes={processes}':<14} {seconds:8.2f} {pages / seconds:9.1f} "
+                  f"{serial_seconds / seconds:7.1f}x {len(ids):>8}  {ids == serial_ids}")
+
+
+if __name__ == "__main__":
+    main()
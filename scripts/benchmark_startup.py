@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Startup benchmark: how long `import app.main` takes and how long until the
+readiness probe would flip (import + warmup).
+
+Each run happens in a fresh interpreter against local stand-ins for Pinecone
+and the OpenAI embeddings API, with a configurable simulated latency per
+remote call. Any outbound socket connection during import is counted, so a
+network-free import shows up as 0 remote calls and 0 connections.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def install_stand_ins(latency):
+    """Replace Pinecone and OpenAI embeddings with local stand-ins that count their remote calls"""
+    import random
+    import socket
+
+    import langchain_openai
+    import pinecone
+    from langchain_core.embeddings import Embeddings
+
+    calls = {"remote_calls": 0, "socket_connects": 0}
+
+    def remote_call():
+        calls["remote_calls"] += 1
+        time.sleep(latency)
+
+    original_connect = socket.socket.connect
+
+    def counting_connect(self, address):
+        calls["socket_connects"] += 1
+        return original_connect(self, address)
+
+    socket.socket.connect = counting_connect
+
+    class StandInIndex:
+        def query(self, *args, **kwargs):
+            remote_call()
+            return {"matches": []}
+
+        def describe_index_stats(self, *args, **kwargs):
+            remote_call()
+            return {"namespaces": {}}
+
+    class StandInIndexModel:
+        def __init__(self, name):
+            self.name = name
+
+    class StandInPinecone:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def list_indexes(self):
+            remote_call()
+            return [StandInIndexModel(os.environ.get("BENCHMARK_INDEX_NAME", "academic-advisor-knowledge"))]
+
+        def create_index(self, *args, **kwargs):
+            remote_call()
+
+        def Index(self, *args, **kwargs):
+            # The real client describes the index to find its host
+            remote_call()
+            return StandInIndex()
+
+    class StandInEmbeddings(Embeddings):
+        def __init__(self, **kwargs):
+            pass
+
+        def _vector(self, text):
+            rng = random.Random(text)
+            return [rng.uniform(-1, 1) for _ in range(64)]
+
+        def embed_documents(self, texts):
+            remote_call()
+            return [self._vector(text) for text in texts]
+
+        def embed_query(self, text):
+            remote_call()
+            return self._vector(text)
+
+    pinecone.Pinecone = StandInPinecone
+    langchain_openai.OpenAIEmbeddings = StandInEmbeddings
+    return calls
+
+
+def child(latency):
+    """Measure one cold start in this interpreter and print the result as JSON"""
+    sys.path.insert(0, REPO_ROOT)
+    calls = install_stand_ins(latency)
+
+    start = time.perf_counter()
+    import app.main  # noqa: F401
+    import_ms = (time.perf_counter() - start) * 1000
+    import_calls = dict(calls)
+
+    import asyncio
+    from app.services.warmup import warmup, startup_state
+
+    warmup_start = time.perf_counter()
+    ready = asyncio.run(warmup())
+    warmup_ms = (time.perf_counter() - warmup_start) * 1000
+
+    print(json.dumps({
+        "import_ms": import_ms,
+        "warmup_ms": warmup_ms,
+        "ready_ms": import_ms + warmup_ms,
+        "ready": ready,
+        "import_remote_calls": import_calls["remote_calls"],
+        "import_socket_connects": import_calls["socket_connects"],
+        "warmup_remote_calls": calls["remote_calls"] - import_calls["remote_calls"],
+        "steps_ms": startup_state.status()["steps_ms"],
+    }))
+
+
+def run_once(latency, session_dir):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    env.setdefault("PINECONE_API_KEY", "benchmark")
+    env.setdefault("SESSION_BACKEND", "sqlite")
+    env["SESSION_DB_PATH"] = os.path.join(session_dir, "sessions.db")
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--latency", str(latency)],
+        cwd=REPO_ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(label, values):
+    values = sorted(values)
+    print(f"{label:<22} mean={statistics.mean(values):9.1f} ms  "
+          f"p50={statistics.median(values):9.1f} ms  max={values[-1]:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import time and time-to-ready")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Simulated latency of each remote call in seconds")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.latency)
+        return
+
+    print(f"Measuring {args.runs} cold starts ({args.latency * 1000:.0f} ms per remote call)\n")
+    with tempfile.TemporaryDirectory() as session_dir:
+        results = [run_once(args.latency, session_dir) for _ in range(args.runs)]
+
+    summarize("import app.main", [r["import_ms"] for r in results])
+    summarize("warmup", [r["warmup_ms"] for r in results])
+    summarize("time to ready", [r["ready_ms"] for r in results])
+
+    last = results[-1]
+    print(f"\nRemote calls during import: {last['import_remote_calls']} "
+          f"(socket connections: {last['import_socket_connects']})")
+    print(f"Remote calls during warmup: {last['warmup_remote_calls']}")
+    print("Warmup steps (last run): " + ", ".join(f"{name}={ms:.1f} ms" for name, ms in last["steps_ms"].items()))
+    if not all(r["ready"] for r in results):
+        print("\nWarning: warmup failed in at least one run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Document loading benchmark: peak memory of ingesting a large PDF the way
+scripts/embed_document.py used to (loader.load(), one full-text string, then
+whole-text splitting) versus the streaming StreamingChunker path it uses now.
+
+A synthetic catalog with term headers, course descriptions and filler prose is
+written to a PDF, and each mode ingests it in a fresh process (peak RSS is per
+process) through the IngestionPipeline, with a fake embedder and an index that
+drops the vectors so only loading and chunking show in the numbers. The live
+chunks go to an in-memory BM25 index, as embed_document.py does.
+
+    python scripts/benchmark_streaming_ingestion.py --pages 3000
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Allow running as `python scripts/benchmark_streaming_ingestion.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.db.bm25_index import BM25Index
+from app.db.ingest_manifest import IngestManifest
+from app.services.chunking import StreamingChunker, get_document_loader, scan_catalog
+from app.services.ingestion import IngestionPipeline, ingest_source
+from benchmark_ingestion import WORDS, FakeEmbeddings
+
+SUBJECTS = ("EECE", "MECH", "CHEN", "CIVE", "ENMG")
+LINES_PER_PAGE = 55
+
+
+def catalog_lines(pages, seed=0):
+    """Lines of a synthetic catalog, LINES_PER_PAGE per page"""
+    rng = random.Random(seed)
+    term = 0
+    for page in range(pages):
+        lines = []
+        while len(lines) < LINES_PER_PAGE:
+            kind = rng.random()
+            if kind < 0.05:
+                term += 1
+                lines.append(f"Term {'I' * (term % 3 + 1)} ({rng.choice(('Fall', 'Spring', 'Summer'))})")
+                lines.extend(f"{rng.choice(SUBJECTS)} {rng.randint(200, 799)} Course {number} {rng.randint(1, 4)}"
+                             for number in range(rng.randint(3, 6)))
+                lines.append(f"Total {rng.randint(15, 18)}")
+            elif kind < 0.35:
+                lines.append(f"{rng.choice(SUBJECTS)} {rng.randint(200, 799)} Course {page}-{len(lines)}")
+                lines.extend(" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(rng.randint(2, 5)))
+            else:
+                lines.append(" ".join(rng.choice(WORDS) for _ in range(12)))
+        yield lines[:LINES_PER_PAGE]
+
+
+def write_catalog_pdf(path, pages):
+    """Write a minimal text-only PDF, one content stream per page"""
+    offsets = []
+    with open(path, "wb") as f:
+        def add_object(number, body):
+            offsets.append(f.tell())
+            f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        add_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{4 + 2 * page} 0 R" for page in range(pages))
+        add_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+        add_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for page, lines in enumerate(catalog_lines(pages)):
+            escaped = (line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines)
+            text = " T* ".join(f"({line})Tj" for line in escaped)
+            stream = f"BT /F1 9 Tf 12 TL 40 780 Td {text} ET".encode()
+            add_object(4 + 2 * page, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                                     f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * page} 0 R >>".encode())
+            add_object(5 + 2 * page, f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+        xref = f.tell()
+        f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+        f.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+        f.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+class DiscardingIndex:
+    """Index that drops what it is sent, noting when the first upsert arrived"""
+
+    def __init__(self):
+        self.first_upsert = None
+        self.vectors = 0
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        if self.first_upsert is None:
+            self.first_upsert = time.perf_counter()
+        self.vectors += len(vectors)
+
+    def delete(self, ids=None, namespace=None, **kwargs):
+        pass
+
+
+def loaded_chunks(path, source, chunk_size, chunk_overlap):
+    """The previous embed_document.py path: every page, the full text and all chunks in memory at once"""
+    documents = get_document_loader(path).load()
+    full_text = "\n".join([doc.page_content for doc in documents])
+    structure_chunks = scan_catalog(full_text, source=source)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                              length_function=len, is_separator_regex=False)
+    all_chunks = splitter.split_documents(documents) + structure_chunks
+    for chunk in all_chunks:
+        chunk.metadata.setdefault("source", source)
+    return all_chunks
+
+
+def run_mode(mode, path, args):
+    """Ingest the PDF in this process and print "<peak RSS KiB> <first upsert s> <seconds> <chunks>" """
+    source = os.path.basename(path)
+    index = DiscardingIndex()
+    pipeline = IngestionPipeline(FakeEmbeddings(args.dimension, args.embed_latency), index, "benchmark",
+                                 batch_size=args.batch_size, max_in_flight=args.max_in_flight)
+    # Like embed_document.py, the live chunks end up in the namespace's BM25 index
+    bm25_index = BM25Index()
+    started = time.perf_counter()
+    if mode == "load":
+        chunks = loaded_chunks(path, source, args.chunk_size, args.chunk_overlap)
+        result = asyncio.run(ingest_source(pipeline, IngestManifest(), source, chunks))
+        bm25_index.add_documents(result["ids"], result["documents"])
+    else:
+        chunks = StreamingChunker(source, args.chunk_size, args.chunk_overlap).chunks(
+            get_document_loader(path).lazy_load())
+        result = asyncio.run(ingest_source(pipeline, IngestManifest(), source, chunks,
+                                           on_live=bm25_index.add_documents))
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(peak, round(index.first_upsert - started, 2), round(elapsed, 2), len(result["ids"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark peak memory of loaded versus streamed document ingestion")
+    parser.add_argument("--pages", type=int, default=3000, help="Pages of the synthetic catalog")
+    parser.add_argument("--pdf", help="Use this PDF instead of generating one")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=8, help="Fake embedding dimension")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Seconds per embedding call")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--mode", choices=("load", "stream"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.pdf, args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.pdf
+        if not path:
+            path = os.path.join(directory, "catalog.pdf")
+            write_catalog_pdf(path, args.pages)
+            print(f"Wrote {args.pages}-page synthetic catalog ({os.path.getsize(path) / 2 ** 20:.1f} MiB)")
+        print(f"\n{'mode':<8} {'peak RSS':>10} {'first upsert':>13} {'total':>8} {'chunks':>8}")
+        peaks = {}
+        for mode in ("load", "stream"):
+            command = [sys.executable, __file__, "--mode", mode, "--pdf", path] + [
+                f"--{name.replace('_', '-')}={getattr(args, name)}"
+                for name in ("chunk_size", "chunk_overlap", "dimension", "embed_latency", "batch_size", "max_in_flight")
+            ]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout.split()
+            peak, first_upsert, seconds, chunks = output[-4:]
+            peaks[mode] = int(peak) / 1024
+            print(f"{mode:<8} {peaks[mode]:7.0f} MiB {first_upsert:>11} s {seconds:>6} s {chunks:>8}")
+        print(f"\nPeak RSS reduced by {peaks['load'] - peaks['stream']:.0f} MiB "
+              f"({1 - peaks['stream'] / peaks['load']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
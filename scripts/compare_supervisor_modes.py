@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Compare the supervisor's classification modes on a labeled query set.
+
+"two_call" is the original guardrail prompt followed by the department
+routing prompt; "single" is one structured-output call returning validity,
+reason and department together; "fast" puts the local fast router in front of
+the configured supervisor mode, as the graph does. For each mode this reports routing accuracy
+(after route_to_department, i.e. what the graph would actually do), mean and
+p95 latency, and the number of LLM calls made. Requires OPENAI_API_KEY.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# Allow running as `python scripts/compare_supervisor_modes.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.services import supervisor as supervisor_module
+from app.services.routing import route_to_department
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), "data", "supervisor_labeled_queries.json")
+
+
+class LLMCallCounter(BaseCallbackHandler):
+    """Counts chat model invocations"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.calls += 1
+
+
+async def evaluate(mode, dataset, counter):
+    """Classify every labeled query in the given mode and collect results"""
+    correct = 0
+    latencies = []
+    mistakes = []
+    calls_before = counter.calls
+    for item in dataset:
+        start = time.perf_counter()
+        if mode == "fast":
+            decision = await supervisor_module.route_query(item["query"])
+        else:
+            decision = await supervisor_module.classify_query(item["query"], mode=mode)
+        latencies.append((time.perf_counter() - start) * 1000)
+        predicted = route_to_department(decision)
+        if predicted == item["department"]:
+            correct += 1
+        else:
+            mistakes.append((item["query"], item["department"], predicted))
+    latencies.sort()
+    return {
+        "accuracy": correct / len(dataset),
+        "mean_ms": statistics.mean(latencies),
+        "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)],
+        "llm_calls": counter.calls - calls_before,
+        "mistakes": mistakes,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare single-call and two-call supervisor classification")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="JSON list of {query, department} items")
+    parser.add_argument("--modes", nargs="+", default=["two_call", "single"], choices=["two_call", "single", "fast"])
+    parser.add_argument("--show-mistakes", action="store_true", help="Print misclassified queries")
+    args = parser.parse_args()
+
+    with open(args.dataset, "r") as f:
+        dataset = json.load(f)
+
+    # Count every call made through the supervisor's LLM clients
+    counter = LLMCallCounter()
+    supervisor_module.llm.callbacks = [counter]
+
+    print(f"Evaluating {len(dataset)} labeled queries\n")
+    for mode in args.modes:
+        result = await evaluate(mode, dataset, counter)
+        print(f"{mode:<10} accuracy={result['accuracy']:6.1%}  mean={result['mean_ms']:8.1f} ms  "
+              f"p95={result['p95_ms']:8.1f} ms  llm_calls={result['llm_calls']} "
+              f"({result['llm_calls'] / len(dataset):.2f}/query)")
+        if args.show_mistakes:
+            for query, expected, predicted in result["mistakes"]:
+                print(f"    {query!r}: expected {expected}, got {predicted}")
+    if "fast" in args.modes:
+        stats = supervisor_module.fast_router.stats()
+        print(f"\nfast router: fast_path_rate={stats['fast_path_rate']:.1%}  "
+              f"llm_disagreement_rate={stats['llm_disagreement_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,18 @@
 import os
+import sys
 from dotenv import load_dotenv
 from pinecone import Pinecone
 
+# Allow running as `python scripts/delete_vectors.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 # Load environment variables
 load_dotenv()
 
+from app.db.ingest_manifest import delete_manifest
+from app.db.namespace_aliases import parse_namespace
+from app.db.namespace_versions import bump_namespace_versions
+
 # Get API key and index name from environment
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "academic-advisor-knowledge")
@@ -39,10 +47,18 @@ def delete_all_vectors_in_namespaces():
         try:
             # In new Pinecone API, we can delete all vectors in a namespace with delete_all()
             index.delete(namespace=namespace, delete_all=True)
+            # The next ingestion uploads every chunk again
+            delete_manifest(namespace)
             print(f"Successfully deleted all vectors in namespace: {namespace}")
         except Exception as e:
             print(f"Error deleting vectors in namespace {namespace}: {str(e)}")
     
+    # Servers drop their cached search results for the emptied namespaces; cache
+    # keys use the logical namespace ("ece_namespace" for "ece_namespace@v3")
+    bump_namespace_versions(dict.fromkeys(
+        name for namespace in namespaces for name in (namespace, parse_namespace(namespace)[0])
+    ))
+
     print("\nDeletion complete. Verifying namespaces are empty...")
     
     # Verify namespaces are empty
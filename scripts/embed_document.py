@@ -1,114 +1,125 @@
 import os
+import sys
 import argparse
-import re
+import asyncio
 import json
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
-from langchain_community.document_loaders import TextLoader, PyPDFLoader, UnstructuredMarkdownLoader
 from pinecone import Pinecone
 
+# Allow running as `python scripts/embed_document.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 # Load environment variables
 load_dotenv()
 
+from app.core.config import (
+    BM25_INDEX_DIR,
+    COURSE_INDEX_PATH,
+    INGEST_BATCH_SIZE,
+    INGEST_MANIFEST_DIR,
+    INGEST_MAX_IN_FLIGHT,
+    INGEST_PDF_PAGES_PER_TASK,
+    INGEST_PDF_PROCESSES,
+)
+from app.db.bm25_index import BM25Index, bm25_index_path
+from app.db.course_index import CourseCodeIndex
+from app.db.ingest_manifest import IngestManifest, manifest_path
+from app.db.namespace_aliases import namespace_aliases, parse_namespace
+from app.db.namespace_versions import bump_namespace_versions
+from app.services.chunking import StreamingChunker, get_document_loader
+from app.services.ingestion import IngestionPipeline, ingest_source
+
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "academic-advisor-knowledge")
 
-def split_by_term_structure(text, source):
-    pattern = re.compile(r"(Term\s+[IVX]+\s*\((Fall|Spring|Summer)\))", re.IGNORECASE)
-    sections = pattern.split(text)
-    result = []
-    i = 0
-    while i < len(sections):
-        if pattern.match(sections[i]):
-            term = sections[i].strip()
-            if i + 1 < len(sections):
-                content = sections[i + 1].strip()
-                metadata = {"term": term, "source": source}
-                result.append(Document(page_content=f"{term}\n{content}", metadata=metadata))
-                i += 2
-            else:
-                break
-        else:
-            i += 1
-    return result
-
-def split_by_course_descriptions(text, source):
-    pattern = re.compile(r"(EECE\s\d{3}\s[^\n]+?)\n(.*?)(?=\nEECE\s\d{3}\s|\Z)", re.DOTALL)
-    matches = pattern.findall(text)
-    result = []
-    for title, body in matches:
-        title_line = title.strip()
-        body = body.strip()
-        code_match = re.match(r"(EECE\s\d{3})\s(.*)", title_line)
-        if code_match:
-            course_code = code_match.group(1)
-            course_title = code_match.group(2)
-            metadata = {
-                "course_code": course_code,
-                "course_title": course_title,
-                "source": source
-            }
-            result.append(Document(page_content=f"{title_line}\n{body}", metadata=metadata))
-    return result
-
-def embed_document(document_path, namespace, chunk_size=1000, chunk_overlap=200, metadata=None):
+class LiveChunkIndexes:
+    """Course code and BM25 indexes fed with the document's live chunks as they are uploaded"""
+
+    def __init__(self, course_index_path, bm25_dir, namespace, source):
+        self.namespace = namespace
+        self.course_index_path = course_index_path
+        self.bm25_path = bm25_index_path(namespace, bm25_dir) if bm25_dir else None
+        self.course_index = CourseCodeIndex.load(course_index_path) if course_index_path else None
+        self.bm25_index = BM25Index.load(self.bm25_path) if self.bm25_path else None
+        # Replace this document's previous entries
+        self.replaced = {
+            "course": self.course_index.remove_source(namespace, source) if self.course_index else 0,
+            "bm25": self.bm25_index.remove_source(source) if self.bm25_index else 0,
+        }
+        self.indexed = {"course": 0, "bm25": 0}
+
+    def add(self, ids, chunks):
+        if self.course_index is not None:
+            self.indexed["course"] += self.course_index.add_documents(self.namespace, ids, chunks)
+        if self.bm25_index is not None:
+            self.indexed["bm25"] += self.bm25_index.add_documents(ids, chunks)
+
+    def save(self):
+        if self.course_index is not None:
+            self.course_index.save(self.course_index_path)
+            print(f"Course index {self.course_index_path}: indexed {self.indexed['course']} course chunks "
+                  f"(replaced {self.replaced['course']})")
+        if self.bm25_index is not None:
+            self.bm25_index.save(self.bm25_path)
+            print(f"BM25 index {self.bm25_path}: indexed {self.indexed['bm25']} chunks "
+                  f"(replaced {self.replaced['bm25']})")
+
+def embed_document(document_path, namespace, chunk_size=1000, chunk_overlap=200, metadata=None,
+                   course_index_path=COURSE_INDEX_PATH, bm25_dir=BM25_INDEX_DIR,
+                   batch_size=INGEST_BATCH_SIZE, max_in_flight=INGEST_MAX_IN_FLIGHT,
+                   manifest_dir=INGEST_MANIFEST_DIR, processes=INGEST_PDF_PROCESSES,
+                   pages_per_task=INGEST_PDF_PAGES_PER_TASK):
     print(f"Processing document: {document_path}")
+    # A logical namespace is written to the physical namespace currently serving it;
+    # pass a reserved version (scripts/manage_namespaces.py new) to build one offline
+    namespace = namespace_aliases.resolve(namespace)
     print(f"Target namespace: {namespace}")
 
     pc = Pinecone(api_key=PINECONE_API_KEY)
     index = pc.Index(name=INDEX_NAME)
     embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-    vectorstore = PineconeVectorStore(index=index, embedding=embeddings, text_key="text")
 
-    file_extension = os.path.splitext(document_path)[1].lower()
-    if file_extension == '.pdf':
-        loader = PyPDFLoader(document_path)
-    elif file_extension == '.md':
-        loader = UnstructuredMarkdownLoader(document_path)
+    # Pages are read lazily and chunked as they arrive, so embedding starts
+    # before a large catalog is fully parsed and no copy of its full text is built
+    source = os.path.basename(document_path)
+    chunker = StreamingChunker(source, chunk_size=chunk_size, chunk_overlap=chunk_overlap, metadata=metadata)
+    if processes > 1 and document_path.lower().endswith(".pdf"):
+        # Page ranges are extracted and chunked in worker processes, giving the same chunks
+        print(f"Parsing with {processes} processes, {pages_per_task} pages per task")
+        chunks = chunker.pdf_chunks(document_path, processes=processes, pages_per_task=pages_per_task)
     else:
-        loader = TextLoader(document_path, encoding='utf-8')
-
-    documents = loader.load()
-    print(f"Loaded {len(documents)} document parts")
-
-    full_text = "\n".join([doc.page_content for doc in documents])
-
-    term_chunks = split_by_term_structure(full_text, source=os.path.basename(document_path))
-    print(f"Identified {len(term_chunks)} term-based curriculum chunks")
-
-    course_chunks = split_by_course_descriptions(full_text, source=os.path.basename(document_path))
-    print(f"Identified {len(course_chunks)} course description chunks")
-
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-        is_separator_regex=False,
-    )
-    general_chunks = splitter.split_documents(documents)
-    print(f"Created {len(general_chunks)} general text chunks")
-
-    all_chunks = general_chunks + term_chunks + course_chunks
-
-    for chunk in all_chunks:
-        if 'source' not in chunk.metadata:
-            chunk.metadata['source'] = os.path.basename(document_path)
-        if metadata:
-            chunk.metadata.update(metadata)
-
-    if all_chunks:
-        print("\nSample chunk:")
-        print(f"Content: {all_chunks[0].page_content[:200]}...")
-        print(f"Metadata: {all_chunks[0].metadata}")
-
-    print(f"\nUploading {len(all_chunks)} chunks to namespace '{namespace}'...")
-    vectorstore.add_documents(documents=all_chunks, namespace=namespace)
-    print(f"Successfully embedded document into namespace '{namespace}'")
-    print(f"Total chunks: {len(all_chunks)}")
+        chunks = chunker.chunks(get_document_loader(document_path).lazy_load())
+
+    # The course and keyword indexes follow the document's live chunks
+    live_indexes = LiveChunkIndexes(course_index_path, bm25_dir, namespace, source)
+
+    path = manifest_path(namespace, manifest_dir) if manifest_dir else None
+    manifest = IngestManifest.load(path)
+    print(f"\nSyncing chunks with namespace '{namespace}'...")
+    pipeline = IngestionPipeline(embeddings, index, namespace, batch_size=batch_size, max_in_flight=max_in_flight)
+    result = asyncio.run(ingest_source(pipeline, manifest, source, chunks, on_live=live_indexes.add))
+    counts = chunker.counts
+    print(f"Loaded {counts['pages']} document parts")
+    print(f"Identified {counts['term']} term-based curriculum chunks")
+    print(f"Identified {counts['course']} course description chunks")
+    print(f"Created {counts['general']} general text chunks")
+
+    if path:
+        manifest.save(path)
+    stats = result["stats"]
+    print(f"Chunks: {result['added']} added, {result['unchanged']} unchanged, {result['removed']} removed")
+    if result["added"]:
+        print(f"Embedded {stats['chunks']} chunks in {stats['seconds']}s ({stats['chunks_per_second']} chunks/s, "
+              f"{stats['tokens_per_second']} tokens/s, {stats['retries']} retries)")
+    if result["failed"]:
+        print(f"Error: {result['failed']} chunks could not be uploaded or deleted; rerun to retry them")
+    if result["added"] or result["removed"]:
+        # Servers drop their cached search results for the namespace
+        bump_namespace_versions(dict.fromkeys([namespace, parse_namespace(namespace)[0]]))
+    live_indexes.save()
+    return result
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Embed a document into Pinecone vector store")
@@ -117,6 +128,21 @@ if __name__ == "__main__":
     parser.add_argument("--chunk-size", type=int, default=1000, help="Size of text chunks")
     parser.add_argument("--chunk-overlap", type=int, default=200, help="Overlap between chunks")
     parser.add_argument("--metadata", type=str, help="JSON string of metadata to attach to documents")
+    parser.add_argument("--course-index", default=COURSE_INDEX_PATH,
+                        help="Course code index to update (empty string to skip)")
+    parser.add_argument("--bm25-dir", default=BM25_INDEX_DIR,
+                        help="Directory of per-namespace BM25 indexes to update (empty string to skip)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE,
+                        help="Chunks per embedding call and upsert")
+    parser.add_argument("--max-in-flight", type=int, default=INGEST_MAX_IN_FLIGHT,
+                        help="Batches embedded or upserted concurrently")
+    parser.add_argument("--manifest-dir", default=INGEST_MANIFEST_DIR,
+                        help="Directory of per-namespace ingestion manifests (empty string to re-upload "
+                             "every chunk and never delete)")
+    parser.add_argument("--processes", type=int, default=INGEST_PDF_PROCESSES,
+                        help="Worker processes extracting and chunking PDF pages (1 to parse in this process)")
+    parser.add_argument("--pages-per-task", type=int, default=INGEST_PDF_PAGES_PER_TASK,
+                        help="PDF pages per worker task")
 
     args = parser.parse_args()
 
@@ -128,4 +154,10 @@ if __name__ == "__main__":
             print("Error: Invalid JSON in metadata parameter")
             exit(1)
 
-    embed_document(args.document_path, args.namespace, args.chunk_size, args.chunk_overlap, metadata_dict)
+    result = embed_document(args.document_path, args.namespace, args.chunk_size, args.chunk_overlap, metadata_dict,
+                            course_index_path=args.course_index, bm25_dir=args.bm25_dir,
+                            batch_size=args.batch_size, max_in_flight=args.max_in_flight,
+                            manifest_dir=args.manifest_dir, processes=args.processes,
+                            pages_per_task=args.pages_per_task)
+    if result["failed"]:
+        exit(1)
@@ -1,16 +1,25 @@
 import os
+import sys
 import argparse
+import asyncio
 import json
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
 from langchain.schema import Document
 from pinecone import Pinecone
 from langchain_community.document_loaders import TextLoader
 
+# Allow running as `python scripts/embed_raw_txt.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 # Load environment variables
 load_dotenv()
 
+from app.db.ingest_manifest import IngestManifest, manifest_path
+from app.db.namespace_aliases import namespace_aliases, parse_namespace
+from app.db.namespace_versions import bump_namespace_versions
+from app.services.ingestion import IngestionPipeline, ingest_source
+
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "academic-advisor-knowledge")
@@ -38,11 +47,22 @@ def embed_raw_txt(document_path, metadata=None):
     pc = Pinecone(api_key=PINECONE_API_KEY)
     index = pc.Index(name=INDEX_NAME)
     embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-    vectorstore = PineconeVectorStore(index=index, embedding=embeddings, text_key="text")
+    namespace = namespace_aliases.resolve(NAMESPACE)
 
-    print("Uploading 1 raw document chunk to Pinecone...")
-    vectorstore.add_documents(documents=[doc], namespace=NAMESPACE)
-    print(f"Successfully embedded document to namespace '{NAMESPACE}'.")
+    print("Syncing 1 raw document chunk with Pinecone...")
+    path = manifest_path(namespace)
+    manifest = IngestManifest.load(path)
+    pipeline = IngestionPipeline(embeddings, index, namespace)
+    result = asyncio.run(ingest_source(pipeline, manifest, doc.metadata["source"], [doc]))
+    manifest.save(path)
+    if result["added"] or result["removed"]:
+        # Servers drop their cached search results for the namespace
+        bump_namespace_versions(dict.fromkeys([namespace, parse_namespace(namespace)[0]]))
+    if result["failed"]:
+        print("Error: the document could not be uploaded; rerun to retry it.")
+        exit(1)
+    print(f"Namespace '{namespace}': {result['added']} added, {result['unchanged']} unchanged, "
+          f"{result['removed']} removed.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Embed raw .txt file into Pinecone without chunking")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Compare retrieval modes on a golden query set.
+
+"sequential" is the chain the agents used before hybrid retrieval: a course
+code metadata filter search, then a semantic search on the course code (or a
+plain semantic search when the query names no course). "dense" is one vector
+search, "sparse" one BM25 search, and "hybrid" runs both in parallel and
+fuses them with reciprocal rank fusion. For each mode this reports recall@k
+(queries with a relevant chunk in the top k), MRR, and p50/p95 latency.
+
+A chunk is relevant if its course_code metadata matches the item's
+course_code, or its text contains one of the item's phrases. BM25 indexes are
+read from BM25_INDEX_DIR (built by scripts/embed_document.py). Requires the
+vector backend to be reachable (Pinecone, or VECTOR_BACKEND=local with a
+snapshot) and OPENAI_API_KEY for query embeddings.
+
+    python scripts/evaluate_retrieval.py
+    python scripts/evaluate_retrieval.py --k 3 --modes sequential hybrid --show-misses
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# Allow running as `python scripts/evaluate_retrieval.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.db.bm25_index import get_bm25_index
+from app.db.course_index import COURSE_CODE_PATTERN, normalize_course_code
+from app.db.vector_store import get_vectorstore
+from app.services.retrieval import hybrid_search, sparse_search
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(__file__), "data", "retrieval_golden_queries.json")
+MODES = ["sequential", "dense", "sparse", "hybrid"]
+
+
+def is_relevant(document, relevant):
+    """Judge a retrieved chunk against a golden item's relevance criteria"""
+    course_code = relevant.get("course_code")
+    if course_code and normalize_course_code(document.metadata.get("course_code", "")) == normalize_course_code(course_code):
+        return True
+    text = document.page_content.lower()
+    return any(phrase.lower() in text for phrase in relevant.get("phrases", []))
+
+
+async def sequential_search(vectorstore, query, k, namespace):
+    """The filter-then-semantic fallback chain the agents ran before hybrid retrieval"""
+    match = COURSE_CODE_PATTERN.search(query)
+    if not match:
+        return await vectorstore.asimilarity_search(query, k=k, namespace=namespace)
+    course_code = f"{match.group(1).upper()} {match.group(2).upper()}"
+    documents = await vectorstore.asimilarity_search(
+        "course information", k=k, namespace=namespace, filter={"course_code": {"$eq": course_code}}
+    )
+    if not documents:
+        documents = await vectorstore.asimilarity_search(course_code, k=k, namespace=namespace)
+    return documents
+
+
+async def run_query(mode, vectorstore, item, k):
+    namespace = item["namespace"]
+    if mode == "sequential":
+        return await sequential_search(vectorstore, item["query"], k, namespace)
+    if mode == "dense":
+        return await vectorstore.asimilarity_search(item["query"], k=k, namespace=namespace)
+    bm25_index = get_bm25_index(namespace)
+    if bm25_index is None:
+        return None
+    if mode == "sparse":
+        return await asyncio.to_thread(sparse_search, bm25_index, item["query"], k)
+    return await hybrid_search(vectorstore, bm25_index, item["query"], k, namespace)
+
+
+async def evaluate(mode, vectorstore, dataset, k):
+    """Run every golden query in one mode and collect recall, MRR and latency"""
+    hits = 0
+    reciprocal_ranks = []
+    latencies = []
+    misses = []
+    skipped = 0
+    for item in dataset:
+        start = time.perf_counter()
+        documents = await run_query(mode, vectorstore, item, k)
+        elapsed = (time.perf_counter() - start) * 1000
+        if documents is None:
+            skipped += 1
+            continue
+        latencies.append(elapsed)
+        rank = next((position for position, document in enumerate(documents[:k], start=1)
+                     if is_relevant(document, item["relevant"])), None)
+        if rank:
+            hits += 1
+            reciprocal_ranks.append(1.0 / rank)
+        else:
+            reciprocal_ranks.append(0.0)
+            misses.append(item["query"])
+    evaluated = len(dataset) - skipped
+    latencies.sort()
+    return {
+        "evaluated": evaluated,
+        "skipped": skipped,
+        "recall": hits / evaluated if evaluated else 0.0,
+        "mrr": statistics.mean(reciprocal_ranks) if reciprocal_ranks else 0.0,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)] if latencies else 0.0,
+        "misses": misses,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare dense, sparse, hybrid and sequential retrieval")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="JSON list of {query, namespace, relevant} items")
+    parser.add_argument("--k", type=int, default=5, help="Documents retrieved per query")
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--show-misses", action="store_true", help="Print queries without a relevant chunk in the top k")
+    args = parser.parse_args()
+
+    with open(args.dataset, "r") as f:
+        dataset = json.load(f)
+
+    # Unrestricted store: the evaluation reads every namespace in the dataset
+    vectorstore = get_vectorstore()
+
+    print(f"Evaluating {len(dataset)} golden queries at k={args.k}\n")
+    for mode in args.modes:
+        result = await evaluate(mode, vectorstore, dataset, args.k)
+        skipped = f"  (skipped {result['skipped']}: no BM25 index)" if result["skipped"] else ""
+        print(f"{mode:<11} recall@{args.k}={result['recall']:6.1%}  mrr={result['mrr']:.3f}  "
+              f"p50={result['p50_ms']:8.1f} ms  p95={result['p95_ms']:8.1f} ms{skipped}")
+        if args.show_misses:
+            for query in result["misses"]:
+                print(f"    missed: {query!r}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
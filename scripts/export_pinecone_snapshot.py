@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Export Pinecone namespaces into a memory-mapped vector snapshot directory.
+
+The app serves the snapshot with VECTOR_SNAPSHOT_DIR. Every exported
+namespace is checked against the vector count reported by Pinecone's
+describe_index_stats, and the command exits non-zero on a mismatch.
+
+    python scripts/export_pinecone_snapshot.py --output data/vector_snapshot
+    python scripts/export_pinecone_snapshot.py --output data/vector_snapshot --namespaces ece_namespace cse_namespace
+    python scripts/export_pinecone_snapshot.py --output data/vector_snapshot --verify-only
+"""
+import argparse
+import logging
+import os
+import sys
+
+# Allow running as `python scripts/export_pinecone_snapshot.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pinecone import Pinecone
+
+from app.core.config import PINECONE_API_KEY, INDEX_NAME
+from app.db.local_index import LocalVectorIndex, load_namespace
+from app.db.vector_snapshot import open_snapshot, read_manifest, save_namespace
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def _get(obj, key):
+    """Read a field from a Pinecone response model or a plain dict"""
+    return obj[key] if isinstance(obj, dict) else getattr(obj, key)
+
+
+def remote_counts(index):
+    """Return {namespace: vector_count} from describe_index_stats"""
+    namespaces = _get(index.describe_index_stats(), "namespaces") or {}
+    return {name: int(_get(summary, "vector_count")) for name, summary in namespaces.items()}
+
+
+def export_namespace(index, output, namespace, batch_size):
+    """Copy one namespace into a local index and write it as a snapshot"""
+    local = LocalVectorIndex(metric="cosine")
+    copied = load_namespace(index, local, namespace, batch_size=batch_size)
+    if not copied:
+        logger.warning(f"Namespace '{namespace}' is empty; nothing written")
+        return 0
+    return save_namespace(local, output, namespace)["vector_count"]
+
+
+def verify(output, namespaces, counts):
+    """Compare snapshot vector counts with Pinecone's; return True if all match"""
+    manifest = read_manifest(output)
+    ok = True
+    print(f"\n{'namespace':<32}{'pinecone':>10}{'snapshot':>10}  status")
+    for namespace in namespaces:
+        expected = counts.get(namespace, 0)
+        actual = 0
+        if namespace in manifest["namespaces"]:
+            # Opening checks the files against the manifest entry
+            actual = len(open_snapshot(output, namespace).ids)
+        status = "ok" if actual == expected else "MISMATCH"
+        ok = ok and actual == expected
+        print(f"{namespace:<32}{expected:>10}{actual:>10}  {status}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Pinecone namespaces to a memory-mapped snapshot")
+    parser.add_argument("--output", required=True, help="Snapshot directory (VECTOR_SNAPSHOT_DIR)")
+    parser.add_argument("--namespaces", nargs="*", help="Namespaces to export (default: all in the index)")
+    parser.add_argument("--batch-size", type=int, default=100, help="Vectors fetched per request")
+    parser.add_argument("--verify-only", action="store_true", help="Only compare an existing snapshot with Pinecone")
+    args = parser.parse_args()
+
+    index = Pinecone(api_key=PINECONE_API_KEY).Index(INDEX_NAME)
+    counts = remote_counts(index)
+    namespaces = args.namespaces or sorted(counts)
+    os.makedirs(args.output, exist_ok=True)
+
+    if not args.verify_only:
+        for namespace in namespaces:
+            written = export_namespace(index, args.output, namespace, args.batch_size)
+            logger.info(f"Exported {written} vectors from '{namespace}'")
+
+    if not verify(args.output, namespaces, counts):
+        print("\nSnapshot does not match Pinecone; re-run the export (vectors may have changed meanwhile)")
+        sys.exit(1)
+    print("\nSnapshot matches Pinecone")
+
+
+if __name__ == "__main__":
+    main()
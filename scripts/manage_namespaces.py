@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+Rebuild a namespace without downtime behind a versioned alias.
+
+Agents read logical namespaces ("ece_namespace"); data/namespace_aliases.json
+maps each to the physical namespace serving it ("ece_namespace@v7"). A new
+version is built next to the live one, verified, then swapped in with one
+atomic file replace. The replaced version is retired and deleted by `gc`
+after NAMESPACE_GC_GRACE_SECONDS, so `rollback` can return to it until then.
+
+The alias file must be the one the servers read: in Kubernetes it lives on the
+backend's shared data volume, so run this script (and the ingestion scripts)
+in a backend pod, e.g. `kubectl exec deploy/backend -- python scripts/...`.
+Servers report the aliases they resolve with next to the file, and `gc` keeps
+a retired version while no live server reports or one still resolves to it.
+
+    python scripts/manage_namespaces.py new ece_namespace            # prints ece_namespace@v8
+    python scripts/embed_document.py catalog.pdf ece_namespace@v8
+    python scripts/manage_namespaces.py swap ece_namespace ece_namespace@v8
+    python scripts/manage_namespaces.py rollback ece_namespace
+    python scripts/manage_namespaces.py gc
+    python scripts/manage_namespaces.py status
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+# Allow running as `python scripts/manage_namespaces.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pinecone import Pinecone
+
+from app.core.config import (
+    BM25_INDEX_DIR,
+    COURSE_INDEX_PATH,
+    INDEX_NAME,
+    INGEST_MANIFEST_DIR,
+    NAMESPACE_ALIASES_PATH,
+    NAMESPACE_GC_GRACE_SECONDS,
+    PINECONE_API_KEY,
+)
+from app.db.bm25_index import bm25_index_path
+from app.db.course_index import CourseCodeIndex
+from app.db.ingest_manifest import delete_manifest
+from app.db.namespace_aliases import (
+    SERVER_REPORT_MAX_AGE_SECONDS,
+    expired_namespaces,
+    forget_namespaces,
+    read_namespace_aliases,
+    reserve_namespace_version,
+    rollback_namespace_alias,
+    server_reports,
+    servers_resolving,
+    swap_namespace_alias,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def _get(obj, key):
+    """Read a field from a Pinecone response model or a plain dict"""
+    return obj[key] if isinstance(obj, dict) else getattr(obj, key)
+
+
+def remote_counts(index):
+    """Return {namespace: vector_count} from describe_index_stats"""
+    namespaces = _get(index.describe_index_stats(), "namespaces") or {}
+    return {name: int(_get(summary, "vector_count")) for name, summary in namespaces.items()}
+
+
+def verify(index, logical, physical, min_vectors=1, min_ratio=0.9, bm25_dir=BM25_INDEX_DIR,
+           aliases_path=NAMESPACE_ALIASES_PATH):
+    """
+    Check that a physical namespace is ready to serve a logical one
+
+    Returns:
+        A list of problems; empty when the namespace can be swapped in
+    """
+    counts = remote_counts(index)
+    current = read_namespace_aliases(aliases_path)["aliases"].get(logical, logical)
+    built = counts.get(physical, 0)
+    live = counts.get(current, 0) if current != physical else 0
+    problems = []
+    if built < min_vectors:
+        problems.append(f"'{physical}' holds {built} vectors, expected at least {min_vectors}")
+    if live and built < live * min_ratio:
+        problems.append(f"'{physical}' holds {built} vectors, less than {min_ratio:.0%} of the {live} in '{current}'")
+    if bm25_dir and os.path.exists(bm25_index_path(current, bm25_dir)) \
+            and not os.path.exists(bm25_index_path(physical, bm25_dir)):
+        problems.append(f"'{current}' has a BM25 index but '{physical}' does not")
+    logger.info(f"Verify '{physical}' for '{logical}': {built} vectors (live '{current}': {live})")
+    return problems
+
+
+def collect_garbage(index, grace_seconds, dry_run=False, bm25_dir=BM25_INDEX_DIR, course_index_path=COURSE_INDEX_PATH,
+                    aliases_path=NAMESPACE_ALIASES_PATH, manifest_dir=INGEST_MANIFEST_DIR, allow_no_servers=False):
+    """
+    Delete retired namespaces past their grace period, with their BM25, course index and manifest files
+
+    A namespace is only deleted while servers report the aliases they resolve
+    with (so they read this alias file) and none of them still resolves to it.
+
+    Returns:
+        The namespaces deleted (or, with dry_run, those that would be)
+    """
+    reports = server_reports(aliases_path, max_age=SERVER_REPORT_MAX_AGE_SECONDS)
+    if not reports and not allow_no_servers:
+        logger.error(f"No server reported its namespace aliases in the last {SERVER_REPORT_MAX_AGE_SECONDS:.0f}s, "
+                     f"so servers may not read {aliases_path}; not deleting anything "
+                     f"(--allow-no-servers if no server is running)")
+        return []
+    expired = []
+    for namespace, info in expired_namespaces(grace_seconds, aliases_path).items():
+        servers = servers_resolving(namespace, info["logical"], reports)
+        if servers:
+            logger.warning(f"Keeping retired namespace '{namespace}': servers {servers} still resolve to it")
+        else:
+            expired.append(namespace)
+    if not expired or dry_run:
+        logger.info(f"Retired namespaces past the grace period: {expired}")
+        return expired
+
+    course_index = CourseCodeIndex.load(course_index_path) if course_index_path else None
+    deleted = []
+    for namespace in expired:
+        try:
+            index.delete(delete_all=True, namespace=namespace)
+        except Exception as e:
+            # Pinecone reports namespaces that no longer exist as not found
+            if "not found" not in str(e).lower():
+                logger.error(f"Could not delete namespace '{namespace}': {str(e)}")
+                continue
+        if bm25_dir and os.path.exists(bm25_index_path(namespace, bm25_dir)):
+            os.remove(bm25_index_path(namespace, bm25_dir))
+        if course_index is not None:
+            course_index.drop_namespace(namespace)
+        delete_manifest(namespace, manifest_dir)
+        deleted.append(namespace)
+        logger.info(f"Deleted retired namespace '{namespace}'")
+    if course_index is not None and deleted:
+        course_index.save(course_index_path)
+    forget_namespaces(deleted, aliases_path)
+
+    # Reports of servers gone for longer than the grace period are no longer needed
+    for report in server_reports(aliases_path):
+        if report["reported_at"] < time.time() - max(grace_seconds, SERVER_REPORT_MAX_AGE_SECONDS):
+            os.remove(report["path"])
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versioned namespaces behind atomically swapped aliases")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    new = commands.add_parser("new", help="Reserve the physical namespace of a logical namespace's next version")
+    new.add_argument("logical")
+
+    for name, description in (("verify", "Check a built version"), ("swap", "Verify a built version and serve it")):
+        command = commands.add_parser(name, help=description)
+        command.add_argument("logical")
+        command.add_argument("physical")
+        command.add_argument("--min-vectors", type=int, default=1,
+                             help="Vectors the new version must hold at least")
+        command.add_argument("--min-ratio", type=float, default=0.9,
+                             help="Share of the live version's vector count the new version must reach")
+        if name == "swap":
+            command.add_argument("--force", action="store_true", help="Swap even if verification fails")
+
+    rollback = commands.add_parser("rollback", help="Serve the most recently retired version again")
+    rollback.add_argument("logical")
+
+    gc = commands.add_parser("gc", help="Delete retired versions past the grace period")
+    gc.add_argument("--grace-seconds", type=float, default=NAMESPACE_GC_GRACE_SECONDS)
+    gc.add_argument("--dry-run", action="store_true")
+    gc.add_argument("--allow-no-servers", action="store_true",
+                    help="Delete even though no server reports its aliases (only when none is running)")
+
+    commands.add_parser("status", help="Show aliases, versions being built and retired versions")
+
+    args = parser.parse_args()
+
+    if args.command == "new":
+        print(reserve_namespace_version(args.logical))
+        return 0
+
+    index = Pinecone(api_key=PINECONE_API_KEY).Index(INDEX_NAME)
+
+    if args.command == "status":
+        data = read_namespace_aliases(NAMESPACE_ALIASES_PATH)
+        counts = remote_counts(index)
+        for section in ("aliases", "building", "retired"):
+            print(f"{section}:")
+            for name, value in data[section].items():
+                namespace = value if section == "aliases" else name
+                print(f"  {name}: {value}  ({counts.get(namespace, 0)} vectors)")
+        return 0
+
+    if args.command in ("verify", "swap"):
+        problems = verify(index, args.logical, args.physical, args.min_vectors, args.min_ratio)
+        for problem in problems:
+            logger.error(problem)
+        if args.command == "verify" or (problems and not args.force):
+            return 1 if problems else 0
+        previous = swap_namespace_alias(args.logical, args.physical)
+        print(f"{args.logical}: {previous} -> {args.physical}")
+        return 0
+
+    if args.command == "rollback":
+        swapped = rollback_namespace_alias(args.logical)
+        if swapped is None:
+            logger.error(f"No retired version of '{args.logical}' to roll back to")
+            return 1
+        print(f"{args.logical}: {swapped[0]} -> {swapped[1]}")
+        return 0
+
+    if args.command == "gc":
+        collect_garbage(index, args.grace_seconds, dry_run=args.dry_run, allow_no_servers=args.allow_no_servers)
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
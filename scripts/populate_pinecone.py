@@ -1,14 +1,22 @@
 import os
+import sys
+import asyncio
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
 from pinecone import Pinecone
 
+# Allow running as `python scripts/populate_pinecone.py` from the repo root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
 # Load environment variables - simple version without encoding handling
 load_dotenv()
 
+from app.db.ingest_manifest import IngestManifest, manifest_path
+from app.db.namespace_versions import bump_namespace_versions
+from app.services.ingestion import IngestionPipeline, ingest_source
+
 # Initialize Pinecone with the new API
 pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 
@@ -27,7 +35,8 @@ def main():
     
     # Load the PDF
     print("Loading PDF file...")
-    loader = PyPDFLoader("2024-catalog.pdf")
+    source = "2024-catalog.pdf"
+    loader = PyPDFLoader(source)
     documents = loader.load()
     
     # Split text into chunks
@@ -44,16 +53,21 @@ def main():
     # Initialize embeddings
     embeddings = OpenAIEmbeddings()
     
-    # Upload to Pinecone
-    print("Uploading to Pinecone...")
-    vectorstore = PineconeVectorStore.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        index_name=index_name
-    )
+    # Upload new chunks to the default namespace and delete the ones the catalog lost
+    print("Syncing with Pinecone...")
+    namespace = ""
+    path = manifest_path(namespace)
+    manifest = IngestManifest.load(path)
+    pipeline = IngestionPipeline(embeddings, pc.Index(index_name), namespace)
+    result = asyncio.run(ingest_source(pipeline, manifest, source, chunks))
+    manifest.save(path)
+    if result["added"] or result["removed"]:
+        # Servers drop their cached search results for the namespace
+        bump_namespace_versions([namespace])
     
-    print(f"Successfully uploaded {len(chunks)} chunks to Pinecone index '{index_name}'")
-    return vectorstore
+    print(f"Pinecone index '{index_name}': {result['added']} chunks added, {result['unchanged']} unchanged, "
+          f"{result['removed']} removed, {result['failed']} failed")
+    return result
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
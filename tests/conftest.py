@@ -1,6 +1,21 @@
+import os
+import sys
+
+# Tests run offline: conversations stay in memory and the clients get placeholder
+# keys. Set before the app modules read their configuration
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PINECONE_API_KEY", "test")
+
+# The benchmarks' fakes (scripts/benchmark_*.py) are reused by the tests
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
 import pytest
 from app.services.advisor import advisor_graph
 
+# app.core.config turns LangSmith tracing on; nothing should be uploaded from tests
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
 @pytest.fixture
 def advisor_graph_fixture():
     """Return the advisor graph for testing"""
@@ -0,0 +1,119 @@
+import time
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for the part of the redis-py client the session store uses.
+
+    Keys expire against `clock`, so tests can move time forward. Values,
+    sorted-set members and hash values come back as bytes, like redis-py
+    without decode_responses.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._data = {}
+        self._expires = {}
+
+    @staticmethod
+    def _bytes(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    def _live(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and self.clock() >= expires:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    # Strings
+    def get(self, key):
+        return self._live(key)
+
+    def set(self, key, value, ex=None):
+        self._data[key] = self._bytes(value)
+        self._expires.pop(key, None)
+        if ex is not None:
+            self._expires[key] = self.clock() + ex
+        return True
+
+    def expire(self, key, seconds):
+        if self._live(key) is None:
+            return False
+        self._expires[key] = self.clock() + seconds
+        return True
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                removed += 1
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return removed
+
+    # Sorted sets
+    def zadd(self, key, mapping):
+        zset = self._data.setdefault(key, {})
+        added = sum(1 for member in mapping if self._bytes(member) not in zset)
+        for member, score in mapping.items():
+            zset[self._bytes(member)] = float(score)
+        return added
+
+    def zrem(self, key, *members):
+        zset = self._live(key) or {}
+        return sum(1 for member in members if zset.pop(self._bytes(member), None) is not None)
+
+    def zcard(self, key):
+        return len(self._live(key) or {})
+
+    def _sorted(self, key):
+        return sorted((self._live(key) or {}).items(), key=lambda item: (item[1], item[0]))
+
+    def zrange(self, key, start, end):
+        members = [member for member, _ in self._sorted(key)]
+        return members[start:] if end == -1 else members[start:end + 1]
+
+    def zrangebyscore(self, key, min, max):
+        low = float("-inf") if min == "-inf" else float(min)
+        high = float("inf") if max == "+inf" else float(max)
+        return [member for member, score in self._sorted(key) if low <= score <= high]
+
+    # Hashes
+    def hset(self, key, field, value):
+        hash_ = self._data.setdefault(key, {})
+        added = self._bytes(field) not in hash_
+        hash_[self._bytes(field)] = self._bytes(value)
+        return int(added)
+
+    def hdel(self, key, *fields):
+        hash_ = self._live(key) or {}
+        return sum(1 for field in fields if hash_.pop(self._bytes(field), None) is not None)
+
+    def hvals(self, key):
+        return list((self._live(key) or {}).values())
+
+
+class FakePipeline:
+    """Queues commands and runs them in order on execute(), returning their results"""
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
@@ -0,0 +1,46 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import dependencies
+from app.api.endpoints import advisor
+
+
+@pytest.fixture
+def client(monkeypatch):
+    rebuilds = []
+    monkeypatch.setattr(advisor, "rebuild_graph", lambda: rebuilds.append(True))
+    app = FastAPI()
+    app.include_router(advisor.router, prefix="/api/advisor")
+    client = TestClient(app, raise_server_exceptions=False)
+    client.rebuilds = rebuilds
+    return client
+
+
+def test_rebuild_is_disabled_without_an_admin_token(client, monkeypatch):
+    monkeypatch.setattr(dependencies, "ADMIN_API_TOKEN", "")
+    assert client.post("/api/advisor/graph/rebuild").status_code == 403
+    assert client.post("/api/advisor/graph/rebuild", headers={"X-Admin-Token": ""}).status_code == 403
+    assert client.rebuilds == []
+
+
+def test_rebuild_requires_the_admin_token(client, monkeypatch):
+    monkeypatch.setattr(dependencies, "ADMIN_API_TOKEN", "s3cret")
+    assert client.post("/api/advisor/graph/rebuild").status_code == 401
+    assert client.post("/api/advisor/graph/rebuild", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.rebuilds == []
+
+    response = client.post("/api/advisor/graph/rebuild", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200 and response.json()["status"] == "rebuilt"
+    assert client.rebuilds == [True]
+
+
+def test_rebuild_errors_are_not_returned(client, monkeypatch):
+    monkeypatch.setattr(dependencies, "ADMIN_API_TOKEN", "s3cret")
+
+    def fail():
+        raise RuntimeError("Pinecone key pc-1234 rejected")
+    monkeypatch.setattr(advisor, "rebuild_graph", fail)
+    response = client.post("/api/advisor/graph/rebuild", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 500
+    assert "pc-1234" not in response.text
@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import advisor, ttl_cache
+from app.services.answer_cache import AnswerCache, answer_cache, is_follow_up
+
+ANSWER = {"content": "EECE 230 covers programming in C.", "department": "ECE", "status": "success"}
+
+
+@pytest.fixture
+def cached_answer():
+    """Put an answer for a mechanical engineering question in the answer cache"""
+    query = "Which technical electives does mechanical engineering offer?"
+    response = {"content": "MECH offers electives in thermofluids and design.",
+                "department": "Mechanical Engineering", "status": "success", "prompt_tokens": 0}
+    answer_cache.put(query, advisor.determine_department(query), response)
+    yield query, response
+    answer_cache.invalidate()
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_is_recorded_in_the_conversation(cached_answer):
+    query, response = cached_answer
+    result = await advisor.aprocess_query(query, session_id="cached-turn")
+    assert result.content == response["content"]
+
+    snapshot = await advisor.get_graph().aget_state({"configurable": {"thread_id": "cached-turn"}})
+    messages = snapshot.values["messages"]
+    assert [message.type for message in messages] == ["human", "ai"]
+    assert [message.content for message in messages] == [query, response["content"]]
+
+    # The follow-up now sees the exchange and bypasses the cache
+    cached, cache_context = await advisor.check_answer_cache(advisor.get_graph(), "and the labs?", "cached-turn")
+    assert cached is None and cache_context is None
+
+
+@pytest.mark.asyncio
+async def test_streamed_cache_hit_is_recorded_in_the_conversation(cached_answer):
+    query, response = cached_answer
+    events = [event async for event in advisor.astream_query(query, session_id="cached-stream")]
+    assert events[-1][0] == "done" and events[-1][1]["cached"]
+
+    snapshot = await advisor.get_graph().aget_state({"configurable": {"thread_id": "cached-stream"}})
+    assert [message.content for message in snapshot.values["messages"]] == [query, response["content"]]
+
+
+def test_exact_tier_matches_normalized_queries_per_department():
+    cache = AnswerCache(semantic_enabled=False)
+    cache.put("What is EECE 230?", "ece", ANSWER)
+    assert cache.get_exact("  what is eece 230  ", "ece") == ANSWER
+    assert cache.get_exact("What is EECE 230?", "mechanical") is None
+    assert cache.get_exact("What is EECE 231?", "ece") is None
+    assert AnswerCache(enabled=False).get_exact("What is EECE 230?", "ece") is None
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_semantic_tier_returns_answers_within_the_threshold():
+    cache = AnswerCache(semantic_threshold=0.95)
+    cache.put("What is EECE 230?", "ece", ANSWER, embedding=[1.0, 0.0])
+    # Cosine similarity 0.98, then 0.89
+    assert cache.get_semantic([2.0, 0.4], "ece") == ANSWER
+    assert cache.get_semantic([1.0, 0.5], "ece") is None
+    assert cache.get_semantic([1.0, 0.0], "mechanical") is None
+    assert cache.get_semantic(None, "ece") is None
+    assert AnswerCache(semantic_enabled=False).get_semantic([1.0, 0.0], "ece") is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_answers_expire_after_the_ttl(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(ttl_cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put("What is EECE 230?", "ece", ANSWER, embedding=[1.0, 0.0])
+    clock.now += 60
+    assert cache.get_exact("What is EECE 230?", "ece") == ANSWER
+    clock.now += 1
+    assert cache.get_exact("What is EECE 230?", "ece") is None
+    assert cache.get_semantic([1.0, 0.0], "ece") is None
+
+
+def test_invalidate_drops_one_department_from_both_tiers():
+    cache = AnswerCache()
+    cache.put("What is EECE 230?", "ece", ANSWER, embedding=[1.0, 0.0])
+    cache.put("What is MECH 310?", "mechanical", ANSWER, embedding=[0.0, 1.0])
+    assert cache.invalidate("ece") == 2
+    assert cache.get_exact("What is EECE 230?", "ece") is None
+    assert cache.get_semantic([1.0, 0.0], "ece") is None
+    assert cache.get_exact("What is MECH 310?", "mechanical") == ANSWER
+    assert cache.invalidate() == 2
+    assert cache.stats()["invalidated"] == 4
+
+
+def test_follow_ups_need_history():
+    assert is_follow_up("What about its prerequisites?", has_history=True)
+    assert is_follow_up("and CCE?", has_history=True)
+    assert not is_follow_up("What about its prerequisites?", has_history=False)
+    assert not is_follow_up("Which technical electives does mechanical engineering offer?", has_history=True)
+
+
+@pytest.mark.asyncio
+async def test_follow_ups_bypass_the_cache(monkeypatch):
+    cache = AnswerCache(semantic_enabled=False)
+    monkeypatch.setattr(advisor, "answer_cache", cache)
+    query = "What are its prerequisites?"
+    cache.put(query, advisor.determine_department(query), ANSWER)
+
+    async def aget_state(config):
+        return SimpleNamespace(values={"messages": ["What is EECE 230?"]})
+    graph = SimpleNamespace(aget_state=aget_state)
+
+    assert await advisor.check_answer_cache(graph, query, "ongoing") == (None, None)
+    assert cache.stats()["bypassed"] == 1
+    # The same question opening a conversation is answered from the cache
+    cached, _ = await advisor.check_answer_cache(graph, query)
+    assert cached == ANSWER
@@ -0,0 +1,42 @@
+from app.db.bm25_index import BM25Index, bm25_index_path, missing_bm25_indexes
+
+
+def ids(index, query):
+    return [document["id"] for document, _ in index.search(query, k=10)]
+
+
+def test_course_codes_match_however_they_are_spaced():
+    index = BM25Index()
+    index.add("a", "EECE 230 Introduction to Programming", {"source": "ece.pdf"})
+    index.add("b", "MECH 310 Thermodynamics", {"source": "mech.pdf"})
+    assert ids(index, "eece230") == ["a"]
+    assert ids(index, "what is the weather") == []
+
+
+def test_concurrent_ingestions_into_one_namespace_keep_both(tmp_path):
+    path = str(tmp_path / "bm25" / "ece_namespace.json")
+    seed = BM25Index()
+    seed.add("old", "EECE 230 old description", {"source": "ece.pdf"})
+    seed.add("lab", "EECE 231 lab", {"source": "labs.pdf"})
+    seed.save(path)
+
+    # Two ingestions of different documents load the index before either of them saves
+    ece = BM25Index.load(path)
+    labs = BM25Index.load(path)
+    ece.remove_source("ece.pdf")
+    ece.add("new", "EECE 230 new description", {"source": "ece.pdf"})
+    labs.remove_source("labs.pdf")
+    labs.add("lab2", "EECE 231 lab manual", {"source": "labs.pdf"})
+    ece.save(path)
+    labs.save(path)
+
+    saved = BM25Index.load(path)
+    assert sorted(document["id"] for document in saved.documents) == ["lab2", "new"]
+    # The saving index holds, and searches, the merged chunks too
+    assert ids(labs, "eece230") == ["new"]
+
+
+def test_missing_indexes_are_reported(tmp_path):
+    directory = str(tmp_path / "bm25")
+    BM25Index().save(bm25_index_path("ece_namespace", directory))
+    assert missing_bm25_indexes(["ece_namespace", "civil_namespace"], directory) == ["civil_namespace"]
@@ -0,0 +1,126 @@
+import pytest
+from langchain.schema import Document
+
+from app.db.ingest_manifest import chunk_id
+from app.services.chunking import (CatalogScanner, StreamingChunker, general_splitter, get_document_loader,
+                                    scan_catalog)
+from benchmark_streaming_ingestion import catalog_lines, write_catalog_pdf
+
+SOURCE = "catalog.pdf"
+
+CATALOG = """Bachelor of Engineering in Computer and Communications Engineering
+Term I (Fall)
+Course Title Credits
+EECE 230 Introduction to Programming 3
+MATH 201 Calculus III 3
+Total 17
+The first year is shared by all engineering majors.
+EECE 230 Introduction to Programming
+Programming in C, with an emphasis on problem solving. Students without
+MECH 310 for background.
+MECH 310 Thermodynamics
+Energy, entropy and the laws of thermodynamics.
+Term II (Spring) EECE 310 Electronics 3
+CHEN 311L Reactor Laboratory 1
+Experiments on batch and continuous reactors."""
+
+
+def described(chunks):
+    return [(chunk.page_content, chunk.metadata) for chunk in chunks]
+
+
+def test_scan_reads_term_tables_and_course_descriptions():
+    chunks = scan_catalog(CATALOG, SOURCE)
+    assert [chunk.metadata.get("term") or chunk.metadata["course_code"] for chunk in chunks] == [
+        "Term I (Fall)", "EECE 230", "MECH 310", "Term II (Spring)", "CHEN 311L"]
+
+    term = chunks[0]
+    assert term.metadata == {"term": "Term I (Fall)", "source": SOURCE, "course_codes": ["EECE 230", "MATH 201"]}
+    assert term.page_content.splitlines() == [
+        "Term I (Fall)", "Course Title Credits", "EECE 230 Introduction to Programming 3",
+        "MATH 201 Calculus III 3", "Total 17"]
+
+    course = chunks[1]
+    assert course.metadata == {"course_code": "EECE 230", "course_title": "Introduction to Programming",
+                               "subject": "EECE", "source": SOURCE}
+    # A course code wrapped to the start of a line is a cross-reference, not a header
+    assert course.page_content.endswith("Students without\nMECH 310 for background.")
+
+
+def test_table_row_followed_by_prose_opens_a_description():
+    chunks = scan_catalog(CATALOG, SOURCE)
+    # The header on the term's line starts its table; the last row is the description's header
+    assert chunks[3].metadata["course_codes"] == ["EECE 310"]
+    assert chunks[4].metadata["course_title"] == "Reactor Laboratory 1"
+    assert chunks[4].page_content == ("CHEN 311L Reactor Laboratory 1\n"
+                                      "Experiments on batch and continuous reactors.")
+
+
+def test_page_breaks_do_not_change_the_chunks():
+    lines = CATALOG.split("\n")
+    expected = described(scan_catalog(CATALOG, SOURCE))
+    for page_break in range(1, len(lines)):
+        scanner = CatalogScanner(SOURCE)
+        chunks = scanner.feed("\n".join(lines[:page_break]))
+        chunks += scanner.feed("\n".join(lines[page_break:]))
+        assert described(chunks + scanner.close()) == expected, page_break
+
+
+def test_long_sections_are_closed():
+    scanner = CatalogScanner(SOURCE, max_section_chars=60)
+    chunks = scanner.feed("MECH 310 Thermodynamics\n" + "\n".join(["energy and entropy " * 2] * 3))
+    assert len(chunks) == 1 and chunks[0].page_content.count("energy") == 4
+    assert scanner.close() == []
+
+
+def test_resumed_scanner_continues_the_same_section():
+    first_page, second_page = CATALOG[:400], CATALOG[400:]
+    scanner = CatalogScanner(SOURCE)
+    scanner.feed(first_page)
+    resumed = CatalogScanner(SOURCE)
+    resumed.resume(scanner.state())
+    assert resumed.fingerprint() == scanner.fingerprint()
+    assert described(resumed.feed(second_page) + resumed.close()) == \
+        described(scanner.feed(second_page) + scanner.close())
+
+
+def catalog_pages(count):
+    return [Document(page_content="\n".join(lines), metadata={"source": SOURCE, "page": number})
+            for number, lines in enumerate(catalog_lines(count))]
+
+
+def worker_ranges(pages, pages_per_task, chunk_size=1000, chunk_overlap=200):
+    """What the pdf_chunks workers return for each page range: every range scanned from a fresh scanner"""
+    splitter = general_splitter(chunk_size, chunk_overlap)
+    for first in range(0, len(pages), pages_per_task):
+        scanner = CatalogScanner(SOURCE)
+        results = []
+        for page in pages[first:first + pages_per_task]:
+            results.append({"text": page.page_content, "general": splitter.split_documents([page]),
+                            "structure": scanner.feed(page.page_content), "fingerprint": scanner.fingerprint()})
+        yield results, scanner.state()
+
+
+@pytest.mark.parametrize("pages_per_task", [1, 3, 7])
+def test_merged_ranges_give_the_serial_chunks(pages_per_task):
+    pages = catalog_pages(20)
+    serial = StreamingChunker(SOURCE)
+    expected = [chunk_id(SOURCE, chunk) for chunk in serial.chunks(pages)]
+
+    chunker = StreamingChunker(SOURCE)
+    scanner = CatalogScanner(SOURCE)
+    merged = []
+    for results, state in worker_ranges(pages, pages_per_task):
+        merged.extend(chunker._merge_range(results, state, scanner))
+    merged.extend(chunker._close(scanner))
+    assert [chunk_id(SOURCE, chunk) for chunk in merged] == expected
+    assert chunker.counts == serial.counts
+
+
+def test_pdf_chunks_match_the_loader_pages(tmp_path):
+    pytest.importorskip("pypdf")
+    path = str(tmp_path / SOURCE)
+    write_catalog_pdf(path, 12)
+    serial = StreamingChunker(SOURCE).chunks(get_document_loader(path).lazy_load())
+    parallel = StreamingChunker(SOURCE).pdf_chunks(path, processes=2, pages_per_task=3)
+    assert [chunk_id(SOURCE, chunk) for chunk in parallel] == [chunk_id(SOURCE, chunk) for chunk in serial]
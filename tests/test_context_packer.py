@@ -0,0 +1,59 @@
+from app.services.context_packer import ContextPacker
+from app.services.conversation_memory import count_tokens
+
+COURSE = ("EECE 230 Introduction to Programming covers variables, control flow, functions, arrays "
+          "and pointers in C, with weekly programming assignments and a final project.")
+PREREQUISITES = "Prerequisites for MECH 310 Thermodynamics are PHYS 210 and MATH 202."
+
+
+def item(content, **fields):
+    return {"content": content, "source": "catalog.pdf", **fields}
+
+
+def contents(items):
+    return [entry["content"] for entry in items]
+
+
+def test_exact_duplicates_are_dropped_after_folding_case_and_spacing():
+    packer = ContextPacker()
+    unique = packer.deduplicate([item(COURSE), item("  " + COURSE.upper().replace(" ", "\n ")), item(PREREQUISITES)])
+    assert contents(unique) == [COURSE, PREREQUISITES]
+
+
+def test_chunk_contained_in_a_kept_one_is_dropped():
+    overlap = COURSE[:COURSE.index(" and a final")]
+    unique = ContextPacker().deduplicate([item(COURSE), item(PREREQUISITES), item(overlap)])
+    assert contents(unique) == [COURSE, PREREQUISITES]
+
+
+def test_longer_chunk_replaces_the_kept_one_it_covers_in_place():
+    overlap = COURSE[:COURSE.index(" and a final")]
+    unique = ContextPacker().deduplicate([item(overlap, rank=1), item(PREREQUISITES), item(COURSE, rank=3)])
+    assert contents(unique) == [COURSE, PREREQUISITES]
+    assert unique[0]["rank"] == 3
+
+
+def test_pack_orders_by_score_and_fills_the_budget():
+    short = "EECE 230 is offered every Fall."
+    context = [item(COURSE, score=0.8), item(short, score=0.7), item(PREREQUISITES, score=0.9)]
+    budget = count_tokens(PREREQUISITES) + count_tokens(short)
+    packer = ContextPacker()
+    packed = packer.pack(context, budget=budget)
+    # The course chunk does not fit; the shorter one after it still does
+    assert contents(packed) == [PREREQUISITES, short]
+
+    stats = packer.stats()
+    assert (stats["chunks_in"], stats["chunks_out"], stats["over_budget"]) == (3, 2, 1)
+    assert stats["tokens_out"] == budget
+
+
+def test_best_chunk_over_budget_is_truncated():
+    packed = ContextPacker().pack([item(COURSE), item(PREREQUISITES)], budget=5)
+    assert len(packed) == 1
+    assert COURSE.startswith(packed[0]["content"]) and count_tokens(packed[0]["content"]) <= 5
+
+
+def test_budget_per_model():
+    packer = ContextPacker(default_budget=3000, budgets={"gpt-4o-mini": 1500})
+    assert packer.budget_for("gpt-4o-mini") == 1500
+    assert packer.budget_for("another-model") == 3000
@@ -0,0 +1,78 @@
+import logging
+
+from langchain.schema import Document
+
+from app.db import course_index
+from app.db.course_index import CourseCodeIndex, normalize_course_code
+
+
+def _course(code, source, text="Description"):
+    return Document(page_content=f"{code} {text}", metadata={"course_code": code, "source": source})
+
+
+def test_normalize_course_code():
+    assert normalize_course_code("eece230") == "EECE 230"
+    assert normalize_course_code("CHEN-311l") == "CHEN 311L"
+    assert normalize_course_code("not a code") is None
+
+
+def test_lookup_respects_namespaces(tmp_path):
+    index = CourseCodeIndex()
+    index.add_documents("ece_namespace", ["a"], [_course("EECE 230", "ece.pdf")])
+    assert [entry["id"] for entry in index.lookup("eece 230", ["ece_namespace"])] == ["a"]
+    assert index.lookup("EECE 230", ["mechanical_namespace"]) == []
+
+
+def test_concurrent_ingestions_into_different_namespaces_keep_both(tmp_path):
+    path = str(tmp_path / "course_index.json")
+    seed = CourseCodeIndex()
+    seed.add_documents("ece_namespace", ["old"], [_course("EECE 230", "ece.pdf", "old text")])
+    seed.save(path)
+
+    # Two ingestions load the file before either of them saves
+    ece = CourseCodeIndex.load(path)
+    mechanical = CourseCodeIndex.load(path)
+    ece.remove_source("ece_namespace", "ece.pdf")
+    ece.add_documents("ece_namespace", ["new"], [_course("EECE 230", "ece.pdf", "new text")])
+    mechanical.add_documents("mechanical_namespace", ["m"], [_course("MECH 310", "mech.pdf")])
+    ece.save(path)
+    mechanical.save(path)
+
+    saved = CourseCodeIndex.load(path)
+    assert [entry["id"] for entry in saved.lookup("EECE 230", ["ece_namespace"])] == ["new"]
+    assert [entry["id"] for entry in saved.lookup("MECH 310", ["mechanical_namespace"])] == ["m"]
+    # The saving index holds the merged contents too
+    assert mechanical.contains("EECE 230", "ece_namespace")
+
+
+def test_dropping_a_namespace_keeps_entries_saved_meanwhile(tmp_path):
+    path = str(tmp_path / "course_index.json")
+    gc = CourseCodeIndex.load(path)
+    ingestion = CourseCodeIndex.load(path)
+    ingestion.add_documents("cse_namespace", ["c"], [_course("EECE 330", "cse.pdf")])
+    ingestion.add_documents("ece_namespace@v1", ["v1"], [_course("EECE 230", "ece.pdf")])
+    ingestion.save(path)
+    gc.drop_namespace("ece_namespace@v1")
+    gc.save(path)
+
+    saved = CourseCodeIndex.load(path)
+    assert saved.stats() == {"cse_namespace": {"courses": 1, "chunks": 1}}
+
+
+def test_missing_index_is_logged_once_and_loaded_when_written(tmp_path, monkeypatch, caplog):
+    path = str(tmp_path / "course_index.json")
+    monkeypatch.setattr(course_index, "COURSE_INDEX_PATH", path)
+    monkeypatch.setattr(course_index, "NAMESPACE_VERSION_CHECK_SECONDS", 0)
+    monkeypatch.setattr(course_index, "_course_index", None)
+    monkeypatch.setattr(course_index, "_course_index_mtime", None)
+
+    with caplog.at_level(logging.WARNING, logger="app.db.course_index"):
+        assert course_index.get_course_index().stats() == {}
+        course_index.get_course_index()
+    assert [record.getMessage() for record in caplog.records] == [
+        f"Course index {path} not found; course lookups fall back to vector search"]
+
+    written = CourseCodeIndex()
+    written.add_documents("ece_namespace", ["a"], [_course("EECE 230", "ece.pdf")])
+    written.save(path)
+    assert course_index.get_course_index().contains("EECE 230", "ece_namespace")
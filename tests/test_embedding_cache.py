@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.db import embedding_cache
+from app.db.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Embeds a text as [length, vowels, 1] and records the batches it was asked for"""
+
+    model = "counting"
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text)), float(sum(text.count(vowel) for vowel in "aeiou")), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def counters(cache):
+    stats = cache.stats()
+    return stats["computed"], stats["memory_hits"], stats["disk_hits"]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable wall clock for the SQLite tier"""
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_memory_hits_skip_the_client():
+    client = CountingEmbeddings()
+    cache = CachedEmbeddings(client)
+    first = cache.embed_documents(["EECE 230", "MECH 310"])
+    assert cache.embed_documents(["MECH 310", "CHEN 311"]) == [first[1], client.embed_query("CHEN 311")]
+    assert cache.embed_query("EECE 230") == first[0]
+    # The second batch only sent the text not seen before
+    assert client.batches[:2] == [["EECE 230", "MECH 310"], ["CHEN 311"]]
+    assert counters(cache) == (3, 2, 0)
+    assert cache.stats()["hit_ratio"] == 0.4
+
+
+def test_duplicates_within_a_batch_are_embedded_once():
+    client = CountingEmbeddings()
+    cache = CachedEmbeddings(client)
+    vectors = cache.embed_documents(["EECE 230", "MECH 310", "EECE 230"])
+    assert client.batches == [["EECE 230", "MECH 310"]]
+    assert vectors[0] == vectors[2]
+    assert counters(cache) == (2, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_is_shared_by_new_caches(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    vectors = await CachedEmbeddings(CountingEmbeddings(), disk_path=path).aembed_documents(["EECE 230", "MECH 310"])
+
+    client = CountingEmbeddings()
+    cache = CachedEmbeddings(client, disk_path=path)
+    assert await cache.aembed_documents(["EECE 230", "MECH 310", "CHEN 311"]) == \
+        vectors + [client.embed_query("CHEN 311")]
+    assert client.batches[0] == ["CHEN 311"]
+    # Disk hits are promoted to the memory tier
+    assert await cache.aembed_query("EECE 230") == vectors[0]
+    assert counters(cache) == (1, 1, 2)
+    assert cache.stats()["disk_entries"] == 3
+
+
+def test_disk_entries_expire_after_the_ttl(tmp_path, clock):
+    path = str(tmp_path / "embeddings.sqlite")
+    CachedEmbeddings(CountingEmbeddings(), ttl_seconds=3600, disk_path=path).embed_query("EECE 230")
+
+    clock.now += 3600
+    cache = CachedEmbeddings(CountingEmbeddings(), ttl_seconds=3600, disk_path=path)
+    cache.embed_query("EECE 230")
+    assert counters(cache) == (0, 0, 1)
+
+    # Opened before the entry expired, read after
+    client = CountingEmbeddings()
+    stale = CachedEmbeddings(client, ttl_seconds=3600, disk_path=path)
+    clock.now += 1
+    stale.embed_query("EECE 230")
+    assert client.batches == [["EECE 230"]]
+    assert counters(stale) == (1, 0, 0)
+
+    # Expired rows are purged when the store opens
+    clock.now += 3601
+    assert CachedEmbeddings(CountingEmbeddings(), ttl_seconds=3600, disk_path=path).stats()["disk_entries"] == 0
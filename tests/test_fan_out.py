@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services import agent_index_wrapper
+from app.services.agent_index_wrapper import AgentRestrictedIndex
+
+
+class SlowIndex:
+    """Index answering each namespace after a fixed delay, recording the calls it gets"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.calls = []
+
+    def query(self, vector, namespace, top_k, filter=None, include_metadata=True, **kwargs):
+        self.calls.append((namespace, kwargs))
+        time.sleep(self.delays[namespace])
+        return {"matches": [{"id": f"{namespace}-{rank}", "score": 1.0 - rank / 10 - self.delays[namespace],
+                             "metadata": {"text": namespace}} for rank in range(top_k)]}
+
+
+@pytest.fixture
+def fanout_pool(monkeypatch):
+    """Replace the shared fan-out pool with one of the given size"""
+    pools = []
+
+    def make(workers):
+        pool = ThreadPoolExecutor(max_workers=workers)
+        pools.append(pool)
+        monkeypatch.setattr(agent_index_wrapper, "_fanout_pool", pool)
+        return pool
+    yield make
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+
+def test_merges_by_score_and_reports_slow_namespaces(fanout_pool):
+    fanout_pool(4)
+    index = SlowIndex({"a": 0.0, "b": 0.01, "slow": 0.5})
+    result = AgentRestrictedIndex(index, "supervisor", ["a", "b", "slow"]).fan_out_query(
+        [0.1], top_k=3, timeout=0.2)
+
+    assert [match["id"] for match in result["matches"]] == ["a-0", "b-0", "a-1"]
+    assert {ns: info["status"] for ns, info in result["namespaces"].items()} == \
+        {"a": "ok", "b": "ok", "slow": "timeout"}
+    # The request itself is bounded, so the slow query frees its worker
+    assert all(kwargs["_request_timeout"] == 0.2 for _, kwargs in index.calls)
+
+
+def test_time_queued_in_the_pool_does_not_count(fanout_pool):
+    fanout_pool(1)
+    index = SlowIndex({"a": 0.3, "b": 0.3})
+    result = AgentRestrictedIndex(index, "supervisor", ["a", "b"]).fan_out_query([0.1], top_k=1, timeout=0.45)
+    # "b" waits 0.3 s for the only worker, then answers 0.3 s after it started
+    assert {ns: info["status"] for ns, info in result["namespaces"].items()} == {"a": "ok", "b": "ok"}
+
+
+def test_query_never_started_is_cancelled(fanout_pool):
+    pool = fanout_pool(1)
+    release = threading.Event()
+    pool.submit(release.wait, 2)
+    index = SlowIndex({"a": 0.0})
+    try:
+        result = AgentRestrictedIndex(index, "supervisor", ["a"]).fan_out_query([0.1], top_k=1, timeout=0.1)
+    finally:
+        release.set()
+    assert result["namespaces"]["a"]["status"] == "timeout"
+    pool.shutdown(wait=True)
+    assert index.calls == []
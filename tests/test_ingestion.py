@@ -0,0 +1,155 @@
+import pytest
+from langchain.schema import Document
+
+from app.db.ingest_manifest import IngestManifest, chunk_id
+from app.db.local_index import LocalVectorIndex
+from app.services.ingestion import IngestionPipeline, ingest_source
+from benchmark_ingestion import FakeEmbeddings
+
+NAMESPACE = "test"
+SOURCE = "catalog.pdf"
+
+
+class FailingIndex(LocalVectorIndex):
+    """Local index rejecting upserts of chunks whose text contains "broken", and deletes while `fail_deletes` is set"""
+
+    def __init__(self, dimension):
+        super().__init__(dimension=dimension)
+        self.fail_deletes = False
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        vectors = [self._parse_record(record) for record in vectors]
+        if any("broken" in metadata["text"] for _, _, metadata in vectors):
+            raise RuntimeError("simulated upsert error")
+        return super().upsert(vectors=vectors, namespace=namespace, **kwargs)
+
+    def delete(self, ids=None, namespace=None, **kwargs):
+        if self.fail_deletes:
+            raise RuntimeError("simulated delete error")
+        return super().delete(ids=ids, namespace=namespace, **kwargs)
+
+
+def chunks(*texts):
+    return [Document(page_content=text, metadata={"source": SOURCE}) for text in texts]
+
+
+def vector_count(index):
+    return index.describe_index_stats()["namespaces"].get(NAMESPACE, {}).get("vector_count", 0)
+
+
+@pytest.fixture
+def index():
+    return FailingIndex(dimension=8)
+
+
+@pytest.fixture
+def pipeline(index):
+    return IngestionPipeline(FakeEmbeddings(dimension=8, latency=0), index, NAMESPACE,
+                             batch_size=2, max_in_flight=2, max_retries=0, retry_backoff=0)
+
+
+@pytest.mark.asyncio
+async def test_rerun_only_upserts_changed_chunks(pipeline, index):
+    manifest = IngestManifest()
+    first = await ingest_source(pipeline, manifest, SOURCE, chunks("a", "b", "c", "a"))
+    assert (first["added"], first["unchanged"], first["removed"], first["failed"]) == (3, 0, 0, 0)
+    assert [document.page_content for document in first["documents"]] == ["a", "b", "c"]
+    assert manifest.chunk_ids(SOURCE) == first["ids"]
+    assert vector_count(index) == 3
+
+    again = await ingest_source(pipeline, manifest, SOURCE, chunks("a", "b", "c"))
+    assert (again["added"], again["unchanged"], again["removed"], again["failed"]) == (0, 3, 0, 0)
+    assert again["stats"]["chunks"] == 0
+
+    edited = await ingest_source(pipeline, manifest, SOURCE, chunks("a", "c", "d", "e"))
+    assert (edited["added"], edited["unchanged"], edited["removed"], edited["failed"]) == (2, 2, 1, 0)
+    assert manifest.chunk_ids(SOURCE) == edited["ids"]
+    assert vector_count(index) == 4
+    removed = chunk_id(SOURCE, chunks("b")[0])
+    assert removed not in index.fetch([removed], namespace=NAMESPACE)["vectors"]
+
+
+@pytest.mark.asyncio
+async def test_failed_chunks_are_left_out_of_the_manifest_and_retried(pipeline, index):
+    manifest = IngestManifest()
+    result = await ingest_source(pipeline, manifest, SOURCE, chunks("a", "b", "c", "broken"))
+    # Batches of two: "c" shares the failing batch with "broken"
+    assert (result["added"], result["failed"]) == (2, 2)
+    assert result["stats"]["failed_batches"] == 1
+    assert manifest.chunk_ids(SOURCE) == [chunk_id(SOURCE, document) for document in chunks("a", "b")]
+
+    retried = await ingest_source(pipeline, manifest, SOURCE, chunks("a", "b", "c"))
+    assert (retried["added"], retried["unchanged"], retried["failed"]) == (1, 2, 0)
+    assert len(manifest) == 3
+
+
+@pytest.mark.asyncio
+async def test_undeleted_chunks_stay_in_the_manifest(pipeline, index):
+    manifest = IngestManifest()
+    await ingest_source(pipeline, manifest, SOURCE, chunks("a", "b"))
+    index.fail_deletes = True
+    result = await ingest_source(pipeline, manifest, SOURCE, chunks("a"))
+    assert (result["removed"], result["failed"]) == (0, 1)
+    assert len(manifest) == 2
+
+    index.fail_deletes = False
+    result = await ingest_source(pipeline, manifest, SOURCE, chunks("a"))
+    assert (result["removed"], result["failed"]) == (1, 0)
+    assert manifest.chunk_ids(SOURCE) == [chunk_id(SOURCE, chunks("a")[0])]
+
+
+@pytest.mark.asyncio
+async def test_on_live_receives_unchanged_and_upserted_chunks(pipeline):
+    manifest = IngestManifest()
+    await ingest_source(pipeline, manifest, SOURCE, chunks("a", "b"))
+    live = {}
+    result = await ingest_source(pipeline, manifest, SOURCE, chunks("a", "b", "c", "broken"),
+                                 on_live=lambda ids, batch: live.update(zip(ids, batch)))
+    assert sorted(document.page_content for document in live.values()) == ["a", "b"]
+    assert result["documents"] == []
+    assert list(live) == result["ids"]
+
+
+def test_chunk_id_follows_text_metadata_and_source():
+    document = Document(page_content="EECE 230", metadata={"page": 1})
+    assert chunk_id(SOURCE, document) == chunk_id(SOURCE, Document(page_content="EECE 230", metadata={"page": 1}))
+    assert chunk_id(SOURCE, document) != chunk_id(SOURCE, Document(page_content="EECE 230", metadata={"page": 2}))
+    assert chunk_id(SOURCE, document) != chunk_id("other.pdf", document)
+
+
+def test_manifest_round_trip(tmp_path):
+    path = str(tmp_path / "manifests" / "test.json")
+    manifest = IngestManifest()
+    manifest.set_chunk_ids("a.pdf", ["1", "2"])
+    manifest.set_chunk_ids("b.pdf", ["3"])
+    manifest.set_chunk_ids("b.pdf", [])
+    manifest.save(path)
+
+    loaded = IngestManifest.load(path)
+    assert loaded.sources() == ["a.pdf"]
+    assert loaded.chunk_ids("a.pdf") == ["1", "2"]
+    assert len(loaded) == 2
+    assert len(IngestManifest.load(str(tmp_path / "missing.json"))) == 0
+
+
+def test_concurrent_ingestions_into_one_namespace_keep_both_manifest_entries(tmp_path):
+    path = str(tmp_path / "manifests" / "test.json")
+    seed = IngestManifest()
+    seed.set_chunk_ids("a.pdf", ["1"])
+    seed.set_chunk_ids("b.pdf", ["2"])
+    seed.save(path)
+
+    # Two ingestions load the manifest before either of them saves
+    first = IngestManifest.load(path)
+    second = IngestManifest.load(path)
+    first.set_chunk_ids("a.pdf", ["3"])
+    second.set_chunk_ids("b.pdf", [])
+    second.set_chunk_ids("c.pdf", ["4"])
+    first.save(path)
+    second.save(path)
+
+    saved = IngestManifest.load(path)
+    assert sorted(saved.sources()) == ["a.pdf", "c.pdf"]
+    assert saved.chunk_ids("a.pdf") == ["3"]
+    # The saving manifest holds the merged contents too
+    assert second.chunk_ids("a.pdf") == ["3"]
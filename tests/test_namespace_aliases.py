@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+from app.db.course_index import CourseCodeIndex
+from app.db.ingest_manifest import IngestManifest, manifest_path
+from app.db.local_index import LocalVectorIndex
+from app.db.namespace_aliases import (
+    NamespaceAliases,
+    read_namespace_aliases,
+    reserve_namespace_version,
+    rollback_namespace_alias,
+    swap_namespace_alias,
+)
+from app.db.namespace_versions import NamespaceVersions
+from manage_namespaces import collect_garbage
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {
+        "aliases": str(tmp_path / "namespace_aliases.json"),
+        "versions": str(tmp_path / "namespace_versions.json"),
+        "bm25": str(tmp_path / "bm25"),
+        "course_index": str(tmp_path / "course_index.json"),
+        "manifests": str(tmp_path / "manifests"),
+    }
+
+
+def swap(logical, physical, paths):
+    return swap_namespace_alias(logical, physical, paths["aliases"], paths["versions"])
+
+
+def test_reserve_numbers_versions_after_every_known_one(paths):
+    assert reserve_namespace_version("ece_namespace", paths["aliases"]) == "ece_namespace@v1"
+    assert reserve_namespace_version("ece_namespace", paths["aliases"]) == "ece_namespace@v2"
+    swap("ece_namespace", "ece_namespace@v2", paths)
+    assert reserve_namespace_version("ece_namespace", paths["aliases"]) == "ece_namespace@v3"
+    assert reserve_namespace_version("mechanical_namespace", paths["aliases"]) == "mechanical_namespace@v1"
+    assert set(read_namespace_aliases(paths["aliases"])["building"]) == {
+        "ece_namespace@v1", "ece_namespace@v3", "mechanical_namespace@v1"}
+
+
+def test_swap_retires_the_served_namespace(paths):
+    assert swap("ece_namespace", "ece_namespace@v1", paths) == "ece_namespace"
+    assert swap("ece_namespace", "ece_namespace@v2", paths) == "ece_namespace@v1"
+    data = read_namespace_aliases(paths["aliases"])
+    assert data["aliases"] == {"ece_namespace": "ece_namespace@v2"}
+    assert set(data["retired"]) == {"ece_namespace", "ece_namespace@v1"}
+    assert NamespaceAliases(paths["aliases"]).resolve("ece_namespace") == "ece_namespace@v2"
+    # Each swap bumps the logical namespace so cached results are dropped
+    assert NamespaceVersions(paths["versions"]).get("ece_namespace") == 2
+
+
+def test_rollback_serves_the_newest_retired_version(paths):
+    assert rollback_namespace_alias("ece_namespace", paths["aliases"], paths["versions"]) is None
+    for version in (1, 2, 3):
+        swap("ece_namespace", f"ece_namespace@v{version}", paths)
+    assert rollback_namespace_alias("ece_namespace", paths["aliases"], paths["versions"]) == \
+        ("ece_namespace@v3", "ece_namespace@v2")
+    data = read_namespace_aliases(paths["aliases"])
+    assert data["aliases"]["ece_namespace"] == "ece_namespace@v2"
+    assert "ece_namespace@v3" in data["retired"] and "ece_namespace@v2" not in data["retired"]
+
+
+@pytest.fixture
+def retired_namespace(paths):
+    """'ece_namespace' retired by a swap to v1, with vectors, a BM25 index, course index entries and a manifest"""
+    index = LocalVectorIndex(dimension=2)
+    for namespace in ("ece_namespace", "ece_namespace@v1"):
+        index.upsert(vectors=[("a", [1.0, 0.0], {"text": "EECE 230"})], namespace=namespace)
+        os.makedirs(paths["bm25"], exist_ok=True)
+        with open(os.path.join(paths["bm25"], f"{namespace}.json"), "w") as f:
+            f.write("{}")
+        course_index = CourseCodeIndex()
+        course_index.add(namespace, "EECE 230", "a", "EECE 230 Introduction to Programming")
+        course_index.save(paths["course_index"])
+        manifest = IngestManifest()
+        manifest.set_chunk_ids("ece.pdf", ["a"])
+        manifest.save(manifest_path(namespace, paths["manifests"]))
+    swap("ece_namespace", "ece_namespace@v1", paths)
+    return index
+
+
+def gc(index, paths, grace_seconds=0, **kwargs):
+    return collect_garbage(index, grace_seconds, bm25_dir=paths["bm25"], course_index_path=paths["course_index"],
+                           aliases_path=paths["aliases"], manifest_dir=paths["manifests"], **kwargs)
+
+
+def test_gc_deletes_retired_namespaces_and_their_files(paths, retired_namespace):
+    NamespaceAliases(paths["aliases"]).report()
+    assert gc(retired_namespace, paths, grace_seconds=3600) == []
+    assert gc(retired_namespace, paths) == ["ece_namespace"]
+
+    assert set(retired_namespace.describe_index_stats()["namespaces"]) == {"ece_namespace@v1"}
+    assert sorted(os.listdir(paths["bm25"])) == ["ece_namespace@v1.json"]
+    assert CourseCodeIndex.load(paths["course_index"]).stats().keys() == {"ece_namespace@v1"}
+    assert not os.path.exists(manifest_path("ece_namespace", paths["manifests"]))
+    assert os.path.exists(manifest_path("ece_namespace@v1", paths["manifests"]))
+    assert read_namespace_aliases(paths["aliases"])["retired"] == {}
+
+
+def test_gc_needs_servers_reporting_their_aliases(paths, retired_namespace):
+    # No server reads this alias file: it may still serve the unaliased namespace
+    assert gc(retired_namespace, paths) == []
+    assert "ece_namespace" in retired_namespace.describe_index_stats()["namespaces"]
+    assert gc(retired_namespace, paths, allow_no_servers=True) == ["ece_namespace"]
+
+
+def test_gc_keeps_namespaces_a_server_still_resolves_to(paths, retired_namespace):
+    server = NamespaceAliases(paths["aliases"])
+    server.report()
+    rollback_namespace_alias("ece_namespace", paths["aliases"], paths["versions"])
+    # The server has not re-read the alias file since the rollback retired v1
+    assert gc(retired_namespace, paths) == []
+    server.report()
+    assert gc(retired_namespace, paths) == ["ece_namespace@v1"]
@@ -0,0 +1,68 @@
+from langchain.schema import Document
+
+from app.services.conversation_memory import count_tokens
+from app.services.retrieval import adaptive_cutoff, reciprocal_rank_fusion
+
+
+def docs(*texts):
+    return {text: Document(page_content=text) for text in texts}
+
+
+def test_rrf_prefers_chunks_both_retrievers_found():
+    chunks = docs("a", "b", "c", "d")
+    dense = [chunks["a"], chunks["b"], chunks["c"]]
+    keyword = [chunks["b"], chunks["d"]]
+    fused = reciprocal_rank_fusion([dense, keyword], k=4, rrf_k=60)
+    # b: 1/62 + 1/61, a: 1/61, d: 1/62, c: 1/63
+    assert [document.page_content for document in fused] == ["b", "a", "d", "c"]
+    assert reciprocal_rank_fusion([dense, keyword], k=2, rrf_k=60) == fused[:2]
+
+
+def test_rrf_merges_the_same_chunk_from_both_retrievers():
+    dense = [Document(page_content="EECE 230"), Document(page_content="MECH 310")]
+    # The keyword index returns its own copies of the chunks
+    keyword = [Document(page_content="MECH 310"), Document(page_content="CHEN 311")]
+    fused = reciprocal_rank_fusion([dense, keyword], k=10)
+    assert [document.page_content for document in fused] == ["MECH 310", "EECE 230", "CHEN 311"]
+    assert fused[0] is dense[1]
+
+
+def test_rrf_keeps_chunks_with_different_ids_apart():
+    dense = [Document(id="1", page_content="Total 17")]
+    keyword = [Document(id="2", page_content="Total 17")]
+    assert len(reciprocal_rank_fusion([dense, keyword], k=10)) == 2
+    assert reciprocal_rank_fusion([[], []], k=10) == []
+
+
+def test_adaptive_cutoff_skips_weak_results():
+    chunks = docs("a", "b", "c", "d", "e")
+    scored = [(chunks["a"], 0.9), (chunks["b"], 0.85), (chunks["c"], 0.78), (chunks["d"], 0.5), (chunks["e"], None)]
+    # c falls below 0.9 * best, d below the floor; e (keyword only) has no similarity to judge
+    kept, _ = adaptive_cutoff(scored, max_results=5, min_score=0.75, relative_score=0.9, max_tokens=1000)
+    assert [document.page_content for document in kept] == ["a", "b", "e"]
+    kept, _ = adaptive_cutoff(scored, max_results=2, min_score=0.75, relative_score=0.9, max_tokens=1000)
+    assert [document.page_content for document in kept] == ["a", "b"]
+
+
+def test_adaptive_cutoff_keeps_min_results_regardless_of_score():
+    chunks = docs("a", "b", "c")
+    scored = [(chunks["a"], 0.3), (chunks["b"], 0.2), (chunks["c"], 0.1)]
+    kept, _ = adaptive_cutoff(scored, max_results=5, min_score=0.75, relative_score=0.9, max_tokens=1000,
+                              min_results=2)
+    assert [document.page_content for document in kept] == ["a", "b"]
+
+
+def test_adaptive_cutoff_stops_at_the_token_budget():
+    long = Document(page_content="prerequisites and corequisites " * 20)
+    short = Document(page_content="EECE 230")
+    first = Document(page_content="Term I (Fall)")
+    budget = count_tokens(first.page_content) + count_tokens(long.page_content) - 1
+    kept, tokens = adaptive_cutoff([(first, 0.9), (long, 0.9), (short, 0.9)], max_results=5, min_score=0.0,
+                                   relative_score=0.0, max_tokens=budget)
+    # The walk stops at the first chunk over budget rather than filling it with later ones
+    assert kept == [first]
+    assert tokens == count_tokens(first.page_content)
+
+    # The required results are kept even past the budget
+    kept, tokens = adaptive_cutoff([(long, 0.9)], max_results=5, min_score=0.0, relative_score=0.0, max_tokens=1)
+    assert kept == [long] and tokens == count_tokens(long.page_content)
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+from langchain.schema import Document
+
+from app.db import vector_store
+from app.db.namespace_versions import NamespaceVersions, bump_namespace_versions
+from app.db.retrieval_cache import RetrievalCache
+
+
+@pytest.fixture
+def versions_path(tmp_path):
+    return str(tmp_path / "namespace_versions.json")
+
+
+@pytest.fixture
+def cache(versions_path):
+    return RetrievalCache(versions=NamespaceVersions(versions_path, check_seconds=0))
+
+
+def test_bump_invalidates_only_the_bumped_namespace(cache, versions_path):
+    ece = cache.key("ece_namespace", query="EECE 230 prerequisites")
+    mechanical = cache.key("mechanical_namespace", query="EECE 230 prerequisites")
+    cache.put(ece, [Document(page_content="EECE 230")])
+    cache.put(mechanical, [Document(page_content="MECH 310")])
+    # Same query up to case and spacing
+    assert cache.get(cache.key("ece_namespace", query="  eece 230   Prerequisites")) is not None
+
+    assert bump_namespace_versions(["ece_namespace"], versions_path) == {"ece_namespace": 1}
+    assert cache.get(cache.key("ece_namespace", query="EECE 230 prerequisites")) is None
+    assert cache.get(cache.key("mechanical_namespace", query="EECE 230 prerequisites")) is not None
+    assert cache.stats()["namespaces"]["ece_namespace"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+def test_cached_documents_are_copies(cache):
+    key = cache.key("ece_namespace", embedding=[0.1, 0.2], kind="scored")
+    document = Document(page_content="EECE 230", metadata={"source": "ece.pdf"})
+    cache.put(key, [(document, 0.9)])
+    document.metadata["source"] = "changed"
+
+    cached, score = cache.get(key)[0]
+    assert (cached.metadata["source"], score) == ("ece.pdf", 0.9)
+    cached.metadata["source"] = "changed"
+    assert cache.get(key)[0][0].metadata["source"] == "ece.pdf"
+
+
+def test_concurrent_bumps_are_not_lost(versions_path):
+    def bump():
+        for _ in range(25):
+            bump_namespace_versions(["ece_namespace"], versions_path)
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert NamespaceVersions(versions_path).get("ece_namespace") == 100
+
+
+class CountingStore:
+    def __init__(self):
+        self.searches = 0
+
+    def similarity_search(self, query, k=4, filter=None, namespace=None, **kwargs):
+        self.searches += 1
+        return [Document(page_content=f"{query} #{self.searches}")]
+
+
+def test_agent_search_reaches_the_index_again_after_a_bump(cache, versions_path, monkeypatch):
+    store = CountingStore()
+    monkeypatch.setattr(vector_store, "retrieval_cache", cache)
+    monkeypatch.setattr(vector_store, "_build_agent_vectorstore", lambda agent_id: store)
+    agent_store = vector_store.LazyAgentVectorStore("ece")
+
+    assert agent_store.similarity_search("EECE 230")[0].page_content == "EECE 230 #1"
+    assert agent_store.similarity_search("EECE 230")[0].page_content == "EECE 230 #1"
+    assert store.searches == 1
+
+    bump_namespace_versions(["ece_namespace"], versions_path)
+    assert agent_store.similarity_search("EECE 230")[0].page_content == "EECE 230 #2"
+    assert store.searches == 2
@@ -0,0 +1,117 @@
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.db import session_store
+from app.db.session_store import (
+    MemorySessionBackend,
+    PersistentCheckpointer,
+    RedisSessionBackend,
+    create_session_backend,
+)
+from tests.fake_redis import FakeRedis
+
+
+class Clock:
+    """Settable time source shared by the backend and the fake Redis server"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_backend(clock):
+    def make(**kwargs):
+        return RedisSessionBackend(client=FakeRedis(clock=clock.time), **kwargs)
+    return make
+
+
+def test_put_get_delete(make_backend):
+    backend = make_backend()
+    assert backend.get("a") is None
+    backend.put("a", b"first")
+    backend.put("a", b"second")
+    assert backend.get("a") == b"second"
+    assert backend.delete("a") is True
+    assert backend.delete("a") is False
+    assert backend.get("a") is None
+
+
+def test_stats_count_sessions_and_bytes(make_backend):
+    backend = make_backend(ttl_seconds=60, max_sessions=5)
+    backend.put("a", b"123")
+    backend.put("b", b"4567")
+    backend.put("a", b"12")
+    stats = backend.stats()
+    assert stats["backend"] == "redis"
+    assert (stats["sessions"], stats["bytes"]) == (2, 6)
+    assert (stats["ttl_seconds"], stats["max_sessions"]) == (60, 5)
+
+
+def test_least_recently_used_session_is_evicted(make_backend, clock):
+    backend = make_backend(max_sessions=2)
+    backend.put("a", b"a")
+    clock.advance(1)
+    backend.put("b", b"b")
+    clock.advance(1)
+    assert backend.get("a") == b"a"  # "b" is now the least recently used
+    clock.advance(1)
+    backend.put("c", b"c")
+    assert backend.get("b") is None
+    assert backend.get("a") == b"a" and backend.get("c") == b"c"
+    stats = backend.stats()
+    assert stats["sessions"] == 2 and stats["evictions"] == 1
+
+
+def test_access_slides_the_expiry(make_backend, clock):
+    backend = make_backend(ttl_seconds=10)
+    backend.put("a", b"a")
+    clock.advance(6)
+    assert backend.get("a") == b"a"
+    clock.advance(6)
+    assert backend.get("a") == b"a"
+    clock.advance(11)
+    assert backend.get("a") is None
+    assert backend.stats()["sessions"] == 0
+
+
+def test_purge_expired_cleans_the_index(make_backend, clock):
+    backend = make_backend(ttl_seconds=10)
+    backend.put("old", b"old")
+    clock.advance(8)
+    backend.put("new", b"new")
+    clock.advance(5)
+    assert backend.purge_expired() == 1
+    stats = backend.stats()
+    assert (stats["sessions"], stats["bytes"], stats["expirations"]) == (1, 3, 1)
+
+
+def test_checkpointer_restores_threads_from_redis(make_backend):
+    backend = make_backend(ttl_seconds=60)
+    config = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+    checkpoint = empty_checkpoint()
+    PersistentCheckpointer(backend).put(config, checkpoint, {"step": 1}, {})
+
+    # Another worker with an empty in-memory cache reads the conversation back
+    restored = PersistentCheckpointer(backend).get_tuple(config)
+    assert restored is not None
+    assert restored.checkpoint["id"] == checkpoint["id"]
+    assert restored.metadata["step"] == 1
+
+
+def test_create_session_backend_rejects_unknown_kinds():
+    assert isinstance(create_session_backend("memory"), MemorySessionBackend)
+    with pytest.raises(ValueError):
+        create_session_backend("postgres")
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ttl_cache
+from app.services.ttl_cache import TTLLRUCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock for the cache module"""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(ttl_cache, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLLRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    # "b" was used least recently once "a" was read
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+    # Putting an existing key refreshes its recency without evicting
+    cache.put("a", 4)
+    cache.put("d", 5)
+    assert [key for key, _ in cache.items()] == ["a", "d"]
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = TTLLRUCache(max_entries=10, ttl_seconds=60)
+    cache.put("a", 1)
+    clock.now += 30
+    cache.put("b", 2)
+    clock.now += 30
+    assert cache.get("a") == 1
+    clock.now += 1
+    # Reading an entry does not extend its life
+    assert cache.get("a") is None
+    assert list(cache.items()) == [("b", 2)]
+    assert cache.stats()["expirations"] == 1
+
+    clock.now += 30
+    assert cache.get("b") is None
+    assert TTLLRUCache(ttl_seconds=None).get("missing", "default") == "default"
+
+
+def test_remove_where_and_pop():
+    cache = TTLLRUCache()
+    for key in (("ece", "q1"), ("ece", "q2"), ("mechanical", "q1")):
+        cache.put(key, key[1])
+    assert cache.remove_where(lambda key, _: key[0] == "ece") == 2
+    assert cache.pop(("mechanical", "q1")) == "q1"
+    assert len(cache) == 0
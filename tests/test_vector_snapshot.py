@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+
+from app.db.vector_snapshot import open_snapshot, read_manifest, write_namespace_snapshot
+
+
+def _rows(count, dimension=4, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"id-{seed}-{row}" for row in range(count)]
+    metadata = [{"text": f"chunk {row}", "seed": seed} for row in range(count)]
+    return ids, rng.standard_normal((count, dimension)).astype(np.float32), metadata
+
+
+def test_each_publish_writes_a_new_version_directory(tmp_path):
+    root = str(tmp_path)
+    first = write_namespace_snapshot(root, "ece_namespace", *_rows(3, seed=1))
+    mapped = open_snapshot(root, "ece_namespace")
+    # Same process, same second: the version must still differ
+    second = write_namespace_snapshot(root, "ece_namespace", *_rows(5, seed=2))
+
+    assert first["path"] != second["path"]
+    assert read_manifest(root)["namespaces"]["ece_namespace"]["path"] == second["path"]
+    assert mapped._matrix.shape == (3, 4)
+    assert open_snapshot(root, "ece_namespace").ids == [f"id-2-{row}" for row in range(5)]
+
+
+def test_previous_version_is_retired_until_the_grace_period_ends(tmp_path):
+    root = str(tmp_path)
+    first = write_namespace_snapshot(root, "ece_namespace", *_rows(3, seed=1), grace_seconds=3600)
+    write_namespace_snapshot(root, "ece_namespace", *_rows(3, seed=2), grace_seconds=3600)
+    assert os.path.isdir(os.path.join(root, first["path"]))
+    assert [version["path"] for version in read_manifest(root)["retired"]] == [first["path"]]
+
+    # A later publish deletes retired versions past the grace period
+    third = write_namespace_snapshot(root, "cse_namespace", *_rows(2, seed=3), grace_seconds=0)
+    assert not os.path.exists(os.path.join(root, first["path"]))
+    assert os.path.isdir(os.path.join(root, third["path"]))
+
+
+def test_attached_version_keeps_its_metadata_after_deletion(tmp_path):
+    root = str(tmp_path)
+    write_namespace_snapshot(root, "ece_namespace", *_rows(3, seed=1))
+    attached = open_snapshot(root, "ece_namespace")
+    # Republished with no grace period: the attached version is deleted before its first query
+    write_namespace_snapshot(root, "ece_namespace", *_rows(3, seed=2), grace_seconds=0)
+    assert not os.path.exists(attached.directory)
+
+    assert attached.ids == ["id-1-0", "id-1-1", "id-1-2"]
+    assert attached.metadata[1] == {"text": "chunk 1", "seed": 1}
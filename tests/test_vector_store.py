@@ -0,0 +1,35 @@
+import pytest
+
+from app.db import vector_store
+from app.services import advisor
+
+
+@pytest.fixture
+def offline_pinecone(monkeypatch):
+    """Make every path to Pinecone fail, recording the attempts, and forget the agent stores built so far"""
+    attempts = []
+
+    def fail(*args, **kwargs):
+        attempts.append(args)
+        raise AssertionError("Pinecone was contacted")
+
+    monkeypatch.setattr(vector_store, "Pinecone", fail)
+    monkeypatch.setattr(vector_store, "get_index", fail)
+    monkeypatch.setattr(vector_store, "initialize_vector_store", fail)
+    monkeypatch.setattr(vector_store, "_agent_vectorstore_cache", {})
+    return attempts
+
+
+def test_build_graph_does_not_touch_pinecone(offline_pinecone):
+    graph = advisor.build_graph()
+    assert "supervisor" in graph.get_graph().nodes
+    assert offline_pinecone == []
+    assert vector_store._agent_vectorstore_cache == {}
+
+
+def test_lazy_store_does_not_resolve_private_names(offline_pinecone):
+    store = vector_store.get_agent_vectorstore("mechanical")
+    assert not hasattr(store, "__self__")
+    assert not hasattr(store, "_index")
+    with pytest.raises(AssertionError, match="Pinecone was contacted"):
+        store.embeddings